@@ -0,0 +1,35 @@
+# Generated by Django 3.0.11 on 2021-02-06 18:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('runs', '0014_run_rating_pairing_queue_size'),
+        ('trainings', '0014_network_log_gamma_offset'),
+        ('distributed_efforts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingRatingPairing',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='creation date')),
+                ('network_delay_bucket', models.IntegerField(default=0, help_text='Which range of client network delays this pairing may be handed out to.', verbose_name='network delay bucket')),
+                ('black_network', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='trainings.Network', verbose_name='black player network')),
+                ('run', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='runs.Run', verbose_name='run')),
+                ('white_network', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='trainings.Network', verbose_name='white player network')),
+            ],
+            options={
+                'verbose_name': 'PendingRatingPairing',
+                'verbose_name_plural': 'PendingRatingPairings',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='pendingratingpairing',
+            index=models.Index(fields=['run', 'network_delay_bucket', 'id'], name='distributed_pairing_run_id'),
+        ),
+    ]
@@ -1 +1,2 @@
+from .pending_rating_pairing import PendingRatingPairing
 from .user_last_version import UserLastVersion
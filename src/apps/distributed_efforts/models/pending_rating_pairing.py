@@ -0,0 +1,33 @@
+from django.db.models import CASCADE, BigAutoField, DateTimeField, ForeignKey, Index, IntegerField, Model
+from django.utils.translation import gettext_lazy as _
+
+from src.apps.runs.models import Run
+from src.apps.trainings.models import Network
+
+
+class PendingRatingPairing(Model):
+    """
+    A precomputed (white, black) pairing for a rating game, waiting to be handed out to a client requesting a task.
+    Pairings are queued separately for each network delay bucket, since clients with a larger network delay
+    must not be given networks that are too recent for them.
+    """
+
+    class Meta:
+        verbose_name = _("PendingRatingPairing")
+        verbose_name_plural = _("PendingRatingPairings")
+        indexes = [Index(fields=["run", "network_delay_bucket", "id"], name="distributed_pairing_run_id")]
+
+    id = BigAutoField(primary_key=True)
+    run = ForeignKey(Run, verbose_name=_("run"), on_delete=CASCADE, related_name="+", db_index=False)
+    created_at = DateTimeField(_("creation date"), auto_now_add=True, db_index=True)
+    network_delay_bucket = IntegerField(
+        _("network delay bucket"),
+        default=0,
+        help_text=_("Which range of client network delays this pairing may be handed out to."),
+    )
+    white_network = ForeignKey(
+        Network, verbose_name=_("white player network"), on_delete=CASCADE, related_name="+", db_index=True
+    )
+    black_network = ForeignKey(
+        Network, verbose_name=_("black player network"), on_delete=CASCADE, related_name="+", db_index=True
+    )
@@ -1 +1,3 @@
 from .rating_network_pairer import RatingNetworkPairerService
+from .rating_pairing_queue import RatingPairingQueueService
+from .user_last_version_recorder import UserLastVersionRecorder
@@ -1,16 +1,18 @@
 import random
-from math import e, exp, log1p, log10
+from math import e, log10
 
 import numpy as np
 
 from src.apps.runs.models import Run
 from src.apps.trainings.models import Network
+from src.apps.trainings.services import NetworkRatingTableService
 
 
 class RatingNetworkPairerService:
     def __init__(self, run: Run, network_delay):
         self.current_run = run
         self.network_delay = network_delay
+        self._rating_table = None
 
     def generate_pairing(self):
         """
@@ -101,6 +103,8 @@ class RatingNetworkPairerService:
         Once we have all that, we look for a network close enough, selecting a network with probability proportional to the variance
         of the 0-1 game result.
 
+        Candidates are looked up in the run's NetworkRatingTable rather than queried from the database.
+
         :param reference_network:
         :return: a network, chosen to be used as an opponent, or None if no distinct opponent could be found
         """
@@ -122,55 +126,34 @@ class RatingNetworkPairerService:
         log_gamma_lower_bound = ref_net_log_gamma - log_gamma_search_range
         log_gamma_upper_bound = ref_net_log_gamma + log_gamma_search_range
 
-        nearby_networks = (
-            Network.objects.exclude(pk=reference_network.pk)
-            .filter(
-                run=self.current_run,
-                rating_games_enabled=True,
-                log_gamma__lte=log_gamma_upper_bound,
-                log_gamma__gte=log_gamma_lower_bound,
-            )
-            .all()
+        rating_table = self._get_rating_table()
+        nearby_rows = rating_table.select_rating_rows_in_log_gamma_range(
+            log_gamma_lower_bound, log_gamma_upper_bound, exclude_id=reference_network.pk
         )
-        if len(nearby_networks) < 4:
-            nearby_weaker_networks = (
-                Network.objects.exclude(pk=reference_network.pk)
-                .filter(run=self.current_run, rating_games_enabled=True, log_gamma__lte=ref_net_log_gamma)
-                .order_by("-log_gamma")
-                .all()[:2]
+        if len(nearby_rows) < 4:
+            nearby_weaker_rows, nearby_stronger_rows = rating_table.select_nearest_rating_rows(
+                ref_net_log_gamma, 2, exclude_id=reference_network.pk
             )
-            nearby_stronger_networks = (
-                Network.objects.exclude(pk=reference_network.pk)
-                .filter(run=self.current_run, rating_games_enabled=True, log_gamma__gte=ref_net_log_gamma)
-                .order_by("log_gamma")
-                .all()[:2]
-            )
-            nearby_networks = list(nearby_weaker_networks) + list(nearby_stronger_networks)
-            if len(nearby_networks) <= 0:
+            nearby_rows = np.concatenate([nearby_weaker_rows, nearby_stronger_rows])
+            if len(nearby_rows) <= 0:
                 return None
-            return np.random.choice(nearby_networks)
+            return rating_table.networks[nearby_rows[np.random.choice(len(nearby_rows))]]
 
-        log_variances = [
-            self._log_variance_of_gamma_difference(
-                (opp_net.log_gamma - ref_net_log_gamma) / self.current_run.rating_game_variability_scale
-            )
-            for opp_net in nearby_networks
-        ]
-        max_log_variance = max(log_variances)
+        log_variances = self._log_variance_of_gamma_difference(
+            (rating_table.log_gamma[nearby_rows] - ref_net_log_gamma) / self.current_run.rating_game_variability_scale
+        )
         # Subtract out the max to make sure that we're near 0, for numerical stability
-        log_variances = [log_variance - max_log_variance for log_variance in log_variances]
-        variances = [exp(log_variance) for log_variance in log_variances]
-        # print(log_variances)
-        # print(variances)
-        return np.random.choice(nearby_networks, p=variances / np.sum(variances))
+        variances = np.exp(log_variances - np.max(log_variances))
+        return rating_table.networks[nearby_rows[np.random.choice(len(nearby_rows), p=variances / np.sum(variances))]]
+
+    def _get_rating_table(self):
+        if self._rating_table is None:
+            self._rating_table = NetworkRatingTableService.get(self.current_run)
+        return self._rating_table
 
-    def _log_variance_of_gamma_difference(self, gamma_diff):
+    @staticmethod
+    def _log_variance_of_gamma_difference(gamma_diff):
         # We would like to compute log(p * q) = log(p) + log(q)
         # where p = 1 / (1+exp(gamma_diff)) and q = 1 / (1+exp(-gamma_diff))
-        return -self.log_one_plus_exp(gamma_diff) - self.log_one_plus_exp(-gamma_diff)
-
-    # Computes log(1+exp(x)) in a numerically stable way
-    def log_one_plus_exp(self, x):
-        if x >= 40:
-            return x
-        return log1p(exp(x))
+        # np.logaddexp(0, x) computes log(1+exp(x)) in a numerically stable way
+        return -np.logaddexp(0, gamma_diff) - np.logaddexp(0, -gamma_diff)
@@ -0,0 +1,152 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from src.apps.distributed_efforts.models import PendingRatingPairing
+from src.apps.runs.models import Run
+from src.apps.trainings.services import NetworkRatingTableService
+
+from .rating_network_pairer import RatingNetworkPairerService
+
+
+class RatingPairingQueueService:
+    """
+    RatingPairingQueueService keeps a queue of precomputed rating game pairings in the database, so that clients
+    requesting tasks only pop a pairing instead of running the whole pairing selection.
+
+    Client network delays are grouped into num_network_delay_buckets buckets, each with its own queue. Pairings of a
+    bucket are generated with the largest delay of that bucket, so that no client is given a network more recent
+    than its own delay allows.
+    """
+
+    num_network_delay_buckets = 8
+    # Pairings are drawn from ratings that keep changing, drop them if nobody consumed them for this long
+    max_pairing_age = timedelta(minutes=10)
+    # Bound on how many stale pairings a single pop will skip over before giving up on the queue
+    max_pop_attempts = 8
+
+    def __init__(self, run: Run):
+        self.current_run = run
+
+    @property
+    def queue_size(self):
+        return self.current_run.rating_pairing_queue_size
+
+    def get_network_delay_bounds(self):
+        """
+        :return: Tuple of (min_delay, max_delay) of the run, or None if network delays are disabled
+        """
+        if self.current_run.max_network_usage_delay <= 0:
+            return None
+        min_delay = self.current_run.min_network_usage_delay
+        max_delay = self.current_run.max_network_usage_delay
+        (min_delay, max_delay) = (min(min_delay, max_delay), max(min_delay, max_delay))
+        return max(min_delay, 0), max_delay
+
+    def get_network_delay_buckets(self):
+        if self.get_network_delay_bounds() is None:
+            return [0]
+        return list(range(self.num_network_delay_buckets))
+
+    def get_network_delay_bucket(self, network_delay):
+        bounds = self.get_network_delay_bounds()
+        if network_delay is None or bounds is None:
+            return 0
+        (min_delay, max_delay) = bounds
+        if max_delay <= min_delay:
+            return 0
+        bucket = int((network_delay - min_delay) / (max_delay - min_delay) * self.num_network_delay_buckets)
+        return min(max(bucket, 0), self.num_network_delay_buckets - 1)
+
+    def get_bucket_network_delay(self, bucket):
+        """
+        :return: the network delay that pairings of the bucket are generated with
+        """
+        bounds = self.get_network_delay_bounds()
+        if bounds is None:
+            return None
+        (min_delay, max_delay) = bounds
+        return min_delay + (max_delay - min_delay) * (bucket + 1) / self.num_network_delay_buckets
+
+    def pop_pairing(self, network_delay):
+        """
+        Take the oldest queued pairing suitable for a client with the given network delay.
+        Concurrent requests skip over rows locked by each other instead of waiting on them.
+
+        :return: Tuple of (white_network,black_network), or None if the queue is disabled or empty
+        """
+        if self.queue_size <= 0:
+            return None
+
+        bucket = self.get_network_delay_bucket(network_delay)
+        table_name = PendingRatingPairing._meta.db_table
+        for _ in range(self.max_pop_attempts):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    DELETE FROM {table_name}
+                    WHERE id = (
+                        SELECT id FROM {table_name}
+                        WHERE run_id = %s AND network_delay_bucket = %s
+                        ORDER BY id
+                        LIMIT 1
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING white_network_id, black_network_id
+                    """,
+                    [self.current_run.pk, bucket],
+                )
+                row = cursor.fetchone()
+            if row is None:
+                return None
+
+            rating_table = NetworkRatingTableService.get(self.current_run)
+            white_network = rating_table.get_network(row[0])
+            black_network = rating_table.get_network(row[1])
+            # Networks may have been disabled for rating since the pairing was queued, just drop those pairings
+            if white_network is None or black_network is None:
+                continue
+            if not white_network.rating_games_enabled or not black_network.rating_games_enabled:
+                continue
+            return white_network, black_network
+        return None
+
+    def refill(self):
+        """
+        Drop stale pairings and top up the queue of every network delay bucket to queue_size pairings.
+
+        :return: the number of pairings added
+        """
+        queued = PendingRatingPairing.objects.filter(run=self.current_run)
+        if self.queue_size <= 0:
+            queued.delete()
+            return 0
+
+        queued.filter(created_at__lt=timezone.now() - self.max_pairing_age).delete()
+        queued.filter(white_network__rating_games_enabled=False).delete()
+        queued.filter(black_network__rating_games_enabled=False).delete()
+        buckets = self.get_network_delay_buckets()
+        queued.exclude(network_delay_bucket__in=buckets).delete()
+
+        added = []
+        for bucket in buckets:
+            missing = self.queue_size - queued.filter(network_delay_bucket=bucket).count()
+            if missing <= 0:
+                continue
+            pairer = RatingNetworkPairerService(self.current_run, self.get_bucket_network_delay(bucket))
+            for _ in range(missing):
+                pairing = pairer.generate_pairing()
+                if pairing is None:
+                    continue
+                (white_network, black_network) = pairing
+                added.append(
+                    PendingRatingPairing(
+                        run=self.current_run,
+                        network_delay_bucket=bucket,
+                        white_network=white_network,
+                        black_network=black_network,
+                    )
+                )
+        PendingRatingPairing.objects.bulk_create(added)
+        return len(added)
@@ -0,0 +1,91 @@
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.utils import timezone
+
+from src.apps.distributed_efforts.models import UserLastVersion
+from src.apps.users.models import User
+
+
+class UserLastVersionRecorder:
+    """
+    UserLastVersionRecorder records the client version of users requesting tasks without writing to the database
+    on every request. Each worker process buffers the versions reported since its last flush, keeping only the latest
+    one for each user, and writes them all with a single upsert USER_LAST_VERSION_FLUSH_INTERVAL seconds after the
+    first of them, from a timer thread, so that a worker that stops getting requests still writes what it has.
+
+    The upsert only rewrites a row when the version differs from the one stored, whichever process wrote it, or when
+    its access_time is old enough to be refreshed, so that unchanged versions do not churn the table.
+
+    UserLastVersion is only informational, so buffered values lost when a worker exits are not a concern.
+    """
+
+    # Unchanged versions are still rewritten this often, so that access_time stays meaningful
+    access_time_refresh_interval = timedelta(hours=1)
+
+    _lock = threading.Lock()
+    # user_id -> (git_revision, access_time) waiting to be written
+    _pending = {}
+    _flush_timer = None
+
+    @classmethod
+    def record(cls, user, git_revision):
+        flush_interval = settings.USER_LAST_VERSION_FLUSH_INTERVAL
+        with cls._lock:
+            cls._pending[user.pk] = (git_revision, timezone.now())
+            if flush_interval > 0:
+                if cls._flush_timer is None:
+                    cls._flush_timer = threading.Timer(flush_interval, cls._flush_from_timer)
+                    cls._flush_timer.daemon = True
+                    cls._flush_timer.start()
+                return
+        cls.flush()
+
+    @classmethod
+    def _flush_from_timer(cls):
+        with cls._lock:
+            cls._flush_timer = None
+        try:
+            cls.flush()
+        finally:
+            # The timer thread has a database connection of its own, which nothing else would close
+            connection.close()
+
+    @classmethod
+    def flush(cls):
+        with cls._lock:
+            pending = cls._pending
+            cls._pending = {}
+        if not pending:
+            return
+
+        rows = [(user_id, access_time, git_revision) for (user_id, (git_revision, access_time)) in pending.items()]
+        table_name = UserLastVersion._meta.db_table
+        user_table_name = User._meta.db_table
+        user_id_type = User._meta.pk.db_type(connection)
+        values_sql = ", ".join([f"(%s::{user_id_type}, %s::timestamp with time zone, %s)"] * len(rows))
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                # Users deleted in the meantime are left out, rather than failing the others on their foreign key,
+                # and rows are locked in user_id order, so that flushes of overlapping users from several worker
+                # processes cannot deadlock
+                cursor.execute(
+                    f"""
+                    INSERT INTO {table_name} AS recorded (user_id, access_time, git_revision)
+                    SELECT pending.user_id, pending.access_time, pending.git_revision
+                    FROM (VALUES {values_sql}) AS pending (user_id, access_time, git_revision)
+                    JOIN {user_table_name} AS recorded_user ON recorded_user.id = pending.user_id
+                    ORDER BY pending.user_id
+                    ON CONFLICT (user_id) DO UPDATE
+                    SET access_time = EXCLUDED.access_time, git_revision = EXCLUDED.git_revision
+                    WHERE recorded.git_revision <> EXCLUDED.git_revision
+                    OR recorded.access_time < EXCLUDED.access_time - %s
+                    """,
+                    [value for row in rows for value in row] + [cls.access_time_refresh_interval],
+                )
+        # Recording stuff in this table is only informational, not worth failing a request over, as on a deadlock or
+        # on a user deleted concurrently
+        except (IntegrityError, OperationalError):
+            return
@@ -0,0 +1 @@
+from .refill_rating_pairing_queue import refill_rating_pairing_queue
@@ -0,0 +1,16 @@
+from src import celery_app
+from src.apps.distributed_efforts.services import RatingPairingQueueService
+from src.apps.runs.models import Run
+
+
+@celery_app.task()
+def refill_rating_pairing_queue():
+    """
+    Periodically top up the queue of precomputed rating game pairings of the current_run
+    :return:
+    """
+    current_run = Run.objects.select_current()
+    if current_run is None:
+        return
+
+    RatingPairingQueueService(current_run).refill()
@@ -9,9 +9,13 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import override_settings
 from rest_framework.test import APIClient
 
-from src.apps.distributed_efforts.models import UserLastVersion
-from src.apps.runs.models import Run
+from src.apps.distributed_efforts.models import PendingRatingPairing, UserLastVersion
+from src.apps.distributed_efforts.services import RatingPairingQueueService, UserLastVersionRecorder
+from src.apps.distributed_efforts.tasks import refill_rating_pairing_queue
+from src.apps.runs.models import Run, hash_client_config
+from src.apps.runs.services import RunSnapshotService
 from src.apps.startposes.models import StartPos
+from src.apps.startposes.services import StartPosSamplerService
 from src.apps.startposes.tasks import recompute_startpos_cumulative_weights
 from src.apps.trainings.models import Network
 
@@ -1521,6 +1525,33 @@ class TestStartPoses:
         self.r1.refresh_from_db()
         assert self.r1.startpos_total_weight == 17.625
 
+    def test_sampler_matches_queryset(self):
+        StartPos.objects.filter(run=self.r1).delete()
+        for (data, weight) in [("a", 5.0), ("b", 2.0), ("c", 10.0), ("d", 1.0), ("e", 0.5)]:
+            StartPos.objects.create(run=self.r1, data=data, weight=weight)
+        self.r1.startpos_locked = True
+        self.r1.save()
+        recompute_startpos_cumulative_weights()
+        self.r1.refresh_from_db()
+        self.r1.startpos_locked = False
+        self.r1.save()
+
+        sampler = StartPosSamplerService.get(self.r1)
+        assert len(sampler) == 5
+        for seed in range(20):
+            random.seed(seed)
+            start_pos = StartPos.objects.select_weighted_random(self.r1)
+            random.seed(seed)
+            expected = [start_pos.data] if start_pos is not None else []
+            assert (
+                sampler.get_payloads(sampler.select_ids([random.random() * self.r1.startpos_total_weight])) == expected
+            )
+
+        random.seed(42)
+        start_poses = StartPosSamplerService.select_start_poses(self.r1, 64)
+        assert len(start_poses) == 64
+        assert set(start_poses) <= {"a", "b", "c", "d", "e"}
+
 
 class TestGetTaskActive:
     def setup_method(self):
@@ -1665,6 +1696,349 @@ class TestGetTaskWhiteList:
         assert response.status_code == 200
 
 
+class TestRunSnapshot:
+    def setup_method(self):
+        self.u1 = User.objects.create_user(username="test", password="test")
+        self.r1 = Run.objects.create(
+            name="testrun",
+            rating_game_probability=0.0,
+            status="Active",
+            git_revision_hash_whitelist="abcdef123456abcdef123456abcdef1234567890 # some comment\n\n",
+        )
+        self.n1 = Network.objects.create(
+            run=self.r1,
+            name="testrun-randomnetwork",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            is_random=True,
+        )
+
+    def teardown_method(self):
+        self.n1.delete()
+        self.r1.delete()
+        self.u1.delete()
+
+    def test_snapshot_reused_until_run_saved(self):
+        snapshot = RunSnapshotService.get_current()
+        assert snapshot.run.pk == self.r1.pk
+        assert snapshot.is_git_in_whitelist("ABCDEF123456abcdef123456abcdef1234567890")
+        assert not snapshot.is_git_in_whitelist("1111222233334444555566667777888899990000")
+        assert RunSnapshotService.get_current() is snapshot
+
+        self.r1.git_revision_hash_whitelist = "1111222233334444555566667777888899990000"
+        self.r1.save()
+        new_snapshot = RunSnapshotService.get_current()
+        assert new_snapshot is not snapshot
+        assert new_snapshot.is_git_in_whitelist("1111222233334444555566667777888899990000")
+        assert not new_snapshot.is_git_in_whitelist("abcdef123456abcdef123456abcdef1234567890")
+
+    def test_whitelist_change_applies_to_next_task(self):
+        client = APIClient()
+        client.login(username="test", password="test")
+        response = client.post("/api/tasks/", {"git_revision": "1111222233334444555566667777888899990000"})
+        assert response.status_code == 400
+
+        self.r1.git_revision_hash_whitelist = "1111222233334444555566667777888899990000"
+        self.r1.save()
+        response = client.post("/api/tasks/", {"git_revision": "1111222233334444555566667777888899990000"})
+        assert response.status_code == 200
+        assert response.data["kind"] == "selfplay"
+
+    def test_no_active_run(self):
+        self.r1.status = "Inactive"
+        self.r1.save()
+        assert RunSnapshotService.get_current() is None
+
+
+class TestGetTaskBatch:
+    def setup_method(self):
+        self.u1 = User.objects.create_user(username="test", password="test")
+        self.r1 = Run.objects.create(
+            name="testrun",
+            rating_game_probability=0.0,
+            status="Active",
+            git_revision_hash_whitelist="abcdef123456abcdef123456abcdef1234567890\n\n1111222233334444555566667777888899990000",
+        )
+        self.n1 = Network.objects.create(
+            run=self.r1,
+            name="testrun-network0",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            log_gamma_uncertainty=1,
+            log_gamma_lower_confidence=-2.0,
+            log_gamma_upper_confidence=2.0,
+            log_gamma_game_count=3,
+            is_random=True,
+        )
+        self.n2 = Network.objects.create(
+            run=self.r1,
+            name="testrun-network1",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=1,
+            log_gamma_uncertainty=1.5,
+            log_gamma_lower_confidence=-3.0,
+            log_gamma_upper_confidence=4.0,
+            log_gamma_game_count=5,
+            is_random=True,
+        )
+
+    def teardown_method(self):
+        self.n2.delete()
+        self.n1.delete()
+        self.r1.delete()
+        self.u1.delete()
+
+    def test_batch_selfplay(self):
+        client = APIClient()
+        client.login(username="test", password="test")
+        response = client.post(
+            "/api/tasks/batch/", {"git_revision": "abcdef123456abcdef123456abcdef1234567890", "count": 3}
+        )
+        assert response.status_code == 200
+        assert len(response.data["tasks"]) == 3
+        for task in response.data["tasks"]:
+            assert task["kind"] == "selfplay"
+            assert task["network"]["name"] == "testrun-network1"
+            assert task["run"]["name"] == "testrun"
+        assert (
+            UserLastVersion.objects.filter(user__username="test").first().git_revision
+            == "abcdef123456abcdef123456abcdef1234567890"
+        )
+
+    def test_batch_rating(self):
+        self.r1.rating_game_probability = 1.0
+        self.r1.save()
+        client = APIClient()
+        client.login(username="test", password="test")
+        response = client.post(
+            "/api/tasks/batch/", {"git_revision": "abcdef123456abcdef123456abcdef1234567890", "count": 5}
+        )
+        assert response.status_code == 200
+        assert len(response.data["tasks"]) == 5
+        for task in response.data["tasks"]:
+            assert task["kind"] == "rating"
+            assert {task["white_network"]["name"], task["black_network"]["name"]} == {
+                "testrun-network0",
+                "testrun-network1",
+            }
+
+    def test_batch_bad_count(self):
+        client = APIClient()
+        client.login(username="test", password="test")
+        response = client.post(
+            "/api/tasks/batch/", {"git_revision": "abcdef123456abcdef123456abcdef1234567890", "count": 0}
+        )
+        assert str(response.data) == """{'error': 'count was not an integer from 1 to 64'}"""
+        assert response.status_code == 400
+        response = client.post(
+            "/api/tasks/batch/", {"git_revision": "abcdef123456abcdef123456abcdef1234567890", "count": 65}
+        )
+        assert response.status_code == 400
+
+    def test_batch_bad_git_revision(self):
+        client = APIClient()
+        client.login(username="test", password="test")
+        response = client.post("/api/tasks/batch/", {"git_revision": "abcd", "count": 2})
+        assert response.status_code == 400
+
+
+class TestUserLastVersionRecorder:
+    def setup_method(self):
+        self.u1 = User.objects.create_user(username="test", password="test")
+
+    def teardown_method(self):
+        UserLastVersionRecorder.flush()
+        self.u1.delete()
+
+    def test_record_immediately(self):
+        UserLastVersionRecorder.record(self.u1, "abcdef123456abcdef123456abcdef1234567890")
+        assert UserLastVersion.objects.get(user=self.u1).git_revision == "abcdef123456abcdef123456abcdef1234567890"
+        UserLastVersionRecorder.record(self.u1, "1111222233334444555566667777888899990000")
+        assert UserLastVersion.objects.get(user=self.u1).git_revision == "1111222233334444555566667777888899990000"
+
+    @override_settings(USER_LAST_VERSION_FLUSH_INTERVAL=3600)
+    def test_record_buffered_until_flush(self):
+        UserLastVersionRecorder.record(self.u1, "abcdef123456abcdef123456abcdef1234567890")
+        assert not UserLastVersion.objects.filter(user=self.u1).exists()
+        UserLastVersionRecorder.flush()
+        assert UserLastVersion.objects.get(user=self.u1).git_revision == "abcdef123456abcdef123456abcdef1234567890"
+
+        # Unchanged versions do not rewrite the row until its access time is old enough
+        access_time = UserLastVersion.objects.get(user=self.u1).access_time
+        UserLastVersionRecorder.record(self.u1, "abcdef123456abcdef123456abcdef1234567890")
+        UserLastVersionRecorder.flush()
+        assert UserLastVersion.objects.get(user=self.u1).access_time == access_time
+
+    @override_settings(USER_LAST_VERSION_FLUSH_INTERVAL=3600)
+    def test_record_after_user_deleted(self):
+        u2 = User.objects.create_user(username="test2", password="test")
+        UserLastVersionRecorder.record(u2, "1111222233334444555566667777888899990000")
+        UserLastVersionRecorder.record(self.u1, "abcdef123456abcdef123456abcdef1234567890")
+        u2.delete()
+        UserLastVersionRecorder.flush()
+        assert UserLastVersion.objects.get(user=self.u1).git_revision == "abcdef123456abcdef123456abcdef1234567890"
+
+    def test_record_after_other_process(self):
+        UserLastVersionRecorder.record(self.u1, "abcdef123456abcdef123456abcdef1234567890")
+        # Another worker process records a different version in the meantime
+        UserLastVersion.objects.filter(user=self.u1).update(git_revision="1111222233334444555566667777888899990000")
+        UserLastVersionRecorder.record(self.u1, "abcdef123456abcdef123456abcdef1234567890")
+        assert UserLastVersion.objects.get(user=self.u1).git_revision == "abcdef123456abcdef123456abcdef1234567890"
+
+
+class TestGetTaskConfigByHash:
+    def setup_method(self):
+        self.u1 = User.objects.create_user(username="test", password="test")
+        self.r1 = Run.objects.create(
+            name="testrun",
+            rating_game_probability=0.0,
+            status="Active",
+            git_revision_hash_whitelist="abcdef123456abcdef123456abcdef1234567890",
+            selfplay_client_config="maxVisits = 600\n",
+            rating_client_config="maxVisits = 500\n",
+        )
+        self.n1 = Network.objects.create(
+            run=self.r1,
+            name="testrun-randomnetwork",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            is_random=True,
+        )
+
+    def teardown_method(self):
+        self.n1.delete()
+        self.r1.delete()
+        self.u1.delete()
+
+    def test_config_inline_by_default(self):
+        client = APIClient()
+        client.login(username="test", password="test")
+        response = client.post("/api/tasks/", {"git_revision": "abcdef123456abcdef123456abcdef1234567890"})
+        assert response.status_code == 200
+        assert response.data["config"] == "maxVisits = 600\n"
+        assert "config_hash" not in response.data
+
+    def test_config_by_hash(self):
+        client = APIClient()
+        client.login(username="test", password="test")
+        response = client.post(
+            "/api/tasks/", {"git_revision": "abcdef123456abcdef123456abcdef1234567890", "config_by_hash": True}
+        )
+        assert response.status_code == 200
+        assert "config" not in response.data
+        config_hash = response.data["config_hash"]
+        assert config_hash == hash_client_config("maxVisits = 600\n")
+        assert response.data["config_url"] == f"http://testserver/api/runs/testrun/config/{config_hash}/"
+
+        response = client.get(response.data["config_url"])
+        assert response.status_code == 200
+        assert response.content == b"maxVisits = 600\n"
+        assert "immutable" in response["Cache-Control"]
+
+        rating_config_hash = hash_client_config("maxVisits = 500\n")
+        response = client.get(f"/api/runs/testrun/config/{rating_config_hash}/")
+        assert response.status_code == 200
+        assert response.content == b"maxVisits = 500\n"
+
+        response = client.get(f"/api/runs/testrun/config/{hash_client_config('other')}/")
+        assert response.status_code == 404
+
+
+class TestRatingPairingQueue:
+    def setup_method(self):
+        self.u1 = User.objects.create_user(username="test", password="test")
+        self.r1 = Run.objects.create(
+            name="testrun",
+            rating_game_probability=1.0,
+            rating_pairing_queue_size=3,
+            status="Active",
+            git_revision_hash_whitelist="abcdef123456abcdef123456abcdef1234567890\n\n1111222233334444555566667777888899990000",
+        )
+        self.n1 = Network.objects.create(
+            run=self.r1,
+            name="testrun-network0",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            log_gamma_uncertainty=1,
+            log_gamma_lower_confidence=-2.0,
+            log_gamma_upper_confidence=2.0,
+            log_gamma_game_count=3,
+            is_random=True,
+        )
+        self.n2 = Network.objects.create(
+            run=self.r1,
+            name="testrun-network1",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=1,
+            log_gamma_uncertainty=1.5,
+            log_gamma_lower_confidence=-3.0,
+            log_gamma_upper_confidence=4.0,
+            log_gamma_game_count=5,
+            is_random=True,
+        )
+
+    def teardown_method(self):
+        PendingRatingPairing.objects.all().delete()
+        self.n2.delete()
+        self.n1.delete()
+        self.r1.delete()
+        self.u1.delete()
+
+    def test_refill_tops_up_queue(self):
+        assert refill_rating_pairing_queue() is None
+        assert PendingRatingPairing.objects.filter(run=self.r1, network_delay_bucket=0).count() == 3
+        RatingPairingQueueService(self.r1).refill()
+        assert PendingRatingPairing.objects.filter(run=self.r1).count() == 3
+
+    def test_tasks_pop_queued_pairings(self):
+        refill_rating_pairing_queue()
+        queued = list(PendingRatingPairing.objects.filter(run=self.r1).order_by("id"))
+
+        client = APIClient()
+        client.login(username="test", password="test")
+        for pairing in queued:
+            response = client.post("/api/tasks/", {"git_revision": "1111222233334444555566667777888899990000"})
+            assert response.status_code == 200
+            assert response.data["kind"] == "rating"
+            assert response.data["white_network"]["name"] == pairing.white_network.name
+            assert response.data["black_network"]["name"] == pairing.black_network.name
+        assert PendingRatingPairing.objects.filter(run=self.r1).count() == 0
+
+        # Once the queue is empty, pairings are computed on the fly again
+        response = client.post("/api/tasks/", {"git_revision": "1111222233334444555566667777888899990000"})
+        assert response.status_code == 200
+        assert response.data["kind"] == "rating"
+
+    def test_disabled_network_pairings_dropped(self):
+        refill_rating_pairing_queue()
+        self.n2.rating_games_enabled = False
+        self.n2.save()
+        assert RatingPairingQueueService(self.r1).pop_pairing(None) is None
+
+    def test_network_delay_buckets(self):
+        self.r1.min_network_usage_delay = 100
+        self.r1.max_network_usage_delay = 900
+        queue = RatingPairingQueueService(self.r1)
+        assert queue.get_network_delay_bucket(100) == 0
+        assert queue.get_network_delay_bucket(199) == 0
+        assert queue.get_network_delay_bucket(200) == 1
+        assert queue.get_network_delay_bucket(900) == queue.num_network_delay_buckets - 1
+        assert queue.get_bucket_network_delay(0) == 200
+        assert queue.get_bucket_network_delay(queue.num_network_delay_buckets - 1) == 900
+
+
 class TestGetSelfplayTaskWithNetworkFile:
     def setup_method(self):
         self.u1 = User.objects.create_user(username="test", password="test")
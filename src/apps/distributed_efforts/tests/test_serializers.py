@@ -0,0 +1,65 @@
+import pytest
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from src.apps.runs.models import Run
+from src.apps.runs.serializers import FastRunSerializerForClient, RunSerializerForClient
+from src.apps.trainings.models import Network
+from src.apps.trainings.serializers import FastNetworkSerializerForTasks, NetworkSerializerForTasks
+
+pytestmark = pytest.mark.django_db
+
+fake_sha256 = "12341234abcdabcd56785678abcdabcd12341234abcdabcd56785678abcdabcd"
+
+
+class TestFastSerializerParity:
+    def setup_method(self):
+        self.r1 = Run.objects.create(
+            name="testrun",
+            rating_game_probability=0.0,
+            status="Active",
+        )
+        self.n1 = Network.objects.create(
+            run=self.r1,
+            name="testrun-randomnetwork",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            is_random=True,
+        )
+        self.n2 = Network.objects.create(
+            run=self.r1,
+            name="testrun-s100-d2000 (retry)",
+            model_file="networks/models/testrun/testrun-s100-d2000.bin.gz",
+            model_file_bytes=1234,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            is_random=False,
+        )
+        self.requests = [
+            None,
+            APIRequestFactory().post("/api/tasks/"),
+            APIRequestFactory().get("/api/networks/newest_training/", secure=True),
+            APIRequestFactory().get("/api/networks/newest_training/?format=json"),
+        ]
+
+    def teardown_method(self):
+        self.n2.delete()
+        self.n1.delete()
+        self.r1.delete()
+
+    def test_run_for_client(self):
+        for request in self.requests:
+            expected = RunSerializerForClient(self.r1, context={"request": request}).data
+            actual = FastRunSerializerForClient.serialize(self.r1, request)
+            assert actual == expected
+            assert JSONRenderer().render(actual) == JSONRenderer().render(expected)
+
+    def test_network_for_tasks(self):
+        for network in [self.n1, self.n2]:
+            for request in self.requests:
+                expected = NetworkSerializerForTasks(network, context={"request": request}).data
+                actual = FastNetworkSerializerForTasks.serialize(network, request)
+                assert actual == expected
+                assert JSONRenderer().render(actual) == JSONRenderer().render(expected)
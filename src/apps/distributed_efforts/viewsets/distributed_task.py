@@ -3,21 +3,26 @@ import random
 from hashlib import md5
 from struct import unpack
 
-from django.db import IntegrityError
 from rest_framework import serializers, viewsets
+from rest_framework.decorators import action
 from rest_framework.response import Response
-
-from src.apps.distributed_efforts.models import UserLastVersion
-from src.apps.distributed_efforts.services import RatingNetworkPairerService
-from src.apps.runs.models import Run
-from src.apps.runs.serializers import RunSerializerForClient
-from src.apps.startposes.models import StartPos
-from src.apps.trainings.models import Network
-from src.apps.trainings.serializers import NetworkSerializerForTasks
+from rest_framework.reverse import reverse
+
+from src.apps.distributed_efforts.services import (
+    RatingNetworkPairerService,
+    RatingPairingQueueService,
+    UserLastVersionRecorder,
+)
+from src.apps.runs.serializers import FastRunSerializerForClient
+from src.apps.runs.services import RunSnapshotService
+from src.apps.startposes.services import StartPosSamplerService
+from src.apps.trainings.services import NetworkTaskPayloadService, NetworkTimelineService
 from src.contrib.permission import AuthOnly
 
 logger = logging.getLogger(__name__)
 
+MAX_TASK_BATCH_COUNT = 64
+
 
 class TaskCreateSerializer(serializers.Serializer):
     allow_rating_task = serializers.BooleanField(default=True)
@@ -25,6 +30,7 @@ class TaskCreateSerializer(serializers.Serializer):
     task_rep_factor = serializers.IntegerField(default=1)
     git_revision = serializers.CharField(default="", allow_blank=True)
     client_instance_id = serializers.CharField(default="", allow_blank=True)
+    config_by_hash = serializers.BooleanField(default=False)
 
     def validate(self, data):
         if not data.get("allow_rating_task") and not data.get("allow_selfplay_task"):
@@ -32,34 +38,127 @@ class TaskCreateSerializer(serializers.Serializer):
         return data
 
 
+class TaskBatchCreateSerializer(TaskCreateSerializer):
+    count = serializers.IntegerField(default=1)
+
+
+class TaskRequestContext:
+    """
+    Everything about a validated task request that does not change from one task to the next,
+    so that a batch of tasks pays for run lookup, validation and serialization of shared parts only once.
+    """
+
+    def __init__(self, request, current_run_snapshot, data, network_delay):
+        self.request = request
+        self.current_run_snapshot = current_run_snapshot
+        self.current_run = current_run_snapshot.run
+        self.data = data
+        self.network_delay = network_delay
+        self.run_content = FastRunSerializerForClient.serialize(self.current_run, request)
+        self.pairer = RatingNetworkPairerService(self.current_run, network_delay)
+        self.pairing_queue = RatingPairingQueueService(self.current_run)
+        self._best_network = None
+        self._network_contents = {}
+
+    def get_best_network(self):
+        if self._best_network is None:
+            self._best_network = NetworkTimelineService.get(self.current_run).select_most_recent(self.network_delay)
+        return self._best_network
+
+    def get_config_content(self, config, config_hash):
+        """
+        :return: dict of the config fields of a task, either the config itself or, if the client asked for it,
+                 its hash and the url it can be downloaded and cached from
+        """
+        if not self.data["config_by_hash"]:
+            return {"config": config}
+        config_url = reverse(
+            "run-config",
+            kwargs={"name": self.current_run.name, "config_hash": config_hash},
+            request=self.request,
+        )
+        return {"config_hash": config_hash, "config_url": config_url}
+
+    def get_network_content(self, network):
+        if network.pk not in self._network_contents:
+            self._network_contents[network.pk] = NetworkTaskPayloadService.get(network, self.request)
+        return self._network_contents[network.pk]
+
+
 class DistributedTaskViewSet(viewsets.ViewSet):
     permission_classes = [AuthOnly]
 
     # noinspection PyMethodMayBeStatic
     def create(self, request):
-        current_run = Run.objects.select_current()
-        if current_run is None:
-            return Response({"error": "No active run."}, status=404)
+        task_context, error_response = self._prepare_task_request(request, TaskCreateSerializer)
+        if error_response is not None:
+            return error_response
+
+        response_body, error_response = self._generate_task(task_context)
+        if error_response is not None:
+            return error_response
+        return Response(response_body)
+
+    @action(detail=False, methods=["POST"])
+    def batch(self, request):
+        """
+        API endpoint that hands out several tasks at once, for clients that would otherwise request them one by one.
+        Each task is drawn exactly as by a separate request, but authentication, run and whitelist checks and
+        network selection are done only once for the whole batch.
+        """
+        task_context, error_response = self._prepare_task_request(request, TaskBatchCreateSerializer)
+        if error_response is not None:
+            return error_response
+
+        count = task_context.data["count"]
+        if count < 1 or count > MAX_TASK_BATCH_COUNT:
+            return Response(
+                {"error": f"count was not an integer from 1 to {MAX_TASK_BATCH_COUNT}"},
+                status=400,
+            )
+
+        tasks = []
+        for _ in range(count):
+            response_body, error_response = self._generate_task(task_context)
+            if error_response is not None:
+                return error_response
+            tasks.append(response_body)
+        return Response({"tasks": tasks})
+
+    # noinspection PyMethodMayBeStatic
+    def _prepare_task_request(self, request, serializer_class):
+        """
+        Validate a task request against the current run and record the client version.
+
+        :return: Tuple of (TaskRequestContext, None), or (None, error response)
+        """
+        current_run_snapshot = RunSnapshotService.get_current()
+        if current_run_snapshot is None:
+            return None, Response({"error": "No active run."}, status=404)
+        current_run = current_run_snapshot.run
         if not request.user:
-            return Response({"error": "Unknown user."}, status=403)
-        if not current_run.is_allowed_username(request.user.username):
-            return Response({"error": "This run is currently closed except for private testing."}, status=403)
+            return None, Response({"error": "Unknown user."}, status=403)
+        if not current_run_snapshot.is_allowed_username(request.user.username):
+            return None, Response(
+                {"error": "This run is currently closed except for private testing."},
+                status=403,
+            )
 
-        serializer = TaskCreateSerializer(data=request.data)
+        serializer = serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
         data = serializer.validated_data
 
         git_revision = str(data["git_revision"])
         # Git revision hashes are at least 40 chars, we can also optionally allow plus revisions and other stuff
         if len(git_revision) < 40 or len(git_revision) > 80:
-            return Response(
+            return None, Response(
                 {
                     "error": "This version of KataGo is not usable for distributed because either it's had custom modifications or has been compiled without version info."
                 },
                 status=400,
             )
-        elif not current_run.is_git_in_whitelist(git_revision):
-            return Response(
+        elif not current_run_snapshot.is_git_in_whitelist(git_revision):
+            return None, Response(
                 {
                     "error": "This version of KataGo is not enabled for distributed. If this exact version was working previously, then changes in the run require a newer version - please update KataGo to the latest version or release. But if this is already the official newest version of KataGo, or you think that not enabling this version is an oversight, please ask server admins to enable the following version hash: "
                     + git_revision
@@ -68,31 +167,24 @@ class DistributedTaskViewSet(viewsets.ViewSet):
             )
 
         # Update server records of what version of the client the user is using
-        try:
-            UserLastVersion.objects.update_or_create(user=request.user, defaults={"git_revision": git_revision})
-        # Make sure that on a db race between django instances, we don't fail, recording stuff in this table is only informational
-        except IntegrityError:
-            pass
+        UserLastVersionRecorder.record(request.user, git_revision)
 
         allow_rating_task = data["allow_rating_task"]
         allow_selfplay_task = data["allow_selfplay_task"]
         if not allow_rating_task and current_run.rating_game_probability >= 1.0:
-            return Response(
+            return None, Response(
                 {"error": "allow_rating_task is false but this server is only serving rating games right now"},
                 status=400,
             )
         if not allow_selfplay_task and current_run.rating_game_probability <= 0.0:
-            return Response(
+            return None, Response(
                 {"error": "allow_selfplay_task is false but this server is only serving selfplay games right now"},
                 status=400,
             )
 
         task_rep_factor = data["task_rep_factor"]
         if task_rep_factor < 1 or task_rep_factor > 64:
-            return Response({"error": "task_rep_factor was not an integer from 1 to 64"}, status=400)
-
-        serializer_context = {"request": request}  # Used by NetworkSerializer hyperlinked field to build and url ref
-        run_content = RunSerializerForClient(current_run, context=serializer_context)
+            return None, Response({"error": "task_rep_factor was not an integer from 1 to 64"}, status=400)
 
         network_delay = None
         if current_run.max_network_usage_delay > 0:
@@ -105,44 +197,51 @@ class DistributedTaskViewSet(viewsets.ViewSet):
             randval = float(unpack("L", md5(delay_seed.encode("utf-8")).digest()[:8])[0]) / 2 ** 64
             network_delay = min_delay + (max_delay - min_delay) * randval
 
+        return TaskRequestContext(request, current_run_snapshot, data, network_delay), None
+
+    # noinspection PyMethodMayBeStatic
+    def _generate_task(self, task_context):
+        """
+        Draw a single selfplay or rating task for an already validated request.
+
+        :return: Tuple of (response body, None), or (None, error response)
+        """
+        current_run = task_context.current_run
+        data = task_context.data
+        allow_rating_task = data["allow_rating_task"]
+        allow_selfplay_task = data["allow_selfplay_task"]
+
         if not allow_selfplay_task or (allow_rating_task and random.random() < current_run.rating_game_probability):
-            pairer = RatingNetworkPairerService(current_run, network_delay)
-            pairing = pairer.generate_pairing()
+            # Prefer a pairing precomputed in the background, and only pair networks here when the queue ran dry
+            pairing = task_context.pairing_queue.pop_pairing(task_context.network_delay)
+            if pairing is None:
+                pairing = task_context.pairer.generate_pairing()
             if pairing is not None:
                 (white_network, black_network) = pairing
-                white_network_content = NetworkSerializerForTasks(white_network, context=serializer_context)
-                black_network_content = NetworkSerializerForTasks(black_network, context=serializer_context)
                 response_body = {
                     "kind": "rating",
-                    "run": run_content.data,
-                    "config": current_run.rating_client_config,
-                    "white_network": white_network_content.data,
-                    "black_network": black_network_content.data,
+                    "run": task_context.run_content,
+                    **task_context.get_config_content(
+                        current_run.rating_client_config, task_context.current_run_snapshot.rating_client_config_hash
+                    ),
+                    "white_network": task_context.get_network_content(white_network),
+                    "black_network": task_context.get_network_content(black_network),
                 }
-                return Response(response_body)
-
-        start_poses = []
-        for rep in range(task_rep_factor):
-            if not current_run.startpos_locked and random.random() < current_run.selfplay_startpos_probability:
-                start_pos = StartPos.objects.select_weighted_random()
-                if start_pos is not None:
-                    start_poses.append(start_pos.data)
-
-        try:
-            best_network = Network.objects.select_most_recent(
-                current_run, for_training_games=True, network_delay=network_delay
-            )
-            if best_network is None:
-                return Response({"error": "No networks found for run enabled for training games."}, status=400)
-        except Network.DoesNotExist:
-            return Response({"error": "No networks found for run enabled for training games."}, status=400)
+                return response_body, None
+
+        start_poses = StartPosSamplerService.select_start_poses(current_run, data["task_rep_factor"])
+
+        best_network = task_context.get_best_network()
+        if best_network is None:
+            return None, Response({"error": "No networks found for run enabled for training games."}, status=400)
 
-        best_network_content = NetworkSerializerForTasks(best_network, context=serializer_context)
         response_body = {
             "kind": "selfplay",
-            "run": run_content.data,
-            "config": current_run.selfplay_client_config,
-            "network": best_network_content.data,
+            "run": task_context.run_content,
+            **task_context.get_config_content(
+                current_run.selfplay_client_config, task_context.current_run_snapshot.selfplay_client_config_hash
+            ),
+            "network": task_context.get_network_content(best_network),
             "start_poses": start_poses,
         }
-        return Response(response_body)
+        return response_body, None
@@ -1,7 +1,14 @@
 from django.contrib import admin
 
-from src.apps.games.admin.game_admin import RatingGameAdmin, TrainingGameAdmin
-from src.apps.games.models import RatingGame, TrainingGame
+from src.apps.games.admin.game_admin import (
+    PendingTrainingGameAdmin,
+    RatingGameAdmin,
+    TrainingDataShardAdmin,
+    TrainingGameAdmin,
+)
+from src.apps.games.models import PendingTrainingGame, RatingGame, TrainingDataShard, TrainingGame
 
 admin.site.register(RatingGame, RatingGameAdmin)
 admin.site.register(TrainingGame, TrainingGameAdmin)
+admin.site.register(PendingTrainingGame, PendingTrainingGameAdmin)
+admin.site.register(TrainingDataShard, TrainingDataShardAdmin)
@@ -123,3 +123,27 @@ class TrainingGameAdmin(admin.ModelAdmin):
         if is_creating_a_new_game:
             obj.submitted_by = request.user
         super().save_model(request, obj, form, change)
+
+
+class PendingTrainingGameAdmin(admin.ModelAdmin):
+    """
+    PendingTrainingGameAdmin allows admin to follow training games ingested in the background
+    """
+
+    list_filter = ("status", "created_at")
+    list_display = ("id", "created_at", "updated_at", "status", "attempts", "submitted_by", "training_game")
+    readonly_fields = ("id", "created_at", "updated_at", "spool_dir", "form_data", "training_game")
+    raw_id_fields = ("submitted_by",)
+    ordering = ("-pk",)
+
+
+class TrainingDataShardAdmin(admin.ModelAdmin):
+    """
+    TrainingDataShardAdmin allows admin to see the training data compacted so far
+    """
+
+    list_filter = ("run", "day")
+    list_display = ("id", "run", "network", "day", "shard_index", "num_games", "num_rows", "created_at")
+    readonly_fields = ("id", "created_at", "game_ids")
+    raw_id_fields = ("network",)
+    ordering = ("-pk",)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from src.apps.games.models import RatingPairStats
+from src.apps.runs.models import Run
+
+
+class Command(BaseCommand):
+    help = "Recompute the rating game totals by pair of networks from the rating games."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--run", help="Name of the run to rebuild, instead of all runs.")
+
+    def handle(self, *args, **options):
+        run = None
+        if options["run"] is not None:
+            run = Run.objects.filter(name=options["run"]).first()
+            if run is None:
+                raise CommandError(f"No run named {options['run']}")
+
+        RatingPairStats.objects.rebuild(run)
+        num_pairs = RatingPairStats.objects.filter(**({} if run is None else {"run": run})).count()
+        self.stdout.write(f"Rebuilt totals of {num_pairs} pairs of networks")
@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db.models import F, Manager
+from django.utils import timezone
+
+# Files of a training game upload that are spooled to disk, with the name each is spooled under
+SPOOLED_FILE_NAMES = {
+    "sgf_file": "game.sgf",
+    "training_data_file": "game.npz",
+}
+
+
+class PendingTrainingGameManager(Manager):
+    def spool(self, submitted_by, form_data, files):
+        """
+        Write the files of a training game upload to a new directory of TRAINING_GAME_SPOOL_DIR, and record it as
+        pending, to be ingested later by the ingest_training_game task.
+
+        :param form_data: dict of the other fields of the upload, as they were posted
+        :param files: dict of field name -> uploaded file, for each of SPOOLED_FILE_NAMES
+        :return: the new pending training game
+        """
+        os.makedirs(settings.TRAINING_GAME_SPOOL_DIR, exist_ok=True)
+        spool_dir = tempfile.mkdtemp(prefix="upload-", dir=settings.TRAINING_GAME_SPOOL_DIR)
+        try:
+            for (field_name, spooled_name) in SPOOLED_FILE_NAMES.items():
+                with open(os.path.join(spool_dir, spooled_name), "wb") as spooled_file:
+                    for chunk in files[field_name].chunks():
+                        spooled_file.write(chunk)
+            return self.create(submitted_by=submitted_by, form_data=form_data, spool_dir=spool_dir)
+        except BaseException:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+            raise
+
+    def record_failed_attempt(self, pending_training_game_id, errors):
+        """
+        Count an attempt at ingesting a pending training game that could not complete, keeping it pending.
+        """
+        self.filter(pk=pending_training_game_id, status=self.model.PendingStatus.PENDING).update(
+            attempts=F("attempts") + 1, errors=errors, updated_at=timezone.now()
+        )
+
+    def select_stale(self, older_than):
+        """
+        :return: queryset of the training games still pending that were created or last attempted before older_than
+        """
+        return self.filter(status=self.model.PendingStatus.PENDING, updated_at__lt=older_than).order_by("id")
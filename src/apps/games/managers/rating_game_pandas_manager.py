@@ -1,21 +1,44 @@
 import logging
 from datetime import timedelta
 
+import numpy as np
 import pandas
 from django.db.models import Manager
 from django.utils import timezone
-from django_pandas.io import read_frame
 
 from src.apps.games.managers.rating_game_pandas_queryset import RatingGamePandasQuerySet
 from src.apps.runs.models import Run
+from src.contrib.columnar_fetch import fetch_columns
 
 logger = logging.getLogger(__name__)
 
+PAIR_TOTALS_COLUMNS = [
+    ("white_network", np.int64),
+    ("black_network", np.int64),
+    ("games", np.int64),
+    ("white_wins", np.int64),
+    ("black_wins", np.int64),
+    ("draws", np.int64),
+]
+
+PAIR_TOTALS_SQL = """
+SELECT
+  white_network_id::bigint,
+  black_network_id::bigint,
+  count(*)::bigint,
+  (count(*) FILTER (WHERE winner = 'W'))::bigint,
+  (count(*) FILTER (WHERE winner = 'B'))::bigint,
+  (count(*) FILTER (WHERE winner IN ('0', '-')))::bigint
+FROM games_ratinggame
+WHERE run_id = %s AND created_at < %s AND NOT disabled
+GROUP BY white_network_id, black_network_id
+"""
+
 
 class RatingGamePandasManager(Manager):
     """
-    RatingGamePandasManager generates a tournament result using RatingGamePandasQuerySet
-    which is use to update the Elo ratings.
+    RatingGamePandasManager generates a tournament result, which is use to update the Elo ratings,
+    from a single query totalling the games of each (white, black) pair of networks.
 
     Every game played is present BOTH ways. If player 1 plays player 2, then this game
     should be included in the stats for reference_network = player 1 and
@@ -48,38 +71,48 @@ class RatingGamePandasManager(Manager):
         else:
             before_time = timezone.now() - timedelta(seconds=15)
 
-        queryset = self.get_queryset()
-
-        tournament_results = read_frame(queryset.get_total_games_count_as_white(run, before_time))
-        tournament_results = pandas.merge(
-            tournament_results,
-            read_frame(queryset.get_total_games_count_as_black(run, before_time)),
-            how="outer",
-            on=["reference_network", "opponent_network"],
-        )
-        tournament_results = pandas.merge(
-            tournament_results,
-            read_frame(queryset.get_total_wins_count_as_white(run, before_time)),
-            how="outer",
-            on=["reference_network", "opponent_network"],
-        )
-        tournament_results = pandas.merge(
-            tournament_results,
-            read_frame(queryset.get_total_wins_count_as_black(run, before_time)),
-            how="outer",
-            on=["reference_network", "opponent_network"],
-        )
-        tournament_results = pandas.merge(
-            tournament_results,
-            read_frame(queryset.get_total_draw_or_no_result_as_white(run, before_time)),
-            how="outer",
-            on=["reference_network", "opponent_network"],
-        )
-        tournament_results = pandas.merge(
-            tournament_results,
-            read_frame(queryset.get_total_draw_or_no_result_as_black(run, before_time)),
-            how="outer",
-            on=["reference_network", "opponent_network"],
-        )
-        tournament_results.fillna(0, inplace=True)
-        return tournament_results
+        pair_totals = fetch_columns(PAIR_TOTALS_SQL, [run.pk, before_time], PAIR_TOTALS_COLUMNS, using=self.db)
+        return get_tournament_results_from_pair_totals(pair_totals)
+
+
+def get_tournament_results_from_pair_totals(pair_totals):
+    """
+    :param pair_totals: dict of PAIR_TOTALS_COLUMNS arrays, holding the games of each (white, black) pair of networks
+    :return: tournament results, with every game present BOTH ways
+    """
+    zeros = np.zeros(len(pair_totals["white_network"]), dtype=np.int64)
+    tournament_results = pandas.DataFrame(
+        {
+            "reference_network": np.concatenate([pair_totals["white_network"], pair_totals["black_network"]]),
+            "opponent_network": np.concatenate([pair_totals["black_network"], pair_totals["white_network"]]),
+            "total_games_white": np.concatenate([pair_totals["games"], zeros]),
+            "total_games_black": np.concatenate([zeros, pair_totals["games"]]),
+            "total_wins_white": np.concatenate([pair_totals["white_wins"], zeros]),
+            "total_wins_black": np.concatenate([zeros, pair_totals["black_wins"]]),
+            "total_draw_or_no_result_white": np.concatenate([pair_totals["draws"], zeros]),
+            "total_draw_or_no_result_black": np.concatenate([zeros, pair_totals["draws"]]),
+        }
+    )
+    # A pair of networks that played with both colors appears twice from each side, once per color
+    return tournament_results.groupby(["reference_network", "opponent_network"], as_index=False, sort=False).sum()
+
+
+def get_pair_totals_from_tournament_results(tournament_results):
+    """
+    The reverse of get_tournament_results_from_pair_totals, black wins being the white games neither won nor drawn
+
+    :param tournament_results: tournament results, with every game present BOTH ways
+    :return: dict of PAIR_TOTALS_COLUMNS arrays, holding the games of each (white, black) pair of networks
+    """
+    white_results = tournament_results[tournament_results["total_games_white"] > 0]
+    games = white_results["total_games_white"].to_numpy(dtype=np.int64)
+    white_wins = white_results["total_wins_white"].to_numpy(dtype=np.int64)
+    draws = white_results["total_draw_or_no_result_white"].to_numpy(dtype=np.int64)
+    return {
+        "white_network": white_results["reference_network"].to_numpy(dtype=np.int64),
+        "black_network": white_results["opponent_network"].to_numpy(dtype=np.int64),
+        "games": games,
+        "white_wins": white_wins,
+        "black_wins": games - white_wins - draws,
+        "draws": draws,
+    }
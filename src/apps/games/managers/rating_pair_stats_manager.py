@@ -0,0 +1,59 @@
+from django.db import connection, transaction
+from django.db.models import Manager
+
+from src.apps.games.managers.rating_game_pandas_manager import (
+    PAIR_TOTALS_COLUMNS,
+    get_tournament_results_from_pair_totals,
+)
+from src.apps.runs.models import Run
+from src.contrib.columnar_fetch import fetch_columns
+
+PAIR_STATS_SQL = """
+SELECT
+  white_network_id::bigint,
+  black_network_id::bigint,
+  games::bigint,
+  white_wins::bigint,
+  black_wins::bigint,
+  draws::bigint
+FROM games_ratingpairstats
+WHERE run_id = %s AND games > 0
+"""
+
+REBUILD_RATING_PAIR_STATS_SQL = """
+INSERT INTO games_ratingpairstats (run_id, white_network_id, black_network_id, games, white_wins, black_wins, draws)
+SELECT
+  run_id,
+  white_network_id,
+  black_network_id,
+  count(*),
+  count(*) FILTER (WHERE winner = 'W'),
+  count(*) FILTER (WHERE winner = 'B'),
+  count(*) FILTER (WHERE winner IN ('0', '-'))
+FROM games_ratinggame
+WHERE NOT disabled {run_filter}
+GROUP BY run_id, white_network_id, black_network_id
+"""
+
+
+class RatingPairStatsManager(Manager):
+    """
+    RatingPairStatsManager turns the running totals of rating games by (white, black) pair into the tournament result
+    used to update the Elo ratings, in the same format as RatingGamePandasManager.
+    """
+
+    def get_detailed_tournament_results_dataframe(self, run: Run):
+        pair_totals = fetch_columns(PAIR_STATS_SQL, [run.pk], PAIR_TOTALS_COLUMNS, using=self.db)
+        return get_tournament_results_from_pair_totals(pair_totals)
+
+    def rebuild(self, run: Run = None):
+        """
+        Recompute the totals from the rating games, of the given run or else of all runs. Rating games are locked
+        against writes meanwhile, so that no trigger update can be lost or counted twice.
+        """
+        run_filter = "" if run is None else "AND run_id = %s"
+        params = [] if run is None else [run.pk]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("LOCK TABLE games_ratinggame IN SHARE MODE")
+            cursor.execute(f"DELETE FROM games_ratingpairstats WHERE TRUE {run_filter}", params)
+            cursor.execute(REBUILD_RATING_PAIR_STATS_SQL.format(run_filter=run_filter), params)
@@ -0,0 +1,32 @@
+from django.db.models import Manager
+
+
+class TrainingDataShardManager(Manager):
+    def select_compacted_network_days(self, run, since=None):
+        """
+        :return: set of (network id, day) whose training data is compacted already, from day since if given
+        """
+        shards = self.filter(run=run)
+        if since is not None:
+            shards = shards.filter(day__gte=since)
+        return set(shards.values_list("network_id", "day").distinct())
+
+    def get_manifest(self, run):
+        """
+        :return: dict listing every shard of the run, for the trainer
+        """
+        shards = self.filter(run=run).select_related("network").order_by("day", "network_id", "shard_index")
+        return {
+            "run": run.name,
+            "shards": [
+                {
+                    "path": shard.data_file.name,
+                    "network": shard.network.name,
+                    "day": shard.day.isoformat(),
+                    "shard_index": shard.shard_index,
+                    "num_games": shard.num_games,
+                    "num_rows": shard.num_rows,
+                }
+                for shard in shards.iterator()
+            ],
+        }
@@ -0,0 +1,121 @@
+# Generated by Django 3.0.11 on 2021-02-14 16:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Each game inserted locks the row of its pair until its transaction commits, which is the whole request under
+# ATOMIC_REQUESTS, so many games inserted at once must be in (white_network_id, black_network_id) order.
+CREATE_TRIGGERS_SQL = """
+CREATE FUNCTION games_ratingpairstats_add(
+  game_run_id integer, game_white_network_id bigint, game_black_network_id bigint, game_winner varchar, sign integer
+) RETURNS void AS $$
+BEGIN
+  INSERT INTO games_ratingpairstats (run_id, white_network_id, black_network_id, games, white_wins, black_wins, draws)
+  VALUES (
+    game_run_id,
+    game_white_network_id,
+    game_black_network_id,
+    sign,
+    CASE WHEN game_winner = 'W' THEN sign ELSE 0 END,
+    CASE WHEN game_winner = 'B' THEN sign ELSE 0 END,
+    CASE WHEN game_winner IN ('0', '-') THEN sign ELSE 0 END
+  )
+  ON CONFLICT (run_id, white_network_id, black_network_id) DO UPDATE SET
+    games = games_ratingpairstats.games + EXCLUDED.games,
+    white_wins = games_ratingpairstats.white_wins + EXCLUDED.white_wins,
+    black_wins = games_ratingpairstats.black_wins + EXCLUDED.black_wins,
+    draws = games_ratingpairstats.draws + EXCLUDED.draws;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION games_ratingpairstats_trigger() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    IF NOT OLD.disabled THEN
+      PERFORM games_ratingpairstats_add(OLD.run_id, OLD.white_network_id, OLD.black_network_id, OLD.winner, -1);
+    END IF;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    IF NOT NEW.disabled THEN
+      PERFORM games_ratingpairstats_add(NEW.run_id, NEW.white_network_id, NEW.black_network_id, NEW.winner, 1);
+    END IF;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER games_ratingpairstats_insert
+AFTER INSERT ON games_ratinggame
+FOR EACH ROW EXECUTE FUNCTION games_ratingpairstats_trigger();
+
+CREATE TRIGGER games_ratingpairstats_update
+AFTER UPDATE OF run_id, white_network_id, black_network_id, winner, disabled ON games_ratinggame
+FOR EACH ROW
+WHEN (
+  (OLD.run_id, OLD.white_network_id, OLD.black_network_id, OLD.winner, OLD.disabled)
+  IS DISTINCT FROM (NEW.run_id, NEW.white_network_id, NEW.black_network_id, NEW.winner, NEW.disabled)
+)
+EXECUTE FUNCTION games_ratingpairstats_trigger();
+
+CREATE TRIGGER games_ratingpairstats_delete
+AFTER DELETE ON games_ratinggame
+FOR EACH ROW EXECUTE FUNCTION games_ratingpairstats_trigger();
+
+LOCK TABLE games_ratinggame IN SHARE MODE;
+
+INSERT INTO games_ratingpairstats (run_id, white_network_id, black_network_id, games, white_wins, black_wins, draws)
+SELECT
+  run_id,
+  white_network_id,
+  black_network_id,
+  count(*),
+  count(*) FILTER (WHERE winner = 'W'),
+  count(*) FILTER (WHERE winner = 'B'),
+  count(*) FILTER (WHERE winner IN ('0', '-'))
+FROM games_ratinggame
+WHERE NOT disabled
+GROUP BY run_id, white_network_id, black_network_id;
+"""
+
+DROP_TRIGGERS_SQL = """
+DROP TRIGGER games_ratingpairstats_delete ON games_ratinggame;
+DROP TRIGGER games_ratingpairstats_update ON games_ratinggame;
+DROP TRIGGER games_ratingpairstats_insert ON games_ratinggame;
+DROP FUNCTION games_ratingpairstats_trigger();
+DROP FUNCTION games_ratingpairstats_add(integer, bigint, bigint, varchar, integer);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('runs', '0015_run_elo_convergence'),
+        ('trainings', '0014_network_log_gamma_offset'),
+        ('games', '0016_auto_20210131_1548'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingPairStats',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('games', models.IntegerField(default=0, verbose_name='games')),
+                ('white_wins', models.IntegerField(default=0, verbose_name='white wins')),
+                ('black_wins', models.IntegerField(default=0, verbose_name='black wins')),
+                ('draws', models.IntegerField(default=0, verbose_name='draws or no results')),
+                ('black_network', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='trainings.Network', verbose_name='black player network')),
+                ('run', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='runs.Run', verbose_name='run')),
+                ('white_network', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='trainings.Network', verbose_name='white player network')),
+            ],
+            options={
+                'verbose_name': 'RatingPairStats',
+                'verbose_name_plural': 'RatingPairStats',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ratingpairstats',
+            constraint=models.UniqueConstraint(fields=('run', 'white_network', 'black_network'), name='games_ratingpairstats_pair'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS_SQL, DROP_TRIGGERS_SQL),
+    ]
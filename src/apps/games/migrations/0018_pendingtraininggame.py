@@ -0,0 +1,40 @@
+# Generated by Django 3.0.11 on 2021-02-21 11:37
+
+from django.conf import settings
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('games', '0017_ratingpairstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingTrainingGame',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='creation date')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='last attempt date')),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Done', 'Done'), ('Failed', 'Failed')], default='Pending', max_length=15, verbose_name='status')),
+                ('attempts', models.IntegerField(default=0, help_text='Number of attempts at ingesting the game', verbose_name='attempts')),
+                ('form_data', django.contrib.postgres.fields.jsonb.JSONField(default=dict, help_text='Fields of the upload other than its files', verbose_name='form data')),
+                ('spool_dir', models.CharField(max_length=300, verbose_name='spool directory')),
+                ('errors', django.contrib.postgres.fields.jsonb.JSONField(blank=True, help_text='Errors of the last attempt, if any', null=True, verbose_name='errors')),
+                ('submitted_by', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='submitted by')),
+                ('training_game', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='games.TrainingGame', verbose_name='training game')),
+            ],
+            options={
+                'verbose_name': 'Pending training game',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='pendingtraininggame',
+            index=models.Index(condition=models.Q(status='Pending'), fields=['updated_at'], name='games_pendingtg_pending'),
+        ),
+    ]
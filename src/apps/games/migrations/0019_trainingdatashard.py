@@ -0,0 +1,41 @@
+# Generated by Django 3.0.11 on 2021-02-27 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+import src.apps.games.models.training_data_shard
+import src.contrib.variable_storage_file_field
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('runs', '0017_run_elo_use_full_covariance_uncertainty'),
+        ('trainings', '0015_networkratingsnapshot'),
+        ('games', '0018_pendingtraininggame'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingDataShard',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField(verbose_name='day')),
+                ('shard_index', models.IntegerField(default=0, verbose_name='shard index')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='creation date')),
+                ('data_file', src.contrib.variable_storage_file_field.VariableStorageFileField(max_length=200, upload_to=src.apps.games.models.training_data_shard.upload_training_data_shard_to, verbose_name='training data (npz)')),
+                ('num_games', models.IntegerField(default=0, verbose_name='num games')),
+                ('num_rows', models.IntegerField(default=0, verbose_name='num training rows')),
+                ('game_ids', models.BinaryField(help_text='Ids of the games of the shard, in order', verbose_name='training game ids')),
+                ('network', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='trainings.Network', verbose_name='network')),
+                ('run', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='runs.Run', verbose_name='run')),
+            ],
+            options={
+                'verbose_name': 'Training data shard',
+                'ordering': ['day', 'network', 'shard_index'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='trainingdatashard',
+            constraint=models.UniqueConstraint(fields=('run', 'day', 'network', 'shard_index'), name='games_trainingdatashard_shard'),
+        ),
+    ]
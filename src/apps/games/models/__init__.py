@@ -1,4 +1,7 @@
 from .abstract_game import upload_sgf_to
 from .game_count_views import DayGameCountByUser, GameCountByNetwork, GameCountByUser, RecentGameCountByUser
+from .pending_training_game import PendingTrainingGame
 from .rating_game import RatingGame
+from .rating_pair_stats import RatingPairStats
+from .training_data_shard import TrainingDataShard
 from .training_game import TrainingGame, upload_training_data_to, validate_game_npzdata
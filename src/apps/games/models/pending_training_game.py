@@ -0,0 +1,94 @@
+import os
+import shutil
+
+from django.contrib.postgres.fields import JSONField
+from django.core.files import File
+from django.db.models import (
+    CASCADE,
+    SET_NULL,
+    BigAutoField,
+    CharField,
+    DateTimeField,
+    ForeignKey,
+    Index,
+    IntegerField,
+    Model,
+    Q,
+    TextChoices,
+)
+from django.utils.translation import gettext_lazy as _
+
+from src.apps.games.managers.pending_training_game_manager import SPOOLED_FILE_NAMES, PendingTrainingGameManager
+from src.apps.games.models.training_game import TrainingGame
+from src.apps.users.models import User
+
+
+class PendingTrainingGame(Model):
+    """
+    A training game upload that was spooled to local disk and acknowledged, but not validated nor stored yet.
+
+    The ingest_training_game task validates it exactly as a direct upload, writes its files to storage and creates
+    the TrainingGame, after which the pending training game is done, or failed if it was not valid. Attempts that fail
+    for any other reason, such as the storage being unavailable, are retried and leave it pending.
+    """
+
+    objects = PendingTrainingGameManager()
+
+    class PendingStatus(TextChoices):
+        PENDING = "Pending", _("Pending")
+        DONE = "Done", _("Done")
+        FAILED = "Failed", _("Failed")
+
+    class Meta:
+        verbose_name = _("Pending training game")
+        ordering = ["-created_at"]
+        indexes = [
+            Index(
+                fields=["updated_at"],
+                name="games_pendingtg_pending",
+                condition=Q(status="Pending"),
+            )
+        ]
+
+    id = BigAutoField(primary_key=True)
+    created_at = DateTimeField(_("creation date"), auto_now_add=True)
+    updated_at = DateTimeField(_("last attempt date"), auto_now=True)
+    submitted_by = ForeignKey(User, verbose_name=_("submitted by"), on_delete=CASCADE, related_name="+", db_index=False)
+    status = CharField(
+        _("status"),
+        max_length=15,
+        choices=PendingStatus.choices,
+        default=PendingStatus.PENDING,
+    )
+    attempts = IntegerField(_("attempts"), default=0, help_text=_("Number of attempts at ingesting the game"))
+    form_data = JSONField(_("form data"), default=dict, help_text=_("Fields of the upload other than its files"))
+    spool_dir = CharField(_("spool directory"), max_length=300)
+    errors = JSONField(_("errors"), null=True, blank=True, help_text=_("Errors of the last attempt, if any"))
+    training_game = ForeignKey(
+        TrainingGame,
+        verbose_name=_("training game"),
+        on_delete=SET_NULL,
+        related_name="+",
+        null=True,
+        blank=True,
+    )
+
+    def __str__(self):
+        return f"Pending training game #{self.id}"
+
+    def open_spooled_files(self):
+        """
+        :return: dict of field name -> open File, for each of SPOOLED_FILE_NAMES, which the caller must close
+        """
+        files = {}
+        try:
+            for (field_name, spooled_name) in SPOOLED_FILE_NAMES.items():
+                files[field_name] = File(open(os.path.join(self.spool_dir, spooled_name), "rb"), name=spooled_name)
+        except BaseException:
+            for file in files.values():
+                file.close()
+            raise
+        return files
+
+    def remove_spooled_files(self):
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
@@ -0,0 +1,41 @@
+from django.db.models import CASCADE, BigAutoField, ForeignKey, IntegerField, Model, UniqueConstraint
+from django.utils.translation import gettext_lazy as _
+
+from src.apps.games.managers.rating_pair_stats_manager import RatingPairStatsManager
+from src.apps.runs.models import Run
+from src.apps.trainings.models import Network
+
+
+class RatingPairStats(Model):
+    """
+    Running totals of the enabled rating games of a run between a given white network and a given black network.
+
+    Rows are maintained by database triggers on games_ratinggame (see migration 0017), so that they are kept exact by
+    every insert, bulk insert, update of the result or of disabled, and delete of a rating game, in the same
+    transaction. They can be recomputed from the games with the rebuild_rating_pair_stats management command.
+
+    The row of a pair stays locked from the insert of a game until its transaction commits, so inserting many games
+    at once must be done in (white_network_id, black_network_id) order, lest concurrent inserts deadlock.
+    """
+
+    objects = RatingPairStatsManager()
+
+    class Meta:
+        verbose_name = _("RatingPairStats")
+        verbose_name_plural = _("RatingPairStats")
+        constraints = [
+            UniqueConstraint(fields=["run", "white_network", "black_network"], name="games_ratingpairstats_pair")
+        ]
+
+    id = BigAutoField(primary_key=True)
+    run = ForeignKey(Run, verbose_name=_("run"), on_delete=CASCADE, related_name="+", db_index=False)
+    white_network = ForeignKey(
+        Network, verbose_name=_("white player network"), on_delete=CASCADE, related_name="+", db_index=True
+    )
+    black_network = ForeignKey(
+        Network, verbose_name=_("black player network"), on_delete=CASCADE, related_name="+", db_index=True
+    )
+    games = IntegerField(_("games"), default=0)
+    white_wins = IntegerField(_("white wins"), default=0)
+    black_wins = IntegerField(_("black wins"), default=0)
+    draws = IntegerField(_("draws or no results"), default=0)
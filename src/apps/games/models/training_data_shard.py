@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+from django.db.models import (
+    CASCADE,
+    BigAutoField,
+    BinaryField,
+    DateField,
+    DateTimeField,
+    ForeignKey,
+    IntegerField,
+    Model,
+    UniqueConstraint,
+)
+from django.utils.translation import gettext_lazy as _
+
+from src.apps.games.managers.training_data_shard_manager import TrainingDataShardManager
+from src.apps.games.models.training_game import npz_filestorage_class
+from src.apps.runs.models import Run
+from src.apps.trainings.models import Network
+from src.contrib.variable_storage_file_field import VariableStorageFileField
+
+
+def upload_training_data_shard_to(instance, _filename):
+    return os.path.join(
+        "training_npz_shards",
+        instance.run.name,
+        instance.network.name,
+        instance.day.strftime("%Y-%m-%d"),
+        f"shard{instance.shard_index}.npz",
+    )
+
+
+class TrainingDataShard(Model):
+    """
+    The training data of many training games of a network on a given day, concatenated into one NPZ by the
+    compact_training_data task, with the rows of each game indexed by kgGameUids and gameRowOffsets arrays.
+
+    Disabled games are left out, and the training data of each game stays where it was uploaded too.
+    """
+
+    objects = TrainingDataShardManager()
+
+    class Meta:
+        verbose_name = _("Training data shard")
+        ordering = ["day", "network", "shard_index"]
+        constraints = [
+            UniqueConstraint(fields=["run", "day", "network", "shard_index"], name="games_trainingdatashard_shard")
+        ]
+
+    id = BigAutoField(primary_key=True)
+    run = ForeignKey(Run, verbose_name=_("run"), on_delete=CASCADE, related_name="+", db_index=False)
+    network = ForeignKey(Network, verbose_name=_("network"), on_delete=CASCADE, related_name="+", db_index=True)
+    day = DateField(_("day"))
+    shard_index = IntegerField(_("shard index"), default=0)
+    created_at = DateTimeField(_("creation date"), auto_now_add=True)
+    data_file = VariableStorageFileField(
+        _("training data (npz)"),
+        upload_to=upload_training_data_shard_to,
+        max_length=200,
+        storage=npz_filestorage_class(),
+    )
+    num_games = IntegerField(_("num games"), default=0)
+    num_rows = IntegerField(_("num training rows"), default=0)
+    game_ids = BinaryField(_("training game ids"), help_text=_("Ids of the games of the shard, in order"))
+
+    def __str__(self):
+        return f"{self.run.name} {self.network.name} {self.day} #{self.shard_index}"
+
+    def get_game_ids(self):
+        """
+        :return: NumPy array of the ids of the training games of the shard, in the order of their rows
+        """
+        return np.frombuffer(bytes(self.game_ids), dtype="<i8")
@@ -1,2 +1,5 @@
+from .bulk_game import RatingGameBulkCreateSerializer, TrainingGameBulkCreateSerializer
+from .pending_training_game import PendingTrainingGameSerializer
 from .rating_game import RatingGameCreateSerializer, RatingGameListSerializer
-from .training_game import TrainingGameCreateSerializer, TrainingGameListSerializer
+from .training_game import TrainingGameCreateSerializer, TrainingGameIngestSerializer, TrainingGameListSerializer
+from .training_game_manifest import TrainingGameManifestSerializer
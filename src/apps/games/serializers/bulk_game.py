@@ -0,0 +1,52 @@
+from django.core.exceptions import ObjectDoesNotExist
+from rest_framework.relations import HyperlinkedRelatedField
+
+from src.apps.games.serializers.rating_game import RatingGameCreateSerializer
+from src.apps.games.serializers.training_game import TrainingGameCreateSerializer
+
+
+class MemoizedHyperlinkedRelatedField(HyperlinkedRelatedField):
+    """
+    MemoizedHyperlinkedRelatedField looks each object up only once for all the serializers sharing the dict of the
+    related_objects key of their context, so that many games of the same run and networks cost one query for each.
+    """
+
+    def get_object(self, view_name, view_args, view_kwargs):
+        related_objects = self.context["related_objects"]
+        key = (view_name, view_kwargs[self.lookup_url_kwarg])
+        if key not in related_objects:
+            try:
+                related_objects[key] = super().get_object(view_name, view_args, view_kwargs)
+            except ObjectDoesNotExist:
+                related_objects[key] = None
+        if related_objects[key] is None:
+            raise ObjectDoesNotExist()
+        return related_objects[key]
+
+
+# Use as write only serializer
+class TrainingGameBulkCreateSerializer(TrainingGameCreateSerializer):
+    """
+    TrainingGameBulkCreateSerializer validates one game of a bulk upload, whose files are archive members
+    """
+
+    serializer_related_field = MemoizedHyperlinkedRelatedField
+    file_fields = ["sgf_file", "training_data_file"]
+
+    class Meta(TrainingGameCreateSerializer.Meta):
+        # Uniqueness of kg_game_uid is checked for the whole bulk at once
+        extra_kwargs = {**TrainingGameCreateSerializer.Meta.extra_kwargs, "kg_game_uid": {"validators": []}}
+
+
+# Use as write only serializer
+class RatingGameBulkCreateSerializer(RatingGameCreateSerializer):
+    """
+    RatingGameBulkCreateSerializer validates one game of a bulk upload, whose files are archive members
+    """
+
+    serializer_related_field = MemoizedHyperlinkedRelatedField
+    file_fields = ["sgf_file"]
+
+    class Meta(RatingGameCreateSerializer.Meta):
+        # Uniqueness of kg_game_uid is checked for the whole bulk at once
+        extra_kwargs = {**RatingGameCreateSerializer.Meta.extra_kwargs, "kg_game_uid": {"validators": []}}
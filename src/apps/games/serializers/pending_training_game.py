@@ -0,0 +1,19 @@
+from rest_framework.serializers import HyperlinkedModelSerializer
+
+from src.apps.games.models import PendingTrainingGame
+
+
+# Use as read only serializer
+class PendingTrainingGameSerializer(HyperlinkedModelSerializer):
+    class Meta:
+        model = PendingTrainingGame
+        fields = [
+            "url",
+            "id",
+            "created_at",
+            "updated_at",
+            "status",
+            "attempts",
+            "errors",
+            "training_game",
+        ]
@@ -1,9 +1,15 @@
 from django.core.exceptions import ValidationError
-from rest_framework.serializers import CurrentUserDefault, HiddenField, HyperlinkedModelSerializer
+from rest_framework.serializers import (
+    CurrentUserDefault,
+    HiddenField,
+    HyperlinkedModelSerializer,
+    PrimaryKeyRelatedField,
+)
 
 from src.apps.games.models import TrainingGame, validate_game_npzdata
 from src.apps.runs.models import Run
 from src.apps.trainings.serializers import NetworkSerializerForTasks
+from src.apps.users.models import User
 from src.apps.users.serializers import LimitedUserSerializer
 
 
@@ -61,6 +67,15 @@ class TrainingGameCreateSerializer(HyperlinkedModelSerializer):
         return data
 
 
+class TrainingGameIngestSerializer(TrainingGameCreateSerializer):
+    """
+    TrainingGameIngestSerializer creates the game of a pending training game, outside of the request that uploaded it,
+    so the submitter is given by its primary key instead of being the current user
+    """
+
+    submitted_by = PrimaryKeyRelatedField(queryset=User.objects.all())
+
+
 # Use as read only serializer
 class TrainingGameListSerializer(HyperlinkedModelSerializer):
     submitted_by = LimitedUserSerializer()
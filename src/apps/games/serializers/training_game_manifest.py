@@ -0,0 +1,37 @@
+from src.apps.games.models import TrainingGame
+from src.contrib.fast_serializer import datetime_to_representation
+
+
+class TrainingGameManifestSerializer:
+    """
+    Serialize a training game as a compact row of the training data manifest, from its values_fields, without any
+    model instance nor serializer field per row, so that pages of thousands of rows stay cheap.
+    """
+
+    values_fields = [
+        "id",
+        "kg_game_uid",
+        "white_network__name",
+        "num_training_rows",
+        "training_data_file",
+        "disabled",
+        "created_at",
+    ]
+
+    @classmethod
+    def serialize(cls, values, request):
+        """
+        :param values: tuple of the values of values_fields of a training game
+        """
+        (game_id, kg_game_uid, network_name, num_training_rows, training_data_path, disabled, created_at) = values
+        storage = TrainingGame._meta.get_field("training_data_file").storage
+        return {
+            "id": game_id,
+            "kg_game_uid": kg_game_uid,
+            "network": network_name,
+            "num_training_rows": num_training_rows,
+            "training_data_path": training_data_path,
+            "training_data_file": request.build_absolute_uri(storage.url(training_data_path)),
+            "disabled": disabled,
+            "created_at": datetime_to_representation(created_at),
+        }
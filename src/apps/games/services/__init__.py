@@ -0,0 +1,2 @@
+from .training_data_compaction import TrainingDataShardWriter
+from .training_data_validation import NpzArraySpec, TrainingDataValidator
@@ -0,0 +1,92 @@
+import os
+import shutil
+import zipfile
+
+import numpy as np
+
+
+class TrainingDataShardWriter:
+    """
+    TrainingDataShardWriter concatenates the training data NPZ of many games into a single NPZ with the same arrays,
+    followed by an index of the games: kgGameUids, and gameRowOffsets, the first row of each game in the arrays then
+    the total number of rows.
+
+    Rows are appended to one raw file per array in a temporary directory as games are added, and only zipped together
+    by write, so that memory holds one game at a time, however large the shard.
+    """
+
+    def __init__(self, directory, keys):
+        """
+        :param directory: empty directory for the raw files, which the caller removes
+        :param keys: keys of the arrays to concatenate, in order
+        """
+        self._directory = directory
+        self._keys = list(keys)
+        self._layouts = None
+        self._raw_files = {key: open(os.path.join(directory, f"{key}.raw"), "wb") for key in self._keys}
+        self.kg_game_uids = []
+        self.row_offsets = [0]
+
+    @property
+    def num_games(self):
+        return len(self.kg_game_uids)
+
+    @property
+    def num_rows(self):
+        return self.row_offsets[-1]
+
+    @staticmethod
+    def read_arrays(npz_file, keys):
+        """
+        :return: dict of key -> array, for each of keys in the NPZ
+        """
+        with np.load(npz_file, allow_pickle=False) as npz:
+            return {key: npz[key] for key in keys}
+
+    def can_add(self, arrays):
+        """
+        :return: whether arrays have the same dtypes and shapes past the row axis as those already added, if any
+        """
+        return self._layouts is None or self._get_layouts(arrays) == self._layouts
+
+    def add(self, arrays, kg_game_uid):
+        """
+        :param arrays: dict of key -> array of the rows of a game, as given by read_arrays
+        """
+        if not self.can_add(arrays):
+            raise ValueError(f"Training data of game {kg_game_uid} does not have the layout of the shard")
+        num_rows = {len(arrays[key]) for key in self._keys}
+        if len(num_rows) != 1:
+            raise ValueError(f"Training data of game {kg_game_uid} does not have the same number of rows in all arrays")
+        self._layouts = self._get_layouts(arrays)
+        for key in self._keys:
+            self._raw_files[key].write(np.ascontiguousarray(arrays[key]).tobytes())
+        self.kg_game_uids.append(kg_game_uid)
+        self.row_offsets.append(self.num_rows + num_rows.pop())
+
+    def write(self, output_file):
+        """
+        Zip the rows added so far into output_file, a path or a writable binary file. No game can be added afterwards.
+        """
+        if self.num_games == 0:
+            raise ValueError("Cannot write a training data shard without games")
+        with zipfile.ZipFile(output_file, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as z:
+            for key in self._keys:
+                self._raw_files[key].close()
+                (dtype, row_shape) = self._layouts[key]
+                header = {
+                    "descr": np.lib.format.dtype_to_descr(dtype),
+                    "fortran_order": False,
+                    "shape": (self.num_rows, *row_shape),
+                }
+                with z.open(f"{key}.npy", "w", force_zip64=True) as member:
+                    np.lib.format.write_array_header_1_0(member, header)
+                    with open(os.path.join(self._directory, f"{key}.raw"), "rb") as raw_file:
+                        shutil.copyfileobj(raw_file, member)
+            with z.open("kgGameUids.npy", "w") as member:
+                np.lib.format.write_array(member, np.array(self.kg_game_uids, dtype=np.str_), allow_pickle=False)
+            with z.open("gameRowOffsets.npy", "w") as member:
+                np.lib.format.write_array(member, np.array(self.row_offsets, dtype=np.int64), allow_pickle=False)
+
+    def _get_layouts(self, arrays):
+        return {key: (arrays[key].dtype, arrays[key].shape[1:]) for key in self._keys}
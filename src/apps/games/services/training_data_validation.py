@@ -0,0 +1,186 @@
+import zipfile
+from functools import lru_cache
+
+import numpy as np
+from django.core.exceptions import ValidationError
+from django.template.defaultfilters import filesizeformat
+
+
+class NpzArraySpec:
+    """
+    Expected layout of one array of a training data NPZ.
+
+    shape has one entry per axis, None matching any size. Axis 0 is the row axis, and must have the same size in all
+    the arrays of a file. column_bounds is a list of (columns, lower bound, upper bound), columns being an index or a
+    slice along axis 1, that all values of these columns must lie within.
+    """
+
+    def __init__(self, key, shape, column_bounds=(), check_nan=False, error_message="Invalid NPZ values"):
+        self.key = key
+        self.shape = shape
+        self.check_nan = check_nan
+        self.error_message = error_message
+        self.has_bounds = len(column_bounds) > 0
+        self.lower_bounds = np.full(shape[1], -np.inf)
+        self.upper_bounds = np.full(shape[1], np.inf)
+        for (columns, lower_bound, upper_bound) in column_bounds:
+            self.lower_bounds[columns] = lower_bound
+            self.upper_bounds[columns] = upper_bound
+
+    def matches_shape(self, shape):
+        return len(shape) == len(self.shape) and all(
+            expected is None or size == expected for (size, expected) in zip(shape, self.shape)
+        )
+
+
+@lru_cache(maxsize=None)
+def get_training_data_specs(data_board_len):
+    num_board_locations = data_board_len * data_board_len
+    target_bounds = []
+    # Five groups of 3 value targets followed by a score target
+    for start in range(0, 20, 4):
+        target_bounds.append((slice(start, start + 3), -2.0, 2.0))
+        target_bounds.append((start + 3, -5000.0, 5000.0))
+    target_bounds.extend(
+        [
+            (slice(20, 22), -5000.0, 5000.0),
+            (slice(23, 30), 0.0, 2.0),
+            (slice(33, 35), 0.0, 2.0),
+            (slice(36, 41), 0.0, 1.0),
+        ]
+    )
+    return [
+        NpzArraySpec("binaryInputNCHWPacked", (None, 22, None)),
+        NpzArraySpec(
+            "globalInputNC",
+            (None, 19),
+            [(slice(0, 5), -5.0, 5.0), (5, -60.0, 60.0), (slice(6, None), -5.0, 5.0)],  # Column 5 is komi/20
+            check_nan=True,
+        ),
+        NpzArraySpec("policyTargetsNCMove", (None, 2, num_board_locations + 1), [(slice(None), 0, np.inf)]),
+        NpzArraySpec(
+            "globalTargetsNC",
+            (None, 64),
+            target_bounds,
+            check_nan=True,
+            error_message="Invalid NPZ global target values",
+        ),
+        NpzArraySpec("scoreDistrN", (None, (num_board_locations + 60) * 2), [(slice(None), 0, np.inf)]),
+        NpzArraySpec("valueTargetsNCHW", (None, 5, data_board_len, data_board_len), [(slice(0, 4), -2.0, 2.0)]),
+    ]
+
+
+class TrainingDataValidator:
+    """
+    TrainingDataValidator checks the training data NPZ of a game against get_training_data_specs, reading each array
+    straight out of the zip and a bounded number of rows at a time, so that memory does not grow with the file.
+
+    Shapes are checked from the header of each array before any of its data is decompressed, and the values of each
+    array are checked by column, against vectors of bounds, with one min and one max reduction per chunk of rows.
+    Validation stops at the first failure, which names the array and column at fault.
+    """
+
+    max_size = 1024 * 500
+    max_unzipped_size = 1024 * 1024 * 20
+    chunk_size = 1024 * 256
+
+    @classmethod
+    def validate(cls, npz_file, data_board_len):
+        if npz_file.size > cls.max_size:
+            params = {
+                "max_size": filesizeformat(cls.max_size),
+                "size": filesizeformat(npz_file.size),
+            }
+            raise ValidationError("NPZ file size is greater than %(max_size)s: size is %(size)s.", "max_size", params)
+
+        npz_file.seek(0)
+        try:
+            with zipfile.ZipFile(npz_file, "r") as z:
+                cls._validate_zip(z, get_training_data_specs(data_board_len))
+        except ValidationError:
+            raise
+        except Exception as e:
+            raise ValidationError("Error reading NPZ contents: " + str(e))
+        finally:
+            npz_file.seek(0)
+
+    @classmethod
+    def _validate_zip(cls, z, specs):
+        fileinfos = z.infolist()
+        unzipped_size = sum(fileinfo.file_size for fileinfo in fileinfos)
+        if unzipped_size > cls.max_unzipped_size:
+            params = {
+                "max_unzipped_size": filesizeformat(cls.max_unzipped_size),
+                "unzipped_size": filesizeformat(unzipped_size),
+            }
+            raise ValidationError(
+                "NPZ unzipped file size is greater than %(max_unzipped_size)s: size is %(unzipped_size)s.",
+                "max_unzipped_size",
+                params,
+            )
+
+        # Keys are file names without their .npy extension, as for np.load
+        fileinfos_by_key = {}
+        for fileinfo in fileinfos:
+            key = fileinfo.filename[: -len(".npy")] if fileinfo.filename.endswith(".npy") else fileinfo.filename
+            fileinfos_by_key[key] = fileinfo
+        missing_keys = [spec.key for spec in specs if spec.key not in fileinfos_by_key]
+        if missing_keys:
+            raise ValidationError("Error reading NPZ contents: missing " + ", ".join(missing_keys))
+
+        num_rows = None
+        for spec in specs:
+            with z.open(fileinfos_by_key[spec.key]) as member:
+                num_rows = cls._validate_member(member, spec, num_rows)
+
+    @classmethod
+    def _validate_member(cls, member, spec, num_rows):
+        """
+        :return: number of rows of the array
+        """
+        version = np.lib.format.read_magic(member)
+        if version == (1, 0):
+            (shape, fortran_order, dtype) = np.lib.format.read_array_header_1_0(member)
+        elif version == (2, 0):
+            (shape, fortran_order, dtype) = np.lib.format.read_array_header_2_0(member)
+        else:
+            raise ValidationError(f"Error reading NPZ contents: unsupported format version of {spec.key}")
+        if dtype.hasobject:
+            raise ValidationError(f"Error reading NPZ contents: {spec.key} holds objects")
+
+        if len(shape) == 0 or (num_rows is not None and shape[0] != num_rows):
+            raise ValidationError("NPZ file contains arrays with inconsistent dimension 0")
+        if not spec.matches_shape(shape):
+            raise ValidationError("Unexpected NPZ array shapes")
+        if not spec.check_nan and not spec.has_bounds:
+            return shape[0]
+
+        # Fortran ordered arrays are not stored row by row, so only come in one chunk
+        row_size = dtype.itemsize * int(np.prod(shape[1:]))
+        rows_per_chunk = max(1, shape[0] if fortran_order else cls.chunk_size // max(row_size, 1))
+        reduced_axes = (0,) + tuple(range(2, len(shape)))
+        for chunk_start in range(0, shape[0], rows_per_chunk):
+            chunk_rows = min(rows_per_chunk, shape[0] - chunk_start)
+            data = member.read(chunk_rows * row_size)
+            if len(data) != chunk_rows * row_size:
+                raise ValidationError(f"Error reading NPZ contents: {spec.key} is truncated")
+            chunk_shape = (chunk_rows,) + tuple(shape[1:])
+            if fortran_order:
+                chunk = np.frombuffer(data, dtype=dtype).reshape(chunk_shape[::-1]).T
+            else:
+                chunk = np.frombuffer(data, dtype=dtype).reshape(chunk_shape)
+
+            if spec.check_nan and np.isnan(np.sum(chunk)):
+                raise ValidationError("NPZ file contains nan values")
+            if spec.has_bounds:
+                # Comparisons with NaN are false, NaN only fails where checked above
+                out_of_bounds = (chunk.min(axis=reduced_axes) < spec.lower_bounds) | (
+                    chunk.max(axis=reduced_axes) > spec.upper_bounds
+                )
+                if np.any(out_of_bounds):
+                    column = int(np.flatnonzero(out_of_bounds)[0])
+                    raise ValidationError(
+                        f"{spec.error_message}: {spec.key} column {column} is out of "
+                        f"[{spec.lower_bounds[column]}, {spec.upper_bounds[column]}]"
+                    )
+        return shape[0]
@@ -1 +1,3 @@
+from .compact_training_data import compact_training_data
+from .ingest_training_game import ingest_training_game, requeue_stale_pending_training_games
 from .refresh_materialized_game_views import refresh_materialized_game_views
@@ -0,0 +1,159 @@
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from src import celery_app
+from src.apps.games.models import TrainingDataShard, TrainingGame
+from src.apps.games.services import TrainingDataShardWriter
+from src.apps.games.services.training_data_validation import get_training_data_specs
+from src.apps.runs.models import Run
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE_NAME = "manifest.json"
+
+
+def get_manifest_path(run):
+    return os.path.join("training_npz_shards", run.name, MANIFEST_FILE_NAME)
+
+
+def select_network_days_to_compact(run, max_network_days):
+    """
+    :return: list of (network id, day) of closed days, that is before today, with enabled training games that were
+             not compacted yet, oldest first. Days before the last compacted one are not looked at again.
+    """
+    today_start = datetime.combine(timezone.now().date(), time.min, tzinfo=timezone.utc)
+    training_games = TrainingGame.objects.filter(run=run, disabled=False, created_at__lt=today_start)
+    last_compacted_day = TrainingDataShard.objects.filter(run=run).aggregate(Max("day"))["day__max"]
+    if last_compacted_day is not None:
+        training_games = training_games.filter(
+            created_at__gte=datetime.combine(last_compacted_day, time.min, tzinfo=timezone.utc)
+        )
+    compacted_network_days = TrainingDataShard.objects.select_compacted_network_days(run, since=last_compacted_day)
+
+    network_days = (
+        training_games.annotate(day=TruncDate("created_at"))
+        .values_list("white_network_id", "day")
+        .order_by("day", "white_network_id")
+        .distinct()
+    )
+    network_days_to_compact = []
+    for network_day in network_days.iterator():
+        if network_day not in compacted_network_days:
+            network_days_to_compact.append(network_day)
+            if len(network_days_to_compact) >= max_network_days:
+                break
+    return network_days_to_compact
+
+
+def compact_network_day(run, network_id, day, max_rows):
+    """
+    Concatenate the training data of the enabled training games of a network on a day into shards of at most
+    max_rows rows, or more for a single game, starting a new shard whenever the layout of the arrays changes.
+
+    :return: list of the new shards
+    """
+    day_start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    training_games = (
+        TrainingGame.objects.filter(
+            run=run,
+            white_network_id=network_id,
+            disabled=False,
+            created_at__gte=day_start,
+            created_at__lt=day_start + timedelta(days=1),
+        )
+        .order_by("id")
+        .only("id", "kg_game_uid", "training_data_file")
+    )
+    keys = [spec.key for spec in get_training_data_specs(run.data_board_len)]
+
+    shards = []
+    with tempfile.TemporaryDirectory() as directory:
+
+        def new_writer():
+            writer_directory = os.path.join(directory, str(len(shards)))
+            os.mkdir(writer_directory)
+            return TrainingDataShardWriter(writer_directory, keys), []
+
+        (writer, game_ids) = new_writer()
+        for training_game in training_games.iterator():
+            try:
+                with training_game.training_data_file.open("rb") as npz_file:
+                    arrays = TrainingDataShardWriter.read_arrays(npz_file, keys)
+            except Exception:
+                logger.exception(f"Could not read the training data of game {training_game.id}, leaving it out")
+                continue
+            if writer.num_games > 0 and (writer.num_rows >= max_rows or not writer.can_add(arrays)):
+                shards.append(save_shard(run, network_id, day, len(shards), writer, game_ids, directory))
+                (writer, game_ids) = new_writer()
+            writer.add(arrays, training_game.kg_game_uid)
+            game_ids.append(training_game.id)
+        if writer.num_games > 0:
+            shards.append(save_shard(run, network_id, day, len(shards), writer, game_ids, directory))
+    return shards
+
+
+def save_shard(run, network_id, day, shard_index, writer, game_ids, directory):
+    """
+    :return: the new shard, not saved to the database yet, but with its file in storage
+    """
+    shard_path = os.path.join(directory, f"shard{shard_index}.npz")
+    writer.write(shard_path)
+    shard = TrainingDataShard(
+        run=run,
+        network_id=network_id,
+        day=day,
+        shard_index=shard_index,
+        num_games=writer.num_games,
+        num_rows=writer.num_rows,
+        game_ids=np.array(game_ids, dtype="<i8").tobytes(),
+    )
+    with open(shard_path, "rb") as shard_file:
+        shard.data_file.save(f"shard{shard_index}.npz", File(shard_file), save=False)
+    os.remove(shard_path)
+    return shard
+
+
+def write_manifest(run):
+    """
+    Write the manifest of all the shards of the run to storage, next to them, replacing the previous one
+    """
+    storage = TrainingDataShard._meta.get_field("data_file").storage
+    manifest_path = get_manifest_path(run)
+    manifest = json.dumps(TrainingDataShard.objects.get_manifest(run), indent=1)
+    if storage.exists(manifest_path):
+        storage.delete(manifest_path)
+    storage.save(manifest_path, ContentFile(manifest.encode("utf-8")))
+
+
+@celery_app.task()
+def compact_training_data(max_network_days=100):
+    """
+    Periodically compact the training data of the current run, by network and closed day, into large NPZ shards,
+    and update the manifest listing them for the trainer
+    :return:
+    """
+    current_run = Run.objects.select_current()
+    if current_run is None:
+        return
+
+    network_days = select_network_days_to_compact(current_run, max_network_days)
+    for (network_id, day) in network_days:
+        shards = compact_network_day(current_run, network_id, day, settings.TRAINING_DATA_SHARD_MAX_ROWS)
+        with transaction.atomic():
+            for shard in shards:
+                shard.save()
+        logger.info(f"Compacted training data of network {network_id} on {day} into {len(shards)} shards")
+    if network_days:
+        write_manifest(current_run)
@@ -0,0 +1,99 @@
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.http import QueryDict
+from django.utils import timezone
+
+from src import celery_app
+from src.apps.games.models import PendingTrainingGame
+from src.apps.games.serializers import TrainingGameIngestSerializer
+
+logger = logging.getLogger(__name__)
+
+# Seconds before retrying an attempt that failed for another reason than the game being invalid, doubled each retry
+INGESTION_RETRY_DELAY = 30
+INGESTION_MAX_RETRIES = 6
+# Training games still pending this long after their last attempt, well after the last retry, are ingested again,
+# unless they were already attempted this many times
+STALE_PENDING_DELAY = timedelta(hours=2)
+MAX_INGESTION_ATTEMPTS = 3 * (INGESTION_MAX_RETRIES + 1)
+
+
+def ingest_pending_training_game(pending_training_game_id):
+    """
+    Validate a pending training game exactly as a direct upload, and if valid, store its files and create its
+    TrainingGame. The pending training game is locked meanwhile, so that it is only ever ingested once.
+
+    Errors other than the game being invalid are raised, leaving the pending training game as it was.
+
+    :return: the pending training game, done or failed unless it was not pending anymore, or None if not found
+    """
+    with transaction.atomic():
+        pending_training_game = (
+            PendingTrainingGame.objects.select_for_update().filter(pk=pending_training_game_id).first()
+        )
+        if pending_training_game is None or pending_training_game.status != PendingTrainingGame.PendingStatus.PENDING:
+            return pending_training_game
+
+        # Rebuild the upload as a form, so that its fields are parsed as they would have been in the request
+        data = QueryDict(mutable=True)
+        data.update(pending_training_game.form_data)
+        data["submitted_by"] = pending_training_game.submitted_by_id
+        files = pending_training_game.open_spooled_files()
+        try:
+            data.update(files)
+            serializer = TrainingGameIngestSerializer(data=data)
+            if serializer.is_valid():
+                pending_training_game.training_game = serializer.save()
+                pending_training_game.status = PendingTrainingGame.PendingStatus.DONE
+                pending_training_game.errors = None
+            else:
+                pending_training_game.status = PendingTrainingGame.PendingStatus.FAILED
+                pending_training_game.errors = serializer.errors
+            pending_training_game.attempts += 1
+            pending_training_game.save()
+        finally:
+            for file in files.values():
+                file.close()
+
+    pending_training_game.remove_spooled_files()
+    return pending_training_game
+
+
+@celery_app.task(bind=True, max_retries=INGESTION_MAX_RETRIES)
+def ingest_training_game(self, pending_training_game_id):
+    """
+    Ingest a training game uploaded to the pending training games endpoint, retrying with an exponential backoff
+    when it could not be done for another reason than the game being invalid
+    :return:
+    """
+    try:
+        ingest_pending_training_game(pending_training_game_id)
+    except Exception as error:
+        logger.exception(f"Could not ingest pending training game {pending_training_game_id}")
+        PendingTrainingGame.objects.record_failed_attempt(
+            pending_training_game_id,
+            {"non_field_errors": [f"Ingestion attempt failed ({type(error).__name__}), it will be retried."]},
+        )
+        raise self.retry(exc=error, countdown=INGESTION_RETRY_DELAY * 2 ** self.request.retries)
+
+
+@celery_app.task()
+def requeue_stale_pending_training_games():
+    """
+    Periodically ingest again the training games left pending, whose task was lost or ran out of retries, and give
+    up on those already attempted MAX_INGESTION_ATTEMPTS times
+    :return:
+    """
+    now = timezone.now()
+    stale_pending_training_games = PendingTrainingGame.objects.select_stale(now - STALE_PENDING_DELAY)
+    for pending_training_game in stale_pending_training_games.only("id", "attempts", "spool_dir"):
+        pending = PendingTrainingGame.objects.filter(
+            pk=pending_training_game.pk, status=PendingTrainingGame.PendingStatus.PENDING
+        )
+        if pending_training_game.attempts >= MAX_INGESTION_ATTEMPTS:
+            if pending.update(status=PendingTrainingGame.PendingStatus.FAILED, updated_at=now) > 0:
+                pending_training_game.remove_spooled_files()
+        elif pending.update(updated_at=now) > 0:
+            ingest_training_game.delay(pending_training_game.pk)
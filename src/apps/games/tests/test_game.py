@@ -1,13 +1,29 @@
 import base64
 import copy
+import json
+import zipfile
+from datetime import timedelta
+from io import BytesIO
 
+import numpy as np
 import pytest
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
 from rest_framework.test import APIClient
 
-from src.apps.games.models import GameCountByNetwork, GameCountByUser, RatingGame, TrainingGame
+from src.apps.games.models import (
+    GameCountByNetwork,
+    GameCountByUser,
+    PendingTrainingGame,
+    RatingGame,
+    TrainingDataShard,
+    TrainingGame,
+)
+from src.apps.games.services import TrainingDataValidator
+from src.apps.games.tasks import compact_training_data
+from src.apps.games.viewsets.game_bulk_upload import GameBulkUpload
 from src.apps.runs.models import Run
 from src.apps.trainings.models import Network
 
@@ -207,7 +223,7 @@ class TestGame:
                 black_network=self.n1,
                 white_network=self.n1,
                 kg_game_uid="ABCD" + str(self.game_uid_counter),
-                **kwargs
+                **kwargs,
             )
             games.append(traininggame)
 
@@ -218,7 +234,7 @@ class TestGame:
                 black_network=rating_black_network,
                 white_network=rating_white_network,
                 kg_game_uid="DCBA" + str(self.game_uid_counter),
-                **kwargs
+                **kwargs,
             )
             games.append(ratinggame)
         self.game_uid_counter += 1
@@ -1476,3 +1492,490 @@ class TestPostGamesRunStatus:
         data = copy.deepcopy(response.data)
         assert str(data) == """{'non_field_errors': [ErrorDetail(string='Run is not active', code='invalid')]}"""
         assert response.status_code == 400
+
+
+class TestBulkPostGames:
+    def setup_method(self):
+        self.u1 = User.objects.create_user(username="test", password="test")
+        self.r1 = Run.objects.create(
+            name="testrun",
+            rating_game_probability=0.0,
+            status="Active",
+            git_revision_hash_whitelist="abcdef123456abcdef123456abcdef1234567890",
+        )
+        self.n1 = Network.objects.create(
+            run=self.r1,
+            name="postgame-network",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            is_random=True,
+        )
+        self.n2 = Network.objects.create(
+            run=self.r1,
+            name="postgame-network2",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            is_random=True,
+            training_games_enabled=False,
+        )
+
+    def teardown_method(self):
+        TrainingGame.objects.filter(run=self.r1).delete()
+        RatingGame.objects.filter(run=self.r1).delete()
+        self.n2.delete()
+        self.n1.delete()
+        self.r1.delete()
+        self.u1.delete()
+
+    @staticmethod
+    def make_game(kg_game_uid, white_network_name, black_network_name, **files):
+        return {
+            "run": "http://testserver/api/runs/testrun/",
+            "winner": "B",
+            "board_size_x": 8,
+            "board_size_y": 8,
+            "handicap": 0,
+            "komi": 7,
+            "gametype": "normal",
+            "rules": {},
+            "extra_metadata": {},
+            "score": 0,
+            "resigned": False,
+            "game_length": 0,
+            "white_network": f"http://testserver/api/networks/{white_network_name}/",
+            "black_network": f"http://testserver/api/networks/{black_network_name}/",
+            "kg_game_uid": kg_game_uid,
+            **files,
+        }
+
+    @staticmethod
+    def make_archive(members):
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            for (name, content) in members.items():
+                archive.writestr(name, content)
+        return SimpleUploadedFile(name="games.zip", content=buffer.getvalue(), content_type="application/zip")
+
+    def test_bulk_post_training_games(self):
+        sgf = b"(;GM[1]FF[4]CA[UTF-8]ST[2]RU[Japanese]SZ[19]KM[0])"
+        archive = self.make_archive({"a.sgf": sgf, "a.npz": base64.decodebytes(goodnpzbase64), "b.sgf": sgf})
+        (enabled, disabled) = ("postgame-network", "postgame-network2")
+        games = [
+            self.make_game("UID1", enabled, enabled, sgf_file="a.sgf", training_data_file="a.npz"),
+            self.make_game("UID2", enabled, enabled, sgf_file="b.sgf", training_data_file="a.npz"),
+            self.make_game("UID1", enabled, enabled, sgf_file="a.sgf", training_data_file="a.npz"),
+            self.make_game("UID3", disabled, disabled, sgf_file="a.sgf", training_data_file="a.npz"),
+            self.make_game("UID4", enabled, enabled, sgf_file="c.sgf", training_data_file="a.npz"),
+            self.make_game("UID5", "nonexistent", enabled, sgf_file="a.sgf", training_data_file="a.npz"),
+        ]
+        client = APIClient()
+        client.login(username="test", password="test")
+        response = client.post(
+            "/api/games/training/bulk/", {"games": json.dumps(games), "archive": archive}, format="multipart"
+        )
+        assert response.status_code == 200
+        results = response.data["results"]
+        assert [result["status"] for result in results] == ["created", "created"] + ["failed"] * 4
+        assert results[0]["kg_game_uid"] == "UID1"
+        assert results[0]["url"] == f"http://testserver/api/games/training/{results[0]['id']}/"
+        assert results[2]["errors"] == {"kg_game_uid": ["Training game with this KG game uid already exists."]}
+        assert results[3]["errors"] == {"non_field_errors": ["Network is no longer enabled for training games"]}
+        assert results[4]["errors"] == {"sgf_file": ["No archive member is named c.sgf."]}
+        assert list(results[5]["errors"].keys()) == ["white_network"]
+
+        training_games = TrainingGame.objects.filter(run=self.r1).order_by("id")
+        assert [game.kg_game_uid for game in training_games] == ["UID1", "UID2"]
+        assert training_games[0].submitted_by == self.u1
+        assert training_games[0].training_data_file.name.startswith("training_npz/testrun/postgame-network/")
+        assert training_games[1].sgf_file.read() == sgf
+
+    def test_bulk_post_rating_games(self):
+        sgf = b"(;GM[1]FF[4]CA[UTF-8]ST[2]RU[Japanese]SZ[19]KM[0])"
+        archive = self.make_archive({"a.sgf": sgf, "b.sgf": b"not an sgf"})
+        games = [
+            self.make_game("UID1", "postgame-network", "postgame-network2", sgf_file="a.sgf"),
+            self.make_game("UID2", "postgame-network", "postgame-network", sgf_file="a.sgf"),
+            self.make_game("UID3", "postgame-network2", "postgame-network", sgf_file="b.sgf"),
+        ]
+        client = APIClient()
+        client.login(username="test", password="test")
+        response = client.post(
+            "/api/games/rating/bulk/", {"games": json.dumps(games), "archive": archive}, format="multipart"
+        )
+        assert response.status_code == 200
+        results = response.data["results"]
+        assert [result["status"] for result in results] == ["created", "failed", "failed"]
+        assert results[1]["errors"] == {"non_field_errors": ["Ratings games cannot be between a network and itself"]}
+        assert list(results[2]["errors"].keys()) == ["sgf_file"]
+        assert RatingGame.objects.filter(run=self.r1).count() == 1
+
+    def test_bulk_post_games_with_kg_game_uid_taken_meanwhile(self, monkeypatch):
+        check_kg_game_uids = GameBulkUpload._check_kg_game_uids
+
+        def check_kg_game_uids_then_take_one(bulk_upload, serializers):
+            errors = check_kg_game_uids(bulk_upload, serializers)
+            # As if another upload of the same game was inserted right after the check
+            create_rating_game(self.r1, self.u1, black_network=self.n1, white_network=self.n2, kg_game_uid="UID2")
+            return errors
+
+        monkeypatch.setattr(GameBulkUpload, "_check_kg_game_uids", check_kg_game_uids_then_take_one)
+        sgf = b"(;GM[1]FF[4]CA[UTF-8]ST[2]RU[Japanese]SZ[19]KM[0])"
+        archive = self.make_archive({"a.sgf": sgf})
+        games = [
+            self.make_game("UID1", "postgame-network", "postgame-network2", sgf_file="a.sgf"),
+            self.make_game("UID2", "postgame-network", "postgame-network2", sgf_file="a.sgf"),
+            self.make_game("UID3", "postgame-network2", "postgame-network", sgf_file="a.sgf"),
+        ]
+        client = APIClient()
+        client.login(username="test", password="test")
+        response = client.post(
+            "/api/games/rating/bulk/", {"games": json.dumps(games), "archive": archive}, format="multipart"
+        )
+        assert response.status_code == 200
+        results = response.data["results"]
+        assert [result["status"] for result in results] == ["created", "failed", "created"]
+        assert results[1]["errors"] == {"kg_game_uid": ["Rating game with this KG game uid already exists."]}
+        kg_game_uids = RatingGame.objects.filter(run=self.r1).values_list("kg_game_uid", flat=True)
+        assert sorted(kg_game_uids) == ["UID1", "UID2", "UID3"]
+
+    def test_bulk_post_games_invalid(self):
+        client = APIClient()
+        client.login(username="test", password="test")
+        archive = self.make_archive({})
+        response = client.post("/api/games/rating/bulk/", {"games": "{}", "archive": archive}, format="multipart")
+        assert response.status_code == 400
+        response = client.post(
+            "/api/games/rating/bulk/",
+            {"games": "[{}]", "archive": SimpleUploadedFile(name="games.zip", content=b"not a zip")},
+            format="multipart",
+        )
+        assert response.status_code == 400
+        client.logout()
+        response = client.post("/api/games/rating/bulk/", {"games": "[{}]", "archive": archive}, format="multipart")
+        assert response.status_code == 401
+
+
+# The upload view does not run in a request transaction, which tests cannot wrap in theirs
+@pytest.mark.django_db(transaction=True)
+class TestPostPendingTrainingGames:
+    def setup_method(self):
+        self.u1 = User.objects.create_user(username="test", password="test")
+        self.u2 = User.objects.create_user(username="test2", password="test")
+        self.r1 = Run.objects.create(
+            name="testrun",
+            rating_game_probability=0.0,
+            status="Active",
+            git_revision_hash_whitelist="abcdef123456abcdef123456abcdef1234567890",
+        )
+        self.n1 = Network.objects.create(
+            run=self.r1,
+            name="postgame-network",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            is_random=True,
+        )
+        self.n2 = Network.objects.create(
+            run=self.r1,
+            name="postgame-network2",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            is_random=True,
+            training_games_enabled=False,
+        )
+
+    def teardown_method(self):
+        PendingTrainingGame.objects.all().delete()
+        TrainingGame.objects.filter(run=self.r1).delete()
+        self.n2.delete()
+        self.n1.delete()
+        self.r1.delete()
+        self.u2.delete()
+        self.u1.delete()
+
+    def post_training_game(self, client, network_name):
+        return client.post(
+            "/api/games/pending-training/",
+            {
+                "run": "http://testserver/api/runs/testrun/",
+                "winner": "B",
+                "board_size_x": "8",
+                "board_size_y": "8",
+                "handicap": "0",
+                "komi": "7",
+                "gametype": "normal",
+                "rules": "{}",
+                "extra_metadata": "{}",
+                "score": "0",
+                "resigned": "false",
+                "game_length": "0",
+                "black_network": f"http://testserver/api/networks/{network_name}/",
+                "white_network": f"http://testserver/api/networks/{network_name}/",
+                "sgf_file": SimpleUploadedFile(
+                    name="game.sgf",
+                    content=b"(;GM[1]FF[4]CA[UTF-8]ST[2]RU[Japanese]SZ[19]KM[0])",
+                    content_type="text/plain",
+                ),
+                "training_data_file": SimpleUploadedFile(
+                    name="game.npz", content=base64.decodebytes(goodnpzbase64), content_type="application/octet-stream"
+                ),
+                "num_training_rows": 0,
+                "kg_game_uid": "12341234ABCDABCD",
+            },
+            format="multipart",
+        )
+
+    def test_post_pending_training_game(self, settings, tmp_path):
+        # Stored files go to tmp_path as well, see media_storage
+        spool_dir = tmp_path / "spool"
+        settings.TRAINING_GAME_SPOOL_DIR = str(spool_dir)
+        client = APIClient()
+        client.login(username="test", password="test")
+        response = self.post_training_game(client, "postgame-network")
+        assert response.status_code == 202
+        assert response.data["status"] == "Pending"
+        assert response["Location"] == response.data["url"]
+
+        # Tasks run inline in tests, so the game was already ingested, and its spooled files removed
+        response = client.get(response.data["url"])
+        assert response.status_code == 200
+        assert response.data["status"] == "Done"
+        assert response.data["attempts"] == 1
+        assert response.data["errors"] is None
+        training_game = TrainingGame.objects.get(run=self.r1)
+        assert response.data["training_game"] == f"http://testserver/api/games/training/{training_game.id}/"
+        assert training_game.submitted_by == self.u1
+        assert training_game.rules == {}
+        assert training_game.training_data_file.name.startswith("training_npz/testrun/postgame-network/")
+        assert list(spool_dir.iterdir()) == []
+
+        client.logout()
+        client.login(username="test2", password="test")
+        assert client.get(f"/api/games/pending-training/{response.data['id']}/").status_code == 404
+
+    def test_post_pending_training_game_invalid(self, settings, tmp_path):
+        spool_dir = tmp_path / "spool"
+        settings.TRAINING_GAME_SPOOL_DIR = str(spool_dir)
+        client = APIClient()
+        client.login(username="test", password="test")
+        response = self.post_training_game(client, "postgame-network2")
+        assert response.status_code == 202
+
+        response = client.get(response.data["url"])
+        assert response.data["status"] == "Failed"
+        assert response.data["errors"] == {"non_field_errors": ["Network is no longer enabled for training games"]}
+        assert response.data["training_game"] is None
+        assert TrainingGame.objects.filter(run=self.r1).count() == 0
+        assert list(spool_dir.iterdir()) == []
+
+    def test_post_pending_training_game_not_enabled(self, settings):
+        settings.TRAINING_GAME_SPOOL_DIR = ""
+        client = APIClient()
+        client.login(username="test", password="test")
+        response = self.post_training_game(client, "postgame-network")
+        assert response.status_code == 404
+        assert PendingTrainingGame.objects.count() == 0
+
+    def test_post_pending_training_game_no_auth(self, settings, tmp_path):
+        spool_dir = tmp_path / "spool"
+        settings.TRAINING_GAME_SPOOL_DIR = str(spool_dir)
+        response = self.post_training_game(APIClient(), "postgame-network")
+        assert response.status_code == 401
+        assert PendingTrainingGame.objects.count() == 0
+        assert not spool_dir.exists()
+
+
+class TestCompactTrainingData:
+    def setup_method(self):
+        self.u1 = User.objects.create_user(username="test", password="test")
+        self.r1 = Run.objects.create(name="testrun", status="Active")
+        self.n1 = Network.objects.create(
+            run=self.r1,
+            name="compact-network",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            is_random=True,
+        )
+        self.n2 = Network.objects.create(
+            run=self.r1,
+            name="compact-network2",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            is_random=True,
+        )
+
+    def teardown_method(self):
+        TrainingDataShard.objects.filter(run=self.r1).delete()
+        TrainingGame.objects.filter(run=self.r1).delete()
+        self.n2.delete()
+        self.n1.delete()
+        self.r1.delete()
+        self.u1.delete()
+
+    def create_game(self, network, kg_game_uid, disabled=False, days_ago=1):
+        game = create_training_game(
+            self.r1, self.u1, white_network=network, black_network=network, kg_game_uid=kg_game_uid
+        )
+        TrainingGame.objects.filter(pk=game.pk).update(
+            created_at=timezone.now() - timedelta(days=days_ago), disabled=disabled
+        )
+        return game
+
+    def test_compact_training_data(self, settings):
+        settings.TRAINING_DATA_SHARD_MAX_ROWS = 2
+        games = [self.create_game(self.n1, f"COMPACT{i}") for i in range(3)]
+        self.create_game(self.n1, "COMPACT-DISABLED", disabled=True)
+        self.create_game(self.n1, "COMPACT-TODAY", days_ago=0)
+        other_game = self.create_game(self.n2, "COMPACT-OTHER")
+
+        compact_training_data()
+        shards = list(TrainingDataShard.objects.filter(run=self.r1).order_by("network_id", "shard_index"))
+        assert [(shard.network, shard.shard_index, shard.num_games) for shard in shards] == [
+            (self.n1, 0, 2),
+            (self.n1, 1, 1),
+            (self.n2, 0, 1),
+        ]
+        assert list(shards[0].get_game_ids()) == [games[0].id, games[1].id]
+        assert list(shards[2].get_game_ids()) == [other_game.id]
+        assert shards[0].data_file.name.startswith("training_npz_shards/testrun/compact-network/")
+
+        with shards[0].data_file.open("rb") as shard_file, games[1].training_data_file.open("rb") as game_file:
+            with np.load(shard_file) as shard_npz, np.load(game_file) as game_npz:
+                assert list(shard_npz["kgGameUids"]) == ["COMPACT0", "COMPACT1"]
+                assert list(shard_npz["gameRowOffsets"]) == [0, 1, 2]
+                for key in game_npz.files:
+                    assert np.array_equal(shard_npz[key][1:2], game_npz[key])
+
+        storage = TrainingDataShard._meta.get_field("data_file").storage
+        with storage.open("training_npz_shards/testrun/manifest.json") as manifest_file:
+            manifest = json.load(manifest_file)
+        assert manifest["run"] == "testrun"
+        assert [(shard["network"], shard["num_rows"]) for shard in manifest["shards"]] == [
+            ("compact-network", 2),
+            ("compact-network", 1),
+            ("compact-network2", 1),
+        ]
+
+        # Nothing is compacted twice
+        compact_training_data()
+        assert TrainingDataShard.objects.filter(run=self.r1).count() == 3
+
+
+class TestTrainingGameManifest:
+    def setup_method(self):
+        self.u1 = User.objects.create_user(username="test", password="test")
+        self.r1 = Run.objects.create(name="testrun", status="Active")
+        self.n1 = Network.objects.create(
+            run=self.r1,
+            name="manifest-network",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            is_random=True,
+        )
+        self.games = [
+            create_training_game(
+                self.r1, self.u1, white_network=self.n1, black_network=self.n1, kg_game_uid=f"MANIFEST{i}"
+            )
+            for i in range(3)
+        ]
+        TrainingGame.objects.filter(pk=self.games[1].pk).update(disabled=True)
+
+    def teardown_method(self):
+        TrainingGame.objects.filter(run=self.r1).delete()
+        self.n1.delete()
+        self.r1.delete()
+        self.u1.delete()
+
+    def test_manifest_pages(self):
+        client = APIClient()
+        response = client.get("/api/games/training/manifest/", {"run__name": "testrun", "limit": 2})
+        assert response.status_code == 200
+        assert response.data["run"] == "testrun"
+        assert [row["kg_game_uid"] for row in response.data["results"]] == ["MANIFEST0", "MANIFEST1"]
+        assert response.data["next_after"] == self.games[1].id
+        row = response.data["results"][0]
+        assert row["id"] == self.games[0].id
+        assert row["network"] == "manifest-network"
+        assert row["num_training_rows"] == 0
+        assert row["training_data_path"] == self.games[0].training_data_file.name
+        assert row["training_data_file"] == "http://testserver" + self.games[0].training_data_file.url
+        assert [row["disabled"] for row in response.data["results"]] == [False, True]
+
+        response = client.get("/api/games/training/manifest/", {"after": response.data["next_after"], "limit": 2})
+        assert [row["kg_game_uid"] for row in response.data["results"]] == ["MANIFEST2"]
+        assert response.data["next_after"] is None
+
+    def test_manifest_ndjson(self):
+        client = APIClient()
+        response = client.get("/api/games/training/manifest/", {"after": self.games[0].id, "format": "ndjson"})
+        assert response.status_code == 200
+        assert response["Content-Type"] == "application/x-ndjson"
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        assert [row["id"] for row in rows] == [self.games[1].id, self.games[2].id]
+
+    def test_manifest_invalid(self):
+        client = APIClient()
+        assert client.get("/api/games/training/manifest/", {"limit": 0}).status_code == 400
+        assert client.get("/api/games/training/manifest/", {"after": "x"}).status_code == 400
+        assert client.get("/api/games/training/manifest/", {"run__name": "nonexistent"}).status_code == 404
+
+
+class TestTrainingDataValidator:
+    def load_good_arrays(self):
+        with np.load(BytesIO(base64.decodebytes(goodnpzbase64))) as npz:
+            return {key: npz[key] for key in npz.files}
+
+    def validate(self, arrays, data_board_len=19):
+        buffer = BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        TrainingDataValidator.validate(SimpleUploadedFile(name="game.npz", content=buffer.getvalue()), data_board_len)
+
+    def test_good_npz(self):
+        self.validate(self.load_good_arrays())
+
+    def test_bad_npz(self):
+        arrays = self.load_good_arrays()
+        with pytest.raises(ValidationError, match="Unexpected NPZ array shapes"):
+            self.validate(arrays, data_board_len=9)
+
+        arrays = self.load_good_arrays()
+        arrays["globalTargetsNC"][0, 7] = 6000.0
+        with pytest.raises(ValidationError, match="globalTargetsNC column 7 is out of"):
+            self.validate(arrays)
+
+        arrays = self.load_good_arrays()
+        arrays["valueTargetsNCHW"][0, 2, 3, 4] = 3
+        with pytest.raises(ValidationError, match="valueTargetsNCHW column 2 is out of"):
+            self.validate(arrays)
+        arrays["valueTargetsNCHW"][0, 2, 3, 4] = 0
+        # Channel 4 has no bounds
+        arrays["valueTargetsNCHW"][0, 4, 3, 4] = 3
+        self.validate(arrays)
+
+        arrays = self.load_good_arrays()
+        arrays["globalInputNC"][0, 1] = np.nan
+        with pytest.raises(ValidationError, match="NPZ file contains nan values"):
+            self.validate(arrays)
+
+        arrays = self.load_good_arrays()
+        arrays["scoreDistrN"] = np.concatenate([arrays["scoreDistrN"], arrays["scoreDistrN"]])
+        with pytest.raises(ValidationError, match="inconsistent dimension 0"):
+            self.validate(arrays)
+
+        arrays = self.load_good_arrays()
+        del arrays["policyTargetsNCMove"]
+        with pytest.raises(ValidationError, match="missing policyTargetsNCMove"):
+            self.validate(arrays)
@@ -1,2 +1,3 @@
+from .pending_training_game import PendingTrainingGameViewSet
 from .rating_game import RatingGameViewSet
 from .training_game import TrainingGameViewSet
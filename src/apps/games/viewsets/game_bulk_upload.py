@@ -0,0 +1,211 @@
+import json
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, transaction
+from django.template.defaultfilters import filesizeformat
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+
+from src.apps.games.serializers.bulk_game import MemoizedHyperlinkedRelatedField
+from src.contrib.validators import FileValidator
+
+MAX_BULK_UPLOAD_GAME_COUNT = 64
+# Threads validating games, mostly decompressing and checking their files, which releases the GIL
+MAX_BULK_VALIDATION_WORKERS = 8
+
+
+class GameBulkUpload:
+    """
+    A bulk upload of games of one kind, as multipart form data of two fields:
+    games, a JSON list of games, each with the same fields as for uploading it alone except that its files are given
+    as names of members of archive, and archive, a zip file of these members.
+
+    Each game is validated exactly as it would be alone, and all the valid ones are created with a single INSERT,
+    while the invalid ones are reported without failing the others, as are the ones whose kg_game_uid another upload
+    took in the meantime. Runs and networks are looked up once for all the
+    games, and games are validated in parallel, which does not touch the database past these lookups.
+    """
+
+    def __init__(self, request, serializer_class):
+        self.request = request
+        self.serializer_class = serializer_class
+        self.model = serializer_class.Meta.model
+        self.context = {"request": request, "related_objects": {}}
+
+    def process(self):
+        """
+        :return: response listing the result of each game, in order, or an error response if the upload as a whole
+                 was not valid
+        """
+        games, error_response = self._parse_games()
+        if error_response is not None:
+            return error_response
+        archive_file = self.request.FILES.get("archive")
+        if archive_file is None or not zipfile.is_zipfile(archive_file):
+            return Response({"error": "archive was not a zip file"}, status=400)
+        archive_file.seek(0)
+
+        errors = [None] * len(games)
+        serializers = {}
+        with zipfile.ZipFile(archive_file) as archive:
+            for (index, game) in enumerate(games):
+                (data, errors[index]) = self._read_game(archive, game)
+                if errors[index] is None:
+                    serializers[index] = self.serializer_class(data=data, context=self.context)
+
+        self._look_up_related_objects(serializers.values())
+        with ThreadPoolExecutor(max_workers=min(MAX_BULK_VALIDATION_WORKERS, max(1, len(serializers)))) as executor:
+            validities = list(executor.map(lambda serializer: serializer.is_valid(), serializers.values()))
+        for ((index, serializer), is_valid) in zip(list(serializers.items()), validities):
+            if not is_valid:
+                errors[index] = serializer.errors
+                del serializers[index]
+
+        for (index, kg_game_uid_errors) in self._check_kg_game_uids(serializers).items():
+            errors[index] = {"kg_game_uid": kg_game_uid_errors}
+            del serializers[index]
+
+        created_games = {index: self.model(**serializer.validated_data) for (index, serializer) in serializers.items()}
+        for (index, game_errors) in self._create_games(created_games).items():
+            errors[index] = game_errors
+            del created_games[index]
+
+        results = []
+        for index in range(len(errors)):
+            if index in created_games:
+                game = created_games[index]
+                game_url = reverse(
+                    f"{self.model._meta.model_name}-detail", kwargs={"pk": game.pk}, request=self.request
+                )
+                results.append({"status": "created", "url": game_url, "id": game.pk, "kg_game_uid": game.kg_game_uid})
+            else:
+                results.append({"status": "failed", "errors": errors[index]})
+        return Response({"results": results})
+
+    def _parse_games(self):
+        """
+        :return: Tuple of (list of games, None), or (None, error response)
+        """
+        try:
+            games = json.loads(self.request.data.get("games", ""))
+        except (TypeError, ValueError):
+            return None, Response({"error": "games was not a JSON list"}, status=400)
+        if not isinstance(games, list):
+            return None, Response({"error": "games was not a JSON list"}, status=400)
+        if len(games) < 1 or len(games) > MAX_BULK_UPLOAD_GAME_COUNT:
+            return None, Response(
+                {"error": f"games did not have from 1 to {MAX_BULK_UPLOAD_GAME_COUNT} games"},
+                status=400,
+            )
+        return games, None
+
+    def _read_game(self, archive, game):
+        """
+        :return: Tuple of (data to validate the game from, None), or (None, errors)
+        """
+        if not isinstance(game, dict):
+            return None, {"non_field_errors": ["Expected a JSON object of game fields."]}
+        data = dict(game)
+        errors = {}
+        for field_name in self.serializer_class.file_fields:
+            member_name = game.get(field_name)
+            if not isinstance(member_name, str):
+                errors[field_name] = ["No archive member was given."]
+                continue
+            try:
+                member = archive.getinfo(member_name)
+            except KeyError:
+                errors[field_name] = [f"No archive member is named {member_name}."]
+                continue
+            # Check the size before decompressing anything, which validators would only do after
+            max_size = self._get_max_file_size(field_name)
+            if max_size is not None and member.file_size > max_size:
+                errors[field_name] = [f"Ensure this file size is not greater than {filesizeformat(max_size)}."]
+                continue
+            try:
+                content = archive.read(member)
+            except (zipfile.BadZipFile, ValueError, EOFError):
+                errors[field_name] = [f"Archive member {member_name} could not be read."]
+                continue
+            data[field_name] = SimpleUploadedFile(name=os.path.basename(member_name), content=content)
+        if errors:
+            return None, errors
+        return data, None
+
+    def _get_max_file_size(self, field_name):
+        max_sizes = [
+            validator.max_size
+            for validator in self.model._meta.get_field(field_name).validators
+            if isinstance(validator, FileValidator) and validator.max_size is not None
+        ]
+        return min(max_sizes) if max_sizes else None
+
+    def _look_up_related_objects(self, serializers):
+        """
+        Look up the run and networks of all the games from the calling thread, so that validating them afterwards
+        finds them all in related_objects, and does not query the database from other threads.
+        """
+        for serializer in serializers:
+            for (field_name, field) in serializer.fields.items():
+                if isinstance(field, MemoizedHyperlinkedRelatedField) and serializer.initial_data.get(field_name):
+                    try:
+                        field.run_validation(serializer.initial_data[field_name])
+                    except ValidationError:
+                        # Reported again by is_valid
+                        pass
+
+    def _check_kg_game_uids(self, serializers):
+        """
+        :return: dict of index -> errors, for the games whose kg_game_uid is already taken, or by an earlier game
+        """
+        kg_game_uids = [serializer.validated_data.get("kg_game_uid", "") for serializer in serializers.values()]
+        existing_kg_game_uids = set(
+            self.model.objects.filter(kg_game_uid__in=kg_game_uids).values_list("kg_game_uid", flat=True)
+        )
+        unique_error_message = self._get_kg_game_uid_unique_error_message()
+        errors = {}
+        for (index, kg_game_uid) in zip(serializers.keys(), kg_game_uids):
+            if kg_game_uid in existing_kg_game_uids:
+                errors[index] = [unique_error_message]
+            existing_kg_game_uids.add(kg_game_uid)
+        return errors
+
+    def _create_games(self, games):
+        """
+        Insert all the games with a single INSERT, or, if a kg_game_uid was taken by another upload since it was
+        checked, one game at a time, so that only the games clashing are left out.
+
+        :param games: dict of index -> game
+        :return: dict of index -> errors, for the games that could not be created
+        """
+        # Rating games lock the stats of their pair of networks as they are inserted, see RatingPairStats
+        ordered_games = sorted(games.items(), key=lambda item: (item[1].white_network_id, item[1].black_network_id))
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create([game for (_, game) in ordered_games])
+            return {}
+        except IntegrityError:
+            pass
+
+        errors = {}
+        for (index, game) in ordered_games:
+            try:
+                with transaction.atomic():
+                    game.save(force_insert=True)
+            except IntegrityError:
+                # Anything else than a clash would fail again, so is not ours to report
+                if not self.model.objects.filter(kg_game_uid=game.kg_game_uid).exists():
+                    raise
+                errors[index] = {"kg_game_uid": [self._get_kg_game_uid_unique_error_message()]}
+        return errors
+
+    def _get_kg_game_uid_unique_error_message(self):
+        kg_game_uid_field = self.model._meta.get_field("kg_game_uid")
+        return kg_game_uid_field.error_messages["unique"] % {
+            "model_name": self.model._meta.verbose_name,
+            "field_label": kg_game_uid_field.verbose_name,
+        }
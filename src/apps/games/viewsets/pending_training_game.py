@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.db import transaction
+from django.template.defaultfilters import filesizeformat
+from rest_framework import mixins, viewsets
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+
+from src.apps.games.managers.pending_training_game_manager import SPOOLED_FILE_NAMES
+from src.apps.games.models import PendingTrainingGame
+from src.apps.games.models.abstract_game import validate_sgf
+from src.apps.games.serializers import PendingTrainingGameSerializer, TrainingGameCreateSerializer
+from src.apps.games.services import TrainingDataValidator
+from src.apps.games.tasks import ingest_training_game
+from src.contrib.permission import AuthOnly
+
+# Largest file accepted for each of SPOOLED_FILE_NAMES, so that nothing larger than a valid upload is ever spooled
+MAX_SPOOLED_FILE_SIZES = {
+    "sgf_file": validate_sgf.max_size,
+    "training_data_file": TrainingDataValidator.max_size,
+}
+
+
+class PendingTrainingGameViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    API endpoint that allows training games to be uploaded and ingested in the background, and their progress seen.
+
+    An upload takes the same fields as one to the training games endpoint, but is only spooled to local disk before
+    being acknowledged with the url of its pending training game, which tells when the game was created or why not.
+    """
+
+    queryset = PendingTrainingGame.objects.all()
+    serializer_class = PendingTrainingGameSerializer
+    permission_classes = [AuthOnly]
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        # Nothing here needs the transaction of ATOMIC_REQUESTS, so do not hold one open while the upload is spooled
+        return transaction.non_atomic_requests(super().as_view(actions, **initkwargs))
+
+    def get_queryset(self):
+        if self.request.user.is_staff:
+            return self.queryset
+        return self.queryset.filter(submitted_by=self.request.user)
+
+    def create(self, request):
+        if not settings.TRAINING_GAME_SPOOL_DIR:
+            return Response({"error": "Background ingestion of training games is not enabled."}, status=404)
+
+        files = {}
+        for field_name in SPOOLED_FILE_NAMES:
+            file = request.FILES.get(field_name)
+            if file is None:
+                return Response({field_name: ["No file was submitted."]}, status=400)
+            max_size = MAX_SPOOLED_FILE_SIZES[field_name]
+            if file.size > max_size:
+                return Response(
+                    {field_name: [f"Ensure this file size is not greater than {filesizeformat(max_size)}."]},
+                    status=400,
+                )
+            files[field_name] = file
+
+        # Everything else is validated by ingest_training_game, against the state of the run at that time
+        form_data = {
+            field_name: request.data[field_name]
+            for field_name in TrainingGameCreateSerializer.Meta.fields
+            if field_name in request.data and field_name not in files and field_name != "submitted_by"
+        }
+        pending_training_game = PendingTrainingGame.objects.spool(request.user, form_data, files)
+        ingest_training_game.delay(pending_training_game.pk)
+
+        pending_training_game_url = reverse(
+            "pendingtraininggame-detail", kwargs={"pk": pending_training_game.pk}, request=request
+        )
+        return Response(
+            {
+                "url": pending_training_game_url,
+                "id": pending_training_game.pk,
+                "status": pending_training_game.status,
+            },
+            status=202,
+            headers={"Location": pending_training_game_url},
+        )
@@ -1,8 +1,14 @@
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAdminUser
 
 from src.apps.games.models import RatingGame
-from src.apps.games.serializers import RatingGameCreateSerializer, RatingGameListSerializer
+from src.apps.games.serializers import (
+    RatingGameBulkCreateSerializer,
+    RatingGameCreateSerializer,
+    RatingGameListSerializer,
+)
+from src.apps.games.viewsets.game_bulk_upload import GameBulkUpload
 from src.contrib.permission import ReadOrAuthCreateOnly
 
 
@@ -21,3 +27,10 @@ class RatingGameViewSet(viewsets.ModelViewSet):
         if self.action == "create":
             return RatingGameCreateSerializer
         return RatingGameListSerializer
+
+    @action(detail=False, methods=["POST"])
+    def bulk(self, request):
+        """
+        API endpoint that allows many rating games to be uploaded at once, see GameBulkUpload
+        """
+        return GameBulkUpload(request, RatingGameBulkCreateSerializer).process()
@@ -1,10 +1,24 @@
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
 from src.apps.games.models import TrainingGame
-from src.apps.games.serializers import TrainingGameCreateSerializer, TrainingGameListSerializer
+from src.apps.games.serializers import (
+    TrainingGameBulkCreateSerializer,
+    TrainingGameCreateSerializer,
+    TrainingGameListSerializer,
+    TrainingGameManifestSerializer,
+)
+from src.apps.games.viewsets.game_bulk_upload import GameBulkUpload
+from src.apps.runs.models import Run
+from src.contrib.ndjson_renderer import NDJSONRenderer, ndjson_streaming_response
 from src.contrib.permission import ReadOrAuthCreateOnly
 
+DEFAULT_MANIFEST_LIMIT = 1000
+MAX_MANIFEST_LIMIT = 10000
+
 
 class TrainingGameViewSet(viewsets.ModelViewSet):
     """
@@ -21,3 +35,60 @@ class TrainingGameViewSet(viewsets.ModelViewSet):
         if self.action == "create":
             return TrainingGameCreateSerializer
         return TrainingGameListSerializer
+
+    @action(detail=False, methods=["POST"])
+    def bulk(self, request):
+        """
+        API endpoint that allows many training games to be uploaded at once, see GameBulkUpload
+        """
+        return GameBulkUpload(request, TrainingGameBulkCreateSerializer).process()
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer],
+    )
+    def manifest(self, request):
+        """
+        API endpoint that lists the training games of the given run (run__name, the current run by default) by
+        increasing id, from the one after the given id (after, 0 by default), one compact row each, so that trainers
+        can sync the training data uploaded since they last asked. At most limit rows are given at once, up to
+        MAX_MANIFEST_LIMIT, request again after the last one until fewer are given. Disabled games are listed too.
+
+        With format=ndjson, or an Accept of application/x-ndjson, rows are streamed one per line as they are read.
+        """
+        run_name = request.query_params.get("run__name")
+        if run_name is None:
+            run = Run.objects.select_current()
+        else:
+            run = Run.objects.filter(name=run_name).first()
+        if run is None:
+            return Response({"error": "No such run."}, status=404)
+        try:
+            after = int(request.query_params.get("after", 0))
+            limit = int(request.query_params.get("limit", DEFAULT_MANIFEST_LIMIT))
+        except ValueError:
+            return Response({"error": "after and limit were not integers"}, status=400)
+        if limit < 1 or limit > MAX_MANIFEST_LIMIT:
+            return Response({"error": f"limit was not an integer from 1 to {MAX_MANIFEST_LIMIT}"}, status=400)
+
+        # Keyset pagination on the primary key, so that any page costs the same as the first
+        values = (
+            TrainingGame.objects.filter(run=run, id__gt=after)
+            .order_by("id")
+            .values_list(*TrainingGameManifestSerializer.values_fields)[:limit]
+        )
+        if request.accepted_renderer.format == NDJSONRenderer.format:
+            return ndjson_streaming_response(
+                TrainingGameManifestSerializer.serialize(game_values, request) for game_values in values.iterator()
+            )
+
+        results = [TrainingGameManifestSerializer.serialize(game_values, request) for game_values in values]
+        return Response(
+            {
+                "run": run.name,
+                "after": after,
+                "next_after": results[-1]["id"] if len(results) == limit else None,
+                "results": results,
+            }
+        )
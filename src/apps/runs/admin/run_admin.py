@@ -22,9 +22,17 @@ class RunAdmin(admin.ModelAdmin):
                     "rating_game_high_uncertainty_probability",
                     "rating_game_low_data_probability",
                     "rating_game_variability_scale",
+                    "rating_pairing_queue_size",
                     "selfplay_startpos_probability",
                     "virtual_draw_strength",
                     "elo_number_of_iterations",
+                    "elo_convergence_tolerance",
+                    "elo_use_newton_acceleration",
+                    "elo_use_full_covariance_uncertainty",
+                    "elo_bootstrap_samples",
+                    "elo_bootstrap_time_budget",
+                    "elo_last_number_of_iterations",
+                    "elo_last_residual",
                     "selfplay_client_config",
                     "rating_client_config",
                     "git_revision_hash_whitelist",
@@ -50,6 +58,8 @@ class RunAdmin(admin.ModelAdmin):
                 "inputs_version",
                 "max_search_threads_allowed",
                 "startpos_total_weight",
+                "elo_last_number_of_iterations",
+                "elo_last_residual",
             )
         else:
-            return "id", "created_at"
+            return "id", "created_at", "elo_last_number_of_iterations", "elo_last_residual"
@@ -0,0 +1,19 @@
+# Generated by Django 3.0.11 on 2021-02-06 18:12
+
+from django.db import migrations, models
+import src.apps.runs.models.run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('runs', '0013_auto_20201220_2108'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='run',
+            name='rating_pairing_queue_size',
+            field=models.IntegerField(default=0, help_text='How many precomputed rating game pairings to keep queued per network delay bucket. If 0, pairings are computed when clients request tasks.', validators=[src.apps.runs.models.run.validate_non_negative], verbose_name='Rating pairing queue size'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.0.11 on 2021-02-13 10:27
+
+from django.db import migrations, models
+import src.apps.runs.models.run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('runs', '0014_run_rating_pairing_queue_size'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='run',
+            name='elo_number_of_iterations',
+            field=models.IntegerField(default=10, help_text='Maximum number of iterations to use per celery task to compute log_gammas and Elos. Fewer are used once the ratings converged to the tolerance below.', validators=[src.apps.runs.models.run.validate_positive], verbose_name='Elo computation number of iterations'),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='elo_convergence_tolerance',
+            field=models.FloatField(default=0.0, help_text='Stop iterating once no log_gamma changes by more than this in an iteration. If 0, always use the maximum number of iterations.', validators=[src.apps.runs.models.run.validate_non_negative], verbose_name='Elo computation convergence tolerance'),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='elo_use_newton_acceleration',
+            field=models.BooleanField(default=False, help_text='If true, iterate with Newton steps over all log_gammas at once, which converges in far fewer iterations on large runs.', verbose_name='Elo computation Newton acceleration?'),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='elo_last_number_of_iterations',
+            field=models.IntegerField(default=0, help_text='How many iterations the last rating update used.', verbose_name='Elo computation last number of iterations'),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='elo_last_residual',
+            field=models.FloatField(default=0.0, help_text='Largest change of any log_gamma in the last iteration of the last rating update.', verbose_name='Elo computation last residual'),
+        ),
+    ]
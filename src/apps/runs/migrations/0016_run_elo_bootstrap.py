@@ -0,0 +1,24 @@
+# Generated by Django 3.0.11 on 2021-02-20 14:52
+
+from django.db import migrations, models
+import src.apps.runs.models.run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('runs', '0015_run_elo_convergence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='run',
+            name='elo_bootstrap_samples',
+            field=models.IntegerField(default=0, help_text='If positive, resample the rating games this many times and recompute log_gammas for each sample, to take confidence bounds from their percentiles instead of from the uncertainty. If 0, bounds are 2 uncertainties away.', validators=[src.apps.runs.models.run.validate_non_negative], verbose_name='Elo computation bootstrap samples'),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='elo_bootstrap_time_budget',
+            field=models.FloatField(default=60.0, help_text='Stop drawing bootstrap samples after this many seconds, even if fewer samples than above were done.', validators=[src.apps.runs.models.run.validate_non_negative], verbose_name='Elo computation bootstrap time budget'),
+        ),
+    ]
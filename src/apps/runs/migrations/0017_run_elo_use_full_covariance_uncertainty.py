@@ -0,0 +1,18 @@
+# Generated by Django 3.0.11 on 2021-02-21 11:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('runs', '0016_run_elo_bootstrap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='run',
+            name='elo_use_full_covariance_uncertainty',
+            field=models.BooleanField(default=False, help_text='If true, compute each log_gamma uncertainty from the covariance of all log_gammas, which also accounts for the uncertainty of the networks it is rated through, instead of from its own games only.', verbose_name='Elo computation full covariance uncertainty?'),
+        ),
+    ]
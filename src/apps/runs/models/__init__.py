@@ -1 +1 @@
-from .run import Run
+from .run import Run, hash_client_config, parse_whitelist
@@ -1,3 +1,5 @@
+from hashlib import sha256
+
 import numpy as np
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
@@ -36,6 +38,25 @@ class RunQuerySet(QuerySet):
         return self.order_by("-created_at").first()
 
 
+def parse_whitelist(whitelist, lowercase=False):
+    """
+    Parse a newline-separated whitelist where anything after a hash is a comment.
+
+    :return: the list of non-empty entries
+    """
+    entries = [s.split("#")[0].strip() for s in whitelist.split("\n") if len(s) > 0]
+    if lowercase:
+        entries = [s.lower() for s in entries]
+    return [s for s in entries if len(s) > 0]
+
+
+def hash_client_config(config):
+    """
+    :return: hex digest identifying the content of a client config, used to serve it from an immutable url
+    """
+    return sha256(config.encode("utf-8")).hexdigest()
+
+
 alphanumeric = RegexValidator(r"^[0-9a-zA-Z]*$", "Only alphanumeric characters are allowed.")
 
 
@@ -164,10 +185,68 @@ class Run(Model):
     )
     elo_number_of_iterations = IntegerField(
         _("Elo computation number of iterations"),
-        help_text=_("How many iterations to use per celery task to compute log_gammas and Elos."),
+        help_text=_(
+            "Maximum number of iterations to use per celery task to compute log_gammas and Elos. Fewer are used once the ratings converged to the tolerance below."
+        ),
         default=10,
         validators=[validate_positive],
     )
+    elo_convergence_tolerance = FloatField(
+        _("Elo computation convergence tolerance"),
+        help_text=_(
+            "Stop iterating once no log_gamma changes by more than this in an iteration. If 0, always use the maximum number of iterations."
+        ),
+        default=0.0,
+        validators=[validate_non_negative],
+    )
+    elo_use_newton_acceleration = BooleanField(
+        _("Elo computation Newton acceleration?"),
+        help_text=_(
+            "If true, iterate with Newton steps over all log_gammas at once, which converges in far fewer iterations on large runs."
+        ),
+        default=False,
+    )
+    elo_use_full_covariance_uncertainty = BooleanField(
+        _("Elo computation full covariance uncertainty?"),
+        help_text=_(
+            "If true, compute each log_gamma uncertainty from the covariance of all log_gammas, which also accounts for the uncertainty of the networks it is rated through, instead of from its own games only."
+        ),
+        default=False,
+    )
+    elo_bootstrap_samples = IntegerField(
+        _("Elo computation bootstrap samples"),
+        help_text=_(
+            "If positive, resample the rating games this many times and recompute log_gammas for each sample, to take confidence bounds from their percentiles instead of from the uncertainty. If 0, bounds are 2 uncertainties away."
+        ),
+        default=0,
+        validators=[validate_non_negative],
+    )
+    elo_bootstrap_time_budget = FloatField(
+        _("Elo computation bootstrap time budget"),
+        help_text=_(
+            "Stop drawing bootstrap samples after this many seconds, even if fewer samples than above were done."
+        ),
+        default=60.0,
+        validators=[validate_non_negative],
+    )
+    elo_last_number_of_iterations = IntegerField(
+        _("Elo computation last number of iterations"),
+        help_text=_("How many iterations the last rating update used."),
+        default=0,
+    )
+    elo_last_residual = FloatField(
+        _("Elo computation last residual"),
+        help_text=_("Largest change of any log_gamma in the last iteration of the last rating update."),
+        default=0.0,
+    )
+    rating_pairing_queue_size = IntegerField(
+        _("Rating pairing queue size"),
+        help_text=_(
+            "How many precomputed rating game pairings to keep queued per network delay bucket. If 0, pairings are computed when clients request tasks."
+        ),
+        default=0,
+        validators=[validate_non_negative],
+    )
     selfplay_client_config = TextField(
         _("Selfplay game config"),
         help_text=_("Client config for selfplay games."),
@@ -224,17 +303,9 @@ class Run(Model):
     def is_allowed_username(self, username):
         if not self.restrict_to_user_whitelist:
             return True
-        user_whitelist = self.user_whitelist
-        user_whitelist = [s for s in user_whitelist.split("\n") if len(s) > 0]
-        user_whitelist = [s.split("#")[0].strip() for s in user_whitelist]
-        user_whitelist = [s for s in user_whitelist if len(s) > 0]
         username = username.strip()
-        return username in user_whitelist
+        return username in parse_whitelist(self.user_whitelist)
 
     def is_git_in_whitelist(self, git_revision_hash):
-        git_revision_hash_whitelist = self.git_revision_hash_whitelist
-        git_revision_hash_whitelist = [s for s in git_revision_hash_whitelist.split("\n") if len(s) > 0]
-        git_revision_hash_whitelist = [s.split("#")[0].strip().lower() for s in git_revision_hash_whitelist]
-        git_revision_hash_whitelist = [s for s in git_revision_hash_whitelist if len(s) > 0]
         git_revision_hash = git_revision_hash.strip().lower()
-        return git_revision_hash in git_revision_hash_whitelist
+        return git_revision_hash in parse_whitelist(self.git_revision_hash_whitelist, lowercase=True)
@@ -1 +1 @@
-from .run import RunSerializer, RunSerializerForClient
+from .run import FastRunSerializerForClient, RunSerializer, RunSerializerForClient
@@ -1,6 +1,7 @@
 from rest_framework.serializers import HyperlinkedModelSerializer
 
 from src.apps.runs.models import Run
+from src.contrib.fast_serializer import UrlTemplate
 
 
 class RunSerializer(HyperlinkedModelSerializer):
@@ -45,3 +46,24 @@ class RunSerializerForClient(HyperlinkedModelSerializer):
         extra_kwargs = {
             "url": {"lookup_field": "name"},
         }
+
+
+class FastRunSerializerForClient:
+    """
+    Gives exactly the output of RunSerializerForClient(run, context={"request": request}).data, using plain attribute
+    access and a precomputed url template, for endpoints serving every client request.
+    Any change to the fields of RunSerializerForClient must be mirrored here.
+    """
+
+    url_template = UrlTemplate("run-detail", "name")
+
+    @classmethod
+    def serialize(cls, run: Run, request=None):
+        return {
+            "id": run.id,
+            "url": cls.url_template.build(run.name, request),
+            "name": run.name,
+            "data_board_len": run.data_board_len,
+            "inputs_version": run.inputs_version,
+            "max_search_threads_allowed": run.max_search_threads_allowed,
+        }
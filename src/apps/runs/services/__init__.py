@@ -0,0 +1 @@
+from .run_snapshot import RunSnapshot, RunSnapshotService
@@ -0,0 +1,59 @@
+from src.apps.runs.models import Run, hash_client_config, parse_whitelist
+from src.contrib.cache_version import bump_cache_version, get_cache_version
+
+
+class RunSnapshot:
+    """
+    Read-only view of the current run for the task dispatch hot path, with whitelists already parsed.
+
+    The wrapped run instance is shared across requests of a worker process, so callers must never modify it.
+    """
+
+    def __init__(self, run: Run, version):
+        self.run = run
+        self.version = version
+        self.restrict_to_user_whitelist = run.restrict_to_user_whitelist
+        self.user_whitelist = frozenset(parse_whitelist(run.user_whitelist))
+        self.git_revision_hash_whitelist = frozenset(parse_whitelist(run.git_revision_hash_whitelist, lowercase=True))
+        self.selfplay_client_config_hash = hash_client_config(run.selfplay_client_config)
+        self.rating_client_config_hash = hash_client_config(run.rating_client_config)
+
+    def is_allowed_username(self, username):
+        if not self.restrict_to_user_whitelist:
+            return True
+        return username.strip() in self.user_whitelist
+
+    def is_git_in_whitelist(self, git_revision_hash):
+        return git_revision_hash.strip().lower() in self.git_revision_hash_whitelist
+
+
+class RunSnapshotService:
+    """
+    RunSnapshotService keeps one RunSnapshot of the current run per worker process, reloading it from the database
+    only when the shared version stamp has been bumped by a save or delete of any run.
+    """
+
+    version_cache_key = "runs:current_run_snapshot_version"
+
+    # Tuple of (version, snapshot or None if there is no active run), replaced as a whole so threads never see half of it
+    _cached = (None, None)
+
+    @classmethod
+    def get_current(cls):
+        """
+        :return: RunSnapshot of the current active run, or None if there is no active run
+        """
+        # Read the version before the run so that a concurrent bump can only make us reload once more, never miss
+        version = get_cache_version(cls.version_cache_key)
+        cached_version, snapshot = cls._cached
+        if cached_version == version:
+            return snapshot
+
+        run = Run.objects.select_current()
+        snapshot = RunSnapshot(run, version) if run is not None else None
+        cls._cached = (version, snapshot)
+        return snapshot
+
+    @classmethod
+    def invalidate(cls):
+        bump_cache_version(cls.version_cache_key)
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from src.apps.runs.models import Run
+from src.apps.runs.services import RunSnapshotService
+
+
+@receiver(post_save, sender=Run)
+@receiver(post_delete, sender=Run)
+def invalidate_run_snapshot(sender, **kwargs):
+    RunSnapshotService.invalidate()
@@ -1,10 +1,11 @@
+from django.http import HttpResponse
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
-from src.apps.runs.models import Run
-from src.apps.runs.serializers import RunSerializer, RunSerializerForClient
+from src.apps.runs.models import Run, hash_client_config
+from src.apps.runs.serializers import FastRunSerializerForClient, RunSerializer
 from src.contrib.permission import ReadOnly
 
 
@@ -28,5 +29,19 @@ class RunViewSet(viewsets.ModelViewSet):
         current_run = Run.objects.select_current()
         if current_run is None:
             return Response({"error": "No active run."}, status=status.HTTP_404_NOT_FOUND)
-        run_content = RunSerializerForClient(current_run, context={"request": request})
-        return Response(run_content.data)
+        return Response(FastRunSerializerForClient.serialize(current_run, request))
+
+    @action(detail=True, methods=["GET"], url_path=r"config/(?P<config_hash>[0-9a-f]{64})", url_name="config")
+    def config(self, request, name=None, config_hash=None):
+        """
+        API endpoint that gives the selfplay or rating client config of a run with the given content hash.
+        Since the url changes with the content, responses can be cached forever.
+        :return:
+        """
+        run = self.get_object()
+        for config in [run.selfplay_client_config, run.rating_client_config]:
+            if hash_client_config(config) == config_hash:
+                response = HttpResponse(config, content_type="text/plain; charset=utf-8")
+                response["Cache-Control"] = "public, max-age=31536000, immutable"
+                return response
+        return Response({"error": "No config with this hash for this run."}, status=status.HTTP_404_NOT_FOUND)
@@ -10,8 +10,9 @@ from src.apps.runs.models import Run
 
 
 class StartPosQuerySet(QuerySet):
-    def select_weighted_random(self):
-        current_run = Run.objects.select_current()
+    def select_weighted_random(self, current_run=None):
+        if current_run is None:
+            current_run = Run.objects.select_current()
         if current_run is None:
             return None
         if current_run.startpos_locked:
@@ -0,0 +1 @@
+from .startpos_sampler import StartPosSampler, StartPosSamplerService
@@ -0,0 +1,127 @@
+import random
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src.apps.runs.models import Run
+from src.apps.startposes.models import StartPos
+from src.contrib.cache_version import bump_cache_version, get_cache_version
+from src.contrib.lru_dict import LRUDict
+
+
+class StartPosSampler:
+    """
+    StartPosSampler holds the cumulative weights of all the startposes of a run as a sorted NumPy array, so that
+    weighted random startposes can be drawn with binary searches instead of one database query each.
+
+    Drawing a startpos for a value r selects the startpos with the smallest cumulative weight >= r, exactly like
+    StartPosQuerySet.select_weighted_random. The JSON payloads of recently drawn startposes are kept in a small LRU cache.
+    """
+
+    payload_cache_size = 4096
+
+    def __init__(self, ids, cumulative_weights, version=None):
+        self.version = version
+
+        ids = np.asarray(ids, dtype=np.int64)
+        cumulative_weights = np.asarray(cumulative_weights, dtype=np.float64)
+        order = np.lexsort((ids, cumulative_weights))
+        self.ids = ids[order]
+        self.cumulative_weights = cumulative_weights[order]
+
+        self._payloads = OrderedDict()
+        self._payloads_lock = threading.Lock()
+
+    @classmethod
+    def from_run(cls, run: Run, version=None):
+        rows = StartPos.objects.filter(run=run).order_by().values_list("id", "cumulative_weight")
+        ids = [row[0] for row in rows]
+        cumulative_weights = [row[1] for row in rows]
+        return cls(ids, cumulative_weights, version)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def select_ids(self, weights):
+        """
+        :return: ids of the startposes selected by each of the given values, skipping values above the largest
+                 cumulative weight
+        """
+        rows = np.searchsorted(self.cumulative_weights, np.asarray(weights, dtype=np.float64), side="left")
+        return self.ids[rows[rows < len(self.ids)]].tolist()
+
+    def get_payloads(self, ids):
+        """
+        :return: the data of each of the given startposes, in order, loading the ones not cached with a single query
+        """
+        payloads = {}
+        with self._payloads_lock:
+            for startpos_id in ids:
+                if startpos_id in self._payloads:
+                    self._payloads.move_to_end(startpos_id)
+                    payloads[startpos_id] = self._payloads[startpos_id]
+
+        missing_ids = set(ids) - payloads.keys()
+        if missing_ids:
+            loaded = dict(StartPos.objects.filter(id__in=missing_ids).order_by().values_list("id", "data"))
+            payloads.update(loaded)
+            with self._payloads_lock:
+                for startpos_id, data in loaded.items():
+                    self._payloads[startpos_id] = data
+                while len(self._payloads) > self.payload_cache_size:
+                    self._payloads.popitem(last=False)
+
+        return [payloads[startpos_id] for startpos_id in ids if startpos_id in payloads]
+
+
+class StartPosSamplerService:
+    """
+    StartPosSamplerService keeps one StartPosSampler per run in each worker process, rebuilt only when the version
+    stamp of the run is bumped, which happens whenever cumulative weights are recomputed or a startpos is saved.
+    Only the samplers of the few runs most recently served are kept.
+    """
+
+    _samplers = LRUDict(max_size=4)
+
+    @staticmethod
+    def _version_cache_key(run_id):
+        return f"startposes:startpos_sampler_version:{run_id}"
+
+    @classmethod
+    def get(cls, run: Run):
+        # Read the version before the startposes so that a concurrent bump can only make us rebuild once more, never miss
+        version = get_cache_version(cls._version_cache_key(run.pk))
+        sampler = cls._samplers.get(run.pk)
+        if sampler is not None and sampler.version == version:
+            return sampler
+
+        sampler = StartPosSampler.from_run(run, version)
+        cls._samplers[run.pk] = sampler
+        return sampler
+
+    @classmethod
+    def invalidate(cls, run_id):
+        bump_cache_version(cls._version_cache_key(run_id))
+
+    @classmethod
+    def select_start_poses(cls, run: Run, count):
+        """
+        Draw the startposes for count repetitions of a selfplay task, each repetition getting one with probability
+        run.selfplay_startpos_probability. Random numbers are consumed in the same order as calling
+        StartPosQuerySet.select_weighted_random for each repetition, but all startposes are looked up at once.
+
+        :return: list of the data of the selected startposes
+        """
+        if run.startpos_locked:
+            return []
+        total_weight = run.startpos_total_weight
+        weights = []
+        for _ in range(count):
+            if random.random() < run.selfplay_startpos_probability and total_weight > 0:
+                weights.append(random.random() * total_weight)
+        if not weights:
+            return []
+
+        sampler = cls.get(run)
+        return sampler.get_payloads(sampler.select_ids(weights))
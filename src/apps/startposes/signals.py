@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from src.apps.startposes.models import StartPos
+from src.apps.startposes.services import StartPosSamplerService
+
+
+@receiver(post_save, sender=StartPos)
+@receiver(post_delete, sender=StartPos)
+def invalidate_startpos_sampler(sender, instance, **kwargs):
+    StartPosSamplerService.invalidate(instance.run_id)
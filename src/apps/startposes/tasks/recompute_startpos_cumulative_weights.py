@@ -3,6 +3,7 @@ import numpy as np
 from src import celery_app
 from src.apps.runs.models import Run
 from src.apps.startposes.models import StartPos, StartPosCumWeightOnly
+from src.apps.startposes.services import StartPosSamplerService
 
 
 @celery_app.task()
@@ -28,3 +29,4 @@ def recompute_startpos_cumulative_weights():
     if len(cumulative_weights) > 0:
         current_run.startpos_total_weight = cumulative_weights[len(cumulative_weights) - 1]
     current_run.save()
+    StartPosSamplerService.invalidate(current_run.pk)
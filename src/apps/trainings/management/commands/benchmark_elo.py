@@ -0,0 +1,168 @@
+import resource
+import time
+import uuid
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from src.apps.games.models import RatingPairStats
+from src.apps.runs.models import Run
+from src.apps.trainings.models import Network, NetworkRatingSnapshot
+from src.apps.trainings.services import SparseBayesianRatingService, SyntheticTournament
+from src.contrib.columnar_fetch import copy_columns
+
+SET_PARENT_NETWORKS_SQL = """
+UPDATE trainings_network AS network SET parent_network_id = parents.parent_network_id
+FROM unnest(%s::bigint[], %s::bigint[]) AS parents(id, parent_network_id)
+WHERE network.id = parents.id
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Time each stage of a rating update on a synthetic run, in memory, or with --use-database against the "
+        "database, within a transaction rolled back at the end. Only ever use --use-database on a disposable one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--networks", type=int, default=1000, help="Number of networks of the synthetic run.")
+        parser.add_argument("--games", type=int, default=100000, help="Number of rating games of the synthetic run.")
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic run.")
+        parser.add_argument("--iterations", type=int, default=100, help="Maximum number of iterations.")
+        parser.add_argument("--tolerance", type=float, default=0.0, help="Convergence tolerance of the iterations.")
+        parser.add_argument("--newton", action="store_true", help="Use Newton acceleration.")
+        parser.add_argument(
+            "--full-covariance-uncertainty", action="store_true", help="Compute uncertainties from the covariance."
+        )
+        parser.add_argument("--virtual-draw-strength", type=float, default=4.0, help="Virtual draws with parents.")
+        parser.add_argument(
+            "--use-database",
+            action="store_true",
+            help="Also time fetching the run from the database and writing the ratings back to it.",
+        )
+
+    def handle(self, *args, **options):
+        if options["networks"] < 2:
+            raise CommandError("--networks must be at least 2")
+        if options["games"] < 0:
+            raise CommandError("--games must not be negative")
+
+        self.stage_start_time = time.perf_counter()
+        tournament = SyntheticTournament.generate(options["networks"], options["games"], seed=options["seed"])
+        self.report_stage("generate")
+        self.stdout.write(
+            f"Synthetic run of {options['networks']} networks, {tournament.num_games} games between "
+            f"{len(tournament.pair_totals['games'])} pairs of networks"
+        )
+
+        if options["use_database"]:
+            with transaction.atomic():
+                self.benchmark_database(tournament, options)
+                transaction.set_rollback(True)
+        else:
+            network_ratings = tournament.network_ratings
+            detailed_tournament_results = tournament.get_detailed_tournament_results_dataframe()
+            self.report_stage("fetch")
+            self.benchmark_solver(network_ratings, network_ratings.index[0], detailed_tournament_results, options)
+
+    def benchmark_database(self, tournament, options):
+        run = self.create_run(tournament, options)
+        self.report_stage("insert")
+
+        network_ratings = Network.pandas.get_ratings_dataframe(run)
+        detailed_tournament_results = RatingPairStats.objects.get_detailed_tournament_results_dataframe(run)
+        self.report_stage("fetch")
+
+        new_network_ratings = self.benchmark_solver(
+            network_ratings, network_ratings.index[0], detailed_tournament_results, options
+        )
+
+        changed_ratings = Network.pandas.get_changed_ratings_columns(
+            new_network_ratings, previous_dataframe=network_ratings
+        )
+        Network.pandas.bulk_update_ratings_from_columns(run, changed_ratings)
+        NetworkRatingSnapshot.objects.record(run, changed_ratings)
+        self.report_stage("writeback")
+
+    def benchmark_solver(self, network_ratings, network_anchor_id, detailed_tournament_results, options):
+        bayesian_rating_service = SparseBayesianRatingService(
+            network_ratings, network_anchor_id, detailed_tournament_results, options["virtual_draw_strength"]
+        )
+        new_network_ratings = bayesian_rating_service.update_ratings_iteratively(
+            options["iterations"],
+            tolerance=options["tolerance"],
+            use_newton_acceleration=options["newton"],
+            use_full_covariance_uncertainty=options["full_covariance_uncertainty"],
+        )
+        # The solver times its own stages, the peak memory reported with them is that of the whole solve
+        for (stage, duration) in bayesian_rating_service.stage_durations.items():
+            self.report_stage(stage, duration)
+        self.stdout.write(
+            f"{bayesian_rating_service.number_of_iterations_done} iterations, "
+            f"residual {bayesian_rating_service.residual:.3g}"
+        )
+        return new_network_ratings
+
+    # noinspection PyMethodMayBeStatic
+    def create_run(self, tournament, options):
+        """
+        Insert the synthetic run with its networks, and its games as pair totals only, as the rating update reads
+        nothing else.
+        """
+        name = f"bench{uuid.uuid4().hex[:8]}"
+        run = Run.objects.create(name=name, status=Run.RunStatus.INACTIVE)
+        networks = Network.objects.bulk_create(
+            [
+                Network(
+                    run=run,
+                    name=f"{name}-{network_id}",
+                    network_size="b1c1",
+                    model_file="",
+                    model_file_bytes=0,
+                    model_file_sha256="0" * 64,
+                )
+                for network_id in tournament.network_ratings.index
+            ],
+            batch_size=1000,
+        )
+        # Synthetic ids are 1 to the number of networks
+        network_pks = np.array([0] + [network.pk for network in networks], dtype=np.int64)
+        parent_ids = tournament.network_ratings["parent_network__pk"].to_numpy()
+        has_parent = parent_ids > 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                SET_PARENT_NETWORKS_SQL,
+                [
+                    network_pks[1:][has_parent].tolist(),
+                    network_pks[parent_ids[has_parent]].tolist(),
+                ],
+            )
+
+        pair_totals = tournament.pair_totals
+        num_pairs = len(pair_totals["games"])
+        copy_columns(
+            "games_ratingpairstats",
+            [
+                ("run_id", np.full(num_pairs, run.pk, dtype=np.int32)),
+                ("white_network_id", network_pks[pair_totals["white_network"]]),
+                ("black_network_id", network_pks[pair_totals["black_network"]]),
+                ("games", pair_totals["games"].astype(np.int32)),
+                ("white_wins", pair_totals["white_wins"].astype(np.int32)),
+                ("black_wins", pair_totals["black_wins"].astype(np.int32)),
+                ("draws", pair_totals["draws"].astype(np.int32)),
+            ],
+        )
+        return run
+
+    def report_stage(self, stage, duration=None):
+        """
+        Print the wall time of a stage, since the end of the previous one unless given, and the peak memory so far.
+        """
+        now = time.perf_counter()
+        if duration is None:
+            duration = now - self.stage_start_time
+        self.stage_start_time = now
+        # ru_maxrss is in kilobytes on Linux
+        peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(f"{stage:<20} {duration:10.3f}s  peak RSS {peak_memory:10.1f} MB")
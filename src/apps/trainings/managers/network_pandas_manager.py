@@ -1,17 +1,91 @@
 import logging
 
 import numpy as np
+import pandas
+from django.db import connections, transaction
 from django.db.models import Manager
-from django_pandas.io import read_frame
 
 from src.apps.trainings.managers.network_pandas_queryset import NetworkPandasQuerySet
+from src.contrib.columnar_fetch import copy_columns, fetch_columns
 
 logger = logging.getLogger(__name__)
 
+RATINGS_COLUMNS = [
+    ("id", np.int64),
+    ("parent_network__pk", np.int64),
+    ("log_gamma", np.float64),
+    ("log_gamma_uncertainty", np.float64),
+    ("log_gamma_lower_confidence", np.float64),
+    ("log_gamma_upper_confidence", np.float64),
+    ("log_gamma_game_count", np.int64),
+]
+
+# Networks without a parent get -1, and a missing, infinite or NaN rating is treated as 0.
+# Confidence bounds are only there to tell which ratings change, and are NaN for a missing, infinite or NaN
+# log_gamma, so that a network whose rating was not valid is always rewritten.
+RATINGS_SQL = """
+SELECT
+  id::bigint,
+  COALESCE(parent_network_id, -1)::bigint,
+  (CASE
+    WHEN log_gamma IN ('Infinity', '-Infinity', 'NaN') THEN 0
+    ELSE COALESCE(log_gamma, 0)
+  END)::double precision,
+  (CASE
+    WHEN log_gamma_uncertainty IN ('Infinity', '-Infinity', 'NaN') THEN 0
+    ELSE COALESCE(log_gamma_uncertainty, 0)
+  END)::double precision,
+  (CASE
+    WHEN log_gamma IS NULL OR log_gamma IN ('Infinity', '-Infinity', 'NaN') THEN 'NaN'
+    ELSE COALESCE(log_gamma_lower_confidence, 'NaN')
+  END)::double precision,
+  (CASE
+    WHEN log_gamma IS NULL OR log_gamma IN ('Infinity', '-Infinity', 'NaN') THEN 'NaN'
+    ELSE COALESCE(log_gamma_upper_confidence, 'NaN')
+  END)::double precision,
+  COALESCE(log_gamma_game_count, 0)::bigint
+FROM trainings_network
+WHERE run_id = %s
+ORDER BY id
+"""
+
+RATINGS_WRITEBACK_COLUMNS = [
+    ("id", np.int64),
+    ("log_gamma", np.float64),
+    ("log_gamma_uncertainty", np.float64),
+    ("log_gamma_lower_confidence", np.float64),
+    ("log_gamma_upper_confidence", np.float64),
+    ("log_gamma_game_count", np.int64),
+]
+
+CREATE_RATINGS_WRITEBACK_TABLE_SQL = """
+CREATE TEMPORARY TABLE trainings_network_ratings_writeback (
+  id bigint PRIMARY KEY,
+  log_gamma double precision NOT NULL,
+  log_gamma_uncertainty double precision NOT NULL,
+  log_gamma_lower_confidence double precision NOT NULL,
+  log_gamma_upper_confidence double precision NOT NULL,
+  log_gamma_game_count bigint NOT NULL
+) ON COMMIT DROP
+"""
+
+UPDATE_RATINGS_SQL = """
+UPDATE trainings_network AS network SET
+  log_gamma = ratings.log_gamma,
+  log_gamma_uncertainty = ratings.log_gamma_uncertainty,
+  log_gamma_lower_confidence = ratings.log_gamma_lower_confidence,
+  log_gamma_upper_confidence = ratings.log_gamma_upper_confidence,
+  log_gamma_game_count = ratings.log_gamma_game_count
+FROM trainings_network_ratings_writeback AS ratings
+WHERE network.id = ratings.id AND network.run_id = %s
+"""
+
+DROP_RATINGS_WRITEBACK_TABLE_SQL = "DROP TABLE trainings_network_ratings_writeback"
+
 
 class NetworkPandasManager(Manager):
     """
-    NetworkPandasManager extract the rating using NetworkPandasQueryset.
+    NetworkPandasManager extract the rating of the networks of a run, fetched column by column into NumPy.
 
     Eg:
 
@@ -28,45 +102,85 @@ class NetworkPandasManager(Manager):
         return NetworkPandasQuerySet(self.model, using=self._db)
 
     def get_ratings_dataframe(self, run):
-        rating_qs = (
-            self.filter(run=run)
-            .values("id", "parent_network__pk", "log_gamma", "log_gamma_uncertainty", "log_gamma_game_count")
-            .all()
-        )
-        rating = read_frame(rating_qs)
-        rating = rating.set_index("id")
-        rating = rating.sort_index()
-
-        rating["parent_network__pk"] = rating["parent_network__pk"].fillna(-1)
-        rating["log_gamma"] = rating["log_gamma"].fillna(0)
-        rating["log_gamma_uncertainty"] = rating["log_gamma_uncertainty"].fillna(0)
-        rating["log_gamma_uncertainty"] = rating["log_gamma_uncertainty"].replace([np.inf, -np.inf], 0)
-        rating["log_gamma_game_count"] = rating["log_gamma_game_count"].fillna(0)
-
+        rating = fetch_columns(RATINGS_SQL, [run.pk], RATINGS_COLUMNS, using=self.db)
+        rating = pandas.DataFrame(rating).set_index("id")
         return rating
 
-    def bulk_update_ratings_from_dataframe(self, dataframe):
-        networks_db = self.all()
-
-        dataframe["log_gamma_upper_confidence"] = dataframe["log_gamma"] + 2 * dataframe["log_gamma_uncertainty"]
-        dataframe["log_gamma_lower_confidence"] = dataframe["log_gamma"] - 2 * dataframe["log_gamma_uncertainty"]
-
-        for network_db in networks_db:
-            # Avoid races where the networks db changed in the meantime
-            if network_db.id in dataframe.index:
-                network_db.log_gamma = dataframe.loc[network_db.id, "log_gamma"]
-                network_db.log_gamma_uncertainty = dataframe.loc[network_db.id, "log_gamma_uncertainty"]
-                network_db.log_gamma_upper_confidence = dataframe.loc[network_db.id, "log_gamma_upper_confidence"]
-                network_db.log_gamma_lower_confidence = dataframe.loc[network_db.id, "log_gamma_lower_confidence"]
-                network_db.log_gamma_game_count = dataframe.loc[network_db.id, "log_gamma_game_count"]
-
-        self.bulk_update(
-            networks_db,
-            [
-                "log_gamma",
-                "log_gamma_uncertainty",
-                "log_gamma_upper_confidence",
-                "log_gamma_lower_confidence",
-                "log_gamma_game_count",
-            ],
-        )
+    def bulk_update_ratings_from_dataframe(self, run, dataframe, previous_dataframe=None, epsilon=1e-7):
+        """
+        Write the ratings of the networks of the run back, only those changed if previous_dataframe is given,
+        see get_changed_ratings_columns.
+
+        :return: number of networks updated
+        """
+        columns = self.get_changed_ratings_columns(dataframe, previous_dataframe, epsilon)
+        return self.bulk_update_ratings_from_columns(run, columns)
+
+    # noinspection PyMethodMayBeStatic
+    def get_changed_ratings_columns(self, dataframe, previous_dataframe=None, epsilon=1e-7):
+        """
+        If previous_dataframe holds the ratings the new ones were computed from, as stored, keep only networks whose
+        ratings or confidence bounds moved by more than epsilon, or whose game count changed.
+
+        Confidence bounds are 2 uncertainties away from log_gamma, unless the dataframe has its own
+        log_gamma_lower_confidence and log_gamma_upper_confidence columns.
+
+        :return: dict of RATINGS_WRITEBACK_COLUMNS arrays
+        """
+        log_gamma = np.asarray(dataframe["log_gamma"], dtype=np.float64)
+        log_gamma_uncertainty = np.asarray(dataframe["log_gamma_uncertainty"], dtype=np.float64)
+        compared_columns = [
+            "log_gamma",
+            "log_gamma_uncertainty",
+            "log_gamma_lower_confidence",
+            "log_gamma_upper_confidence",
+        ]
+        if "log_gamma_lower_confidence" in dataframe.columns:
+            log_gamma_lower_confidence = np.asarray(dataframe["log_gamma_lower_confidence"], dtype=np.float64)
+            log_gamma_upper_confidence = np.asarray(dataframe["log_gamma_upper_confidence"], dtype=np.float64)
+        else:
+            log_gamma_lower_confidence = log_gamma - 2 * log_gamma_uncertainty
+            log_gamma_upper_confidence = log_gamma + 2 * log_gamma_uncertainty
+        columns = {
+            "id": np.asarray(dataframe.index, dtype=np.int64),
+            "log_gamma": log_gamma,
+            "log_gamma_uncertainty": log_gamma_uncertainty,
+            "log_gamma_lower_confidence": log_gamma_lower_confidence,
+            "log_gamma_upper_confidence": log_gamma_upper_confidence,
+            "log_gamma_game_count": np.asarray(dataframe["log_gamma_game_count"], dtype=np.int64),
+        }
+
+        if previous_dataframe is not None:
+            # Networks or columns missing from previous_dataframe compare as NaN, and so are always written
+            previous = previous_dataframe.reindex(
+                index=dataframe.index, columns=compared_columns + ["log_gamma_game_count"]
+            )
+            changed = columns["log_gamma_game_count"] != previous["log_gamma_game_count"].fillna(-1).to_numpy(np.int64)
+            for column in compared_columns:
+                changed |= ~(np.abs(columns[column] - previous[column].to_numpy(dtype=np.float64)) <= epsilon)
+            columns = {name: values[changed] for (name, values) in columns.items()}
+        return columns
+
+    def bulk_update_ratings_from_columns(self, run, columns):
+        """
+        Write ratings back with one UPDATE joining a temporary table loaded by COPY.
+
+        :param columns: dict of RATINGS_WRITEBACK_COLUMNS arrays
+        :return: number of networks updated
+        """
+        if len(columns["id"]) == 0:
+            return 0
+
+        with transaction.atomic(using=self.db), connections[self.db].cursor() as cursor:
+            cursor.execute(CREATE_RATINGS_WRITEBACK_TABLE_SQL)
+            copy_columns(
+                "trainings_network_ratings_writeback",
+                [(name, columns[name]) for (name, _) in RATINGS_WRITEBACK_COLUMNS],
+                using=self.db,
+            )
+            # Avoid races where the networks db changed in the meantime, only networks still in the run get updated
+            cursor.execute(UPDATE_RATINGS_SQL, [run.pk])
+            updated_count = cursor.rowcount
+            # ON COMMIT DROP only applies once the outermost transaction commits, and this may be a mere savepoint
+            cursor.execute(DROP_RATINGS_WRITEBACK_TABLE_SQL)
+            return updated_count
@@ -0,0 +1,47 @@
+from math import e, log10
+
+import numpy as np
+from django.db.models import Manager
+
+# Fields of NetworkRatingSnapshot holding one column each, as the raw bytes of a little-endian array of the dtype
+SNAPSHOT_COLUMNS = [
+    ("network_ids", "<i8"),
+    ("log_gamma", "<f8"),
+    ("log_gamma_uncertainty", "<f8"),
+    ("log_gamma_lower_confidence", "<f8"),
+    ("log_gamma_upper_confidence", "<f8"),
+    ("log_gamma_game_count", "<i8"),
+]
+
+
+class NetworkRatingSnapshotManager(Manager):
+    # Networks are only snapshot again once their rating, uncertainty or a confidence bound moved by this many Elo,
+    # or their game count changed. Ratings are written back on much smaller moves, which runs iterated a fixed number
+    # of times keep making long after their ratings are settled for any practical purpose
+    threshold_elo = 0.5
+    threshold_log_gamma = threshold_elo / (400 * log10(e))
+
+    def record(self, run, columns):
+        """
+        Append a snapshot of the given ratings, unless there are none.
+
+        :param columns: dict of RATINGS_WRITEBACK_COLUMNS arrays, as written back by NetworkPandasManager
+        :return: the new snapshot, or None
+        """
+        if len(columns["id"]) == 0:
+            return None
+        column_values = {**columns, "network_ids": columns["id"]}
+        return self.create(
+            run=run,
+            network_count=len(columns["id"]),
+            **{
+                name: np.ascontiguousarray(column_values[name], dtype=dtype).tobytes()
+                for (name, dtype) in SNAPSHOT_COLUMNS
+            },
+        )
+
+    def select_since(self, run, snapshot_id, limit):
+        """
+        :return: up to limit snapshots of the run appended after the given one, oldest first
+        """
+        return list(self.filter(run=run, id__gt=snapshot_id).order_by("id")[:limit])
@@ -0,0 +1,39 @@
+# Generated by Django 3.0.11 on 2021-02-22 09:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('runs', '0017_run_elo_use_full_covariance_uncertainty'),
+        ('trainings', '0014_network_log_gamma_offset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NetworkRatingSnapshot',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='creation date')),
+                ('network_count', models.IntegerField(default=0, verbose_name='number of networks')),
+                ('network_ids', models.BinaryField(verbose_name='network ids')),
+                ('log_gamma', models.BinaryField(verbose_name='log_gamma')),
+                ('log_gamma_uncertainty', models.BinaryField(verbose_name='log_gamma uncertainty')),
+                ('log_gamma_lower_confidence', models.BinaryField(verbose_name='log_gamma lower confidence')),
+                ('log_gamma_upper_confidence', models.BinaryField(verbose_name='log_gamma upper confidence')),
+                ('log_gamma_game_count', models.BinaryField(verbose_name='log_gamma game count')),
+                ('run', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='runs.Run', verbose_name='run')),
+            ],
+            options={
+                'verbose_name': 'Network rating snapshot',
+                'verbose_name_plural': 'Network rating snapshots',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='networkratingsnapshot',
+            index=models.Index(fields=['run', 'id'], name='trainings_ratingsnap_run_id'),
+        ),
+    ]
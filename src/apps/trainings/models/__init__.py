@@ -1 +1,2 @@
 from .network import Network, upload_network_to
+from .network_rating_snapshot import NetworkRatingSnapshot
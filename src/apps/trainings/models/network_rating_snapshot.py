@@ -0,0 +1,46 @@
+import numpy as np
+from django.db.models import CASCADE, BigAutoField, BinaryField, DateTimeField, ForeignKey, Index, IntegerField, Model
+from django.utils.translation import gettext_lazy as _
+
+from src.apps.runs.models import Run
+from src.apps.trainings.managers.network_rating_snapshot_manager import SNAPSHOT_COLUMNS, NetworkRatingSnapshotManager
+
+
+class NetworkRatingSnapshot(Model):
+    """
+    The ratings written by one rating update, for the networks whose ratings moved by more than
+    NetworkRatingSnapshotManager.threshold_elo or whose game count changed in that update only, except for the first
+    snapshot of a run, which holds all of its networks.
+
+    Snapshots are only ever appended, so the ratings of a run at any point in time are those of the most recent
+    snapshot holding each network up to then, give or take the smaller moves left out. Each snapshot is a single row,
+    whatever the number of networks.
+    """
+
+    objects = NetworkRatingSnapshotManager()
+
+    class Meta:
+        verbose_name = _("Network rating snapshot")
+        verbose_name_plural = _("Network rating snapshots")
+        ordering = ["id"]
+        indexes = [Index(fields=["run", "id"], name="trainings_ratingsnap_run_id")]
+
+    id = BigAutoField(primary_key=True)
+    run = ForeignKey(Run, verbose_name=_("run"), on_delete=CASCADE, related_name="+", db_index=False)
+    created_at = DateTimeField(_("creation date"), auto_now_add=True)
+    network_count = IntegerField(_("number of networks"), default=0)
+    network_ids = BinaryField(_("network ids"))
+    log_gamma = BinaryField(_("log_gamma"))
+    log_gamma_uncertainty = BinaryField(_("log_gamma uncertainty"))
+    log_gamma_lower_confidence = BinaryField(_("log_gamma lower confidence"))
+    log_gamma_upper_confidence = BinaryField(_("log_gamma upper confidence"))
+    log_gamma_game_count = BinaryField(_("log_gamma game count"))
+
+    def __str__(self):
+        return f"{self.run.name} ratings #{self.id}"
+
+    def get_columns(self):
+        """
+        :return: dict of field name -> NumPy array, for each of SNAPSHOT_COLUMNS
+        """
+        return {name: np.frombuffer(bytes(getattr(self, name)), dtype=dtype) for (name, dtype) in SNAPSHOT_COLUMNS}
@@ -1 +1,7 @@
-from .network import NetworkSerializer, NetworkSerializerForElo, NetworkSerializerForTasks
+from .network import (
+    FastNetworkSerializerForTasks,
+    NetworkSerializer,
+    NetworkSerializerForElo,
+    NetworkSerializerForTasks,
+)
+from .network_rating_snapshot import NetworkRatingSnapshotSerializerForElo
@@ -3,6 +3,8 @@ from rest_framework import serializers
 from rest_framework.serializers import HyperlinkedModelSerializer
 
 from src.apps.trainings.models import Network
+from src.contrib.fast_serializer import UrlTemplate, datetime_to_representation
+
 
 class NetworkFileField(serializers.FileField):
     def get_attribute(self, instance):
@@ -20,6 +22,7 @@ class NetworkFileField(serializers.FileField):
             return request.build_absolute_uri(url)
         return url
 
+
 class NetworkZipFileField(serializers.FileField):
     def get_attribute(self, instance):
         # Pass the entire object instance, not just the field
@@ -151,6 +154,33 @@ class NetworkSerializerForTasks(HyperlinkedModelSerializer):
     model_file = NetworkDownloadField()
 
 
+class FastNetworkSerializerForTasks:
+    """
+    Gives exactly the output of NetworkSerializerForTasks(network, context={"request": request}).data, using plain
+    attribute access and precomputed url templates, for endpoints serving every client request.
+    Any change to the fields of NetworkSerializerForTasks must be mirrored here.
+    """
+
+    url_template = UrlTemplate("network-detail", "name")
+    run_url_template = UrlTemplate("run-detail", "name")
+
+    @classmethod
+    def serialize(cls, network: Network, request=None):
+        model_file = network.model_download_url or None
+        if model_file is not None and request is not None:
+            model_file = request.build_absolute_uri(model_file)
+        return {
+            "url": cls.url_template.build(network.name, request),
+            "run": cls.run_url_template.build(network.run.name, request),
+            "name": network.name,
+            "created_at": datetime_to_representation(network.created_at),
+            "is_random": network.is_random,
+            "model_file": model_file,
+            "model_file_bytes": network.model_file_bytes,
+            "model_file_sha256": network.model_file_sha256,
+        }
+
+
 class NetworkSerializerForElo(HyperlinkedModelSerializer):
     """
     Serializer exposing only the fields of a network for plotting the network strength over time
@@ -0,0 +1,26 @@
+from src.apps.trainings.models import NetworkRatingSnapshot
+from src.contrib.fast_serializer import datetime_to_representation
+
+
+class NetworkRatingSnapshotSerializerForElo:
+    """
+    Gives the ratings of a snapshot column by column, with networks by name, as compact as JSON allows for charts
+    """
+
+    @classmethod
+    def serialize(cls, snapshot: NetworkRatingSnapshot, network_names):
+        """
+        :param network_names: dict of network id -> name of the networks of the snapshot, those missing from it,
+                              as deleted since, are given without a name
+        """
+        columns = snapshot.get_columns()
+        return {
+            "id": snapshot.id,
+            "created_at": datetime_to_representation(snapshot.created_at),
+            "networks": [network_names.get(network_id) for network_id in columns["network_ids"].tolist()],
+            "log_gamma": columns["log_gamma"].tolist(),
+            "log_gamma_uncertainty": columns["log_gamma_uncertainty"].tolist(),
+            "log_gamma_lower_confidence": columns["log_gamma_lower_confidence"].tolist(),
+            "log_gamma_upper_confidence": columns["log_gamma_upper_confidence"].tolist(),
+            "log_gamma_game_count": columns["log_gamma_game_count"].tolist(),
+        }
@@ -1 +1,7 @@
 from .bayesian_elo import BayesianRatingService
+from .network_rating_table import NetworkRatingTable, NetworkRatingTableService
+from .network_task_payload import NetworkTaskPayloadService
+from .network_timeline import NetworkTimeline, NetworkTimelineService
+from .rating_bootstrap import RatingBootstrapService
+from .sparse_bayesian_elo import SparseBayesianRatingService
+from .synthetic_tournament import SyntheticTournament
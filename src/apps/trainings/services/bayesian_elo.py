@@ -22,6 +22,11 @@ class BayesianRatingService:
 
     _simplified_tournament_results = None
     _networks_actual_score = None
+    _orphan_network_ids = None
+    _orphan_prior_expected_scores = None
+    _orphan_prior_precisions = None
+
+    orphan_virtual_draw_strength = 0.01
 
     def __init__(
         self,
@@ -51,6 +56,7 @@ class BayesianRatingService:
         self._calculate_networks_actual_score()
 
         for iteration_index in range(number_of_iterations):
+            self._orphan_prior_expected_scores, _ = self._calculate_orphan_prior_terms()
             for network_id in reversed(self._network_ratings.index):
                 network_log_gamma = self._network_ratings.loc[network_id, "log_gamma"]
                 self._update_specific_network_log_gamma(network_id, network_log_gamma)
@@ -65,6 +71,7 @@ class BayesianRatingService:
         df = df.groupby(["reference_network"]).sum()
         real_game_count_by_network = df
 
+        _, self._orphan_prior_precisions = self._calculate_orphan_prior_terms()
         for network in self._network_ratings.itertuples():
             network_id = network[0]
             network_log_gamma = network.log_gamma
@@ -115,9 +122,13 @@ class BayesianRatingService:
         Whenever a NEW player is added to the above, it is necessary to add a Bayesian prior to obtain good results
         and keep the math from blowing up.
         A reasonable prior is to add some number of "virtual draws" between the new player and the immediately previous neural net version.
+
+        Networks without a parent get a much weaker prior instead, which is not part of the tournament results,
+        see _calculate_orphan_prior_terms.
         """
         virtual_draws_src = []
-        network_ids = list(self._network_ratings.index)
+        network_ids = set(self._network_ratings.index)
+        self._orphan_network_ids = []
 
         for network in self._network_ratings.itertuples():
             network_id = network[0]
@@ -140,25 +151,9 @@ class BayesianRatingService:
                 virtual_draws_src.append(draw1)
                 virtual_draws_src.append(draw2)
             # It's possible to get a divide by zero if we have no parent network
-            # If we don't know a parent network and it's not the anchor, then add a very weak prior that the network is equal to every network except itself
+            # If we don't know a parent network and it's not the anchor, then add a very weak prior that the network is equal to every other network
             elif network_id != self._network_anchor_id:
-                num_other_networks = len(self._network_ratings) - 1
-                if num_other_networks > 0:
-                    for other_network in self._network_ratings.itertuples():
-                        other_network_id = other_network[0]
-                        if other_network_id != network_id:
-                            draw1 = {
-                                "reference_network": network_id,
-                                "opponent_network": other_network_id,
-                                "total_bayesian_virtual_draws": 0.01 / num_other_networks,
-                            }
-                            draw2 = {
-                                "reference_network": other_network_id,
-                                "opponent_network": network_id,
-                                "total_bayesian_virtual_draws": 0.01 / num_other_networks,
-                            }
-                            virtual_draws_src.append(draw1)
-                            virtual_draws_src.append(draw2)
+                self._orphan_network_ids.append(network_id)
 
         virtual_draw = pandas.DataFrame(
             virtual_draws_src, columns=["reference_network", "opponent_network", "total_bayesian_virtual_draws"]
@@ -224,8 +219,45 @@ class BayesianRatingService:
             if network_id not in networks_actual_score.index:
                 networks_actual_score.loc[network_id] = {"actual_score": 0.0}
 
+        # Draws count as half a win each way, see _calculate_orphan_prior_terms
+        num_other_networks = len(self._network_ratings) - 1
+        strength = self.orphan_virtual_draw_strength
+        networks_actual_score["actual_score"] += 0.5 * strength * len(self._orphan_network_ids) / num_other_networks
+        for network_id in self._orphan_network_ids:
+            networks_actual_score.loc[network_id, "actual_score"] += 0.5 * strength * (1 - 1 / num_other_networks)
+
         self._networks_actual_score = networks_actual_score
 
+    def _calculate_orphan_prior_terms(self):
+        """
+        The prior of each network Po without a parent is orphan_virtual_draw_strength virtual draws against a virtual
+        network rated at the average log_gamma of all other networks, with win probability:
+            p(Po) = 1 / (1 + exp(average_log_gamma(all networks but Po) - log_gamma(Po)))
+        Each other network takes a 1 / (num_networks - 1) share of the opposite side of these draws, so that the prior
+        costs O(num_networks) however many networks have no parent.
+
+        :return: Tuple of (expected score, precision) Series of each network from the orphan priors
+        """
+        log_gamma = self._network_ratings["log_gamma"]
+        num_other_networks = len(log_gamma) - 1
+        strength = self.orphan_virtual_draw_strength
+
+        orphan_log_gamma = log_gamma.loc[self._orphan_network_ids]
+        others_average_log_gamma = (log_gamma.sum() - orphan_log_gamma) / num_other_networks
+        win_probabilities = 1 / (1 + np.exp(others_average_log_gamma - orphan_log_gamma))
+        orphan_precisions = strength * win_probabilities * (1 - win_probabilities)
+
+        # Every network takes its share of the opposite side of all the orphan priors but its own
+        expected_scores = pandas.Series(
+            strength * np.sum(1 - win_probabilities) / num_other_networks, index=log_gamma.index
+        )
+        expected_scores.loc[self._orphan_network_ids] += (
+            strength * win_probabilities - strength * (1 - win_probabilities) / num_other_networks
+        )
+        precisions = pandas.Series(np.sum(orphan_precisions) / num_other_networks, index=log_gamma.index)
+        precisions.loc[self._orphan_network_ids] += orphan_precisions - orphan_precisions / num_other_networks
+        return expected_scores, precisions
+
     def _update_specific_network_log_gamma(self, network_id, network_previous_log_gamma):
         expected_score = self._calculate_specific_network_expected_score(network_id, network_previous_log_gamma)
         actual_score = self._networks_actual_score.loc[network_id, "actual_score"]
@@ -254,7 +286,7 @@ class BayesianRatingService:
             win_probability = 1 / (1 + exp(log_gamma_diff))
             expected_score += win_probability * game.nb_games
 
-        return expected_score
+        return expected_score + self._orphan_prior_expected_scores.loc[network_id]
 
     def _reset_anchor_log_gamma(self):
         """
@@ -292,4 +324,4 @@ class BayesianRatingService:
             total_precision += game.nb_games * this_game_precision
             # logger.warning(repr(game) + " " + str(this_game_precision) + " " + str(game.nb_games))
 
-        return total_precision
+        return total_precision + self._orphan_prior_precisions.loc[network_id]
@@ -0,0 +1,112 @@
+import numpy as np
+
+from src.apps.runs.models import Run
+from src.apps.trainings.models import Network
+from src.contrib.cache_version import bump_cache_version, get_cache_version
+from src.contrib.lru_dict import LRUDict
+
+
+class NetworkRatingTable:
+    """
+    NetworkRatingTable holds the rating fields of all the networks of a run as NumPy columns, so that selecting
+    networks by log_gamma can be done with binary searches and vectorized math instead of database queries.
+
+    All columns are indexed by row, and self.networks[row] is the corresponding network instance.
+    """
+
+    def __init__(self, networks, version=None):
+        self.version = version
+
+        num_networks = len(networks)
+        self.networks = np.empty(num_networks, dtype=object)
+        self.networks[:] = networks
+        self.ids = np.array([network.id for network in networks], dtype=np.int64)
+        self.log_gamma = np.array([network.log_gamma for network in networks], dtype=np.float64)
+        self.log_gamma_uncertainty = np.array([network.log_gamma_uncertainty for network in networks], dtype=np.float64)
+        self.log_gamma_game_count = np.array([network.log_gamma_game_count for network in networks], dtype=np.int64)
+        self.created_at = np.array([network.created_at.timestamp() for network in networks], dtype=np.float64)
+        self.rating_games_enabled = np.array([network.rating_games_enabled for network in networks], dtype=bool)
+        self.training_games_enabled = np.array([network.training_games_enabled for network in networks], dtype=bool)
+        self._rows_by_id = {network_id: row for row, network_id in enumerate(self.ids.tolist())}
+
+        # Rank of each row in the default network ordering (most recent first), so that candidates can be handed
+        # out in the same order as a database query would have returned them
+        self.recency_rank = np.empty(num_networks, dtype=np.int64)
+        self.recency_rank[np.lexsort((-self.ids, -self.created_at))] = np.arange(num_networks)
+
+        rating_rows = np.flatnonzero(self.rating_games_enabled)
+        self.rating_rows_by_log_gamma = rating_rows[np.argsort(self.log_gamma[rating_rows], kind="stable")]
+        self.sorted_rating_log_gamma = self.log_gamma[self.rating_rows_by_log_gamma]
+
+    @classmethod
+    def from_run(cls, run: Run, version=None):
+        networks = list(Network.objects.filter(run=run).select_related("run"))
+        return cls(networks, version)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get_network(self, network_id):
+        """
+        :return: the network with the given id, or None if it is not in the table
+        """
+        row = self._rows_by_id.get(network_id)
+        if row is None:
+            return None
+        return self.networks[row]
+
+    def select_rating_rows_in_log_gamma_range(self, lower_bound, upper_bound, exclude_id=None):
+        """
+        :return: rows of networks enabled for rating games with lower_bound <= log_gamma <= upper_bound,
+                 most recent first
+        """
+        lower_index = np.searchsorted(self.sorted_rating_log_gamma, lower_bound, side="left")
+        upper_index = np.searchsorted(self.sorted_rating_log_gamma, upper_bound, side="right")
+        rows = self.rating_rows_by_log_gamma[lower_index:upper_index]
+        if exclude_id is not None:
+            rows = rows[self.ids[rows] != exclude_id]
+        return rows[np.argsort(self.recency_rank[rows], kind="stable")]
+
+    def select_nearest_rating_rows(self, log_gamma, count, exclude_id=None):
+        """
+        :return: Tuple of (weaker rows, stronger rows), each holding up to count networks enabled for rating games
+                 with log_gamma respectively <= and >= the given log_gamma, nearest first
+        """
+        split_index = np.searchsorted(self.sorted_rating_log_gamma, log_gamma, side="right")
+        weaker_rows = self.rating_rows_by_log_gamma[max(split_index - count - 1, 0) : split_index][::-1]
+        split_index = np.searchsorted(self.sorted_rating_log_gamma, log_gamma, side="left")
+        stronger_rows = self.rating_rows_by_log_gamma[split_index : split_index + count + 1]
+        if exclude_id is not None:
+            weaker_rows = weaker_rows[self.ids[weaker_rows] != exclude_id]
+            stronger_rows = stronger_rows[self.ids[stronger_rows] != exclude_id]
+        return weaker_rows[:count], stronger_rows[:count]
+
+
+class NetworkRatingTableService:
+    """
+    NetworkRatingTableService keeps one NetworkRatingTable per run in each worker process, rebuilt only when the
+    version stamp of the run is bumped, which happens whenever a network is saved or ratings are recomputed.
+    Only the tables of the few runs most recently served are kept.
+    """
+
+    _tables = LRUDict(max_size=4)
+
+    @staticmethod
+    def _version_cache_key(run_id):
+        return f"trainings:network_rating_table_version:{run_id}"
+
+    @classmethod
+    def get(cls, run: Run):
+        # Read the version before the networks so that a concurrent bump can only make us rebuild once more, never miss
+        version = get_cache_version(cls._version_cache_key(run.pk))
+        table = cls._tables.get(run.pk)
+        if table is not None and table.version == version:
+            return table
+
+        table = NetworkRatingTable.from_run(run, version)
+        cls._tables[run.pk] = table
+        return table
+
+    @classmethod
+    def invalidate(cls, run_id):
+        bump_cache_version(cls._version_cache_key(run_id))
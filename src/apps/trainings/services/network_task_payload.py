@@ -0,0 +1,51 @@
+from rest_framework.settings import api_settings
+
+from src.apps.trainings.models import Network
+from src.apps.trainings.serializers import FastNetworkSerializerForTasks
+from src.contrib.cache_version import bump_cache_version, get_cache_version
+from src.contrib.lru_dict import LRUDict
+
+
+class NetworkTaskPayloadService:
+    """
+    NetworkTaskPayloadService keeps the NetworkSerializerForTasks output of networks in each worker process, so that
+    the networks handed out in tasks are serialized once instead of on every request.
+
+    Payloads hold absolute urls, so they are cached separately for each scheme and host that requests come from,
+    and for each value of the format query parameter that rest_framework carries over into urls.
+    All the payloads of a run are dropped whenever the version stamp of the run is bumped by a network save or delete,
+    and only those of the few runs most recently served are kept.
+    """
+
+    # run_id -> (version, {(network_id, base url): payload}), replaced as a whole so threads never see half of it
+    _payloads = LRUDict(max_size=4)
+
+    @staticmethod
+    def _version_cache_key(run_id):
+        return f"trainings:network_task_payloads_version:{run_id}"
+
+    @classmethod
+    def get(cls, network: Network, request=None):
+        """
+        :return: the serialized network, as NetworkSerializerForTasks(network, context={"request": request}).data
+        """
+        # Read the version before serializing so that a concurrent bump can only make us serialize once more, never miss
+        version = get_cache_version(cls._version_cache_key(network.run_id))
+        cached_version, payloads = cls._payloads.get(network.run_id, (None, None))
+        if cached_version != version:
+            payloads = {}
+            cls._payloads[network.run_id] = (version, payloads)
+
+        if request is not None:
+            key = (network.pk, request.build_absolute_uri("/"), request.GET.get(api_settings.URL_FORMAT_OVERRIDE))
+        else:
+            key = (network.pk, None, None)
+        payload = payloads.get(key)
+        if payload is None:
+            payload = FastNetworkSerializerForTasks.serialize(network, request)
+            payloads[key] = payload
+        return payload
+
+    @classmethod
+    def invalidate(cls, run_id):
+        bump_cache_version(cls._version_cache_key(run_id))
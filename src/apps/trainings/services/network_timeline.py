@@ -0,0 +1,74 @@
+from bisect import bisect_right
+from datetime import timedelta
+
+from django.utils import timezone
+
+from src.apps.runs.models import Run
+from src.apps.trainings.models import Network
+from src.contrib.cache_version import bump_cache_version, get_cache_version
+from src.contrib.lru_dict import LRUDict
+
+
+class NetworkTimeline:
+    """
+    NetworkTimeline holds the networks of a run enabled for training games sorted by creation date, so that the most
+    recent network older than any client network delay can be found with a binary search instead of a database query.
+    """
+
+    def __init__(self, networks, version=None):
+        self.version = version
+        self.networks = sorted(networks, key=lambda network: (network.created_at, network.pk))
+        self.created_at = [network.created_at for network in self.networks]
+
+    @classmethod
+    def from_run(cls, run: Run, version=None):
+        networks = list(Network.objects.filter(run=run, training_games_enabled=True).select_related("run"))
+        return cls(networks, version)
+
+    def __len__(self):
+        return len(self.networks)
+
+    def select_most_recent(self, network_delay=None, now=None):
+        """
+        Equivalent to NetworkQuerySet.select_most_recent(run, for_training_games=True, network_delay=network_delay)
+
+        :return: the most recent network created at least network_delay seconds ago, or None if there is none
+        """
+        if network_delay is None:
+            index = len(self.networks)
+        else:
+            max_time = (now or timezone.now()) - timedelta(seconds=network_delay)
+            index = bisect_right(self.created_at, max_time)
+        if index <= 0:
+            return None
+        return self.networks[index - 1]
+
+
+class NetworkTimelineService:
+    """
+    NetworkTimelineService keeps one NetworkTimeline per run in each worker process, rebuilt only when the version
+    stamp of the run is bumped, which happens whenever a network is saved or deleted.
+    Only the timelines of the few runs most recently served are kept.
+    """
+
+    _timelines = LRUDict(max_size=4)
+
+    @staticmethod
+    def _version_cache_key(run_id):
+        return f"trainings:network_timeline_version:{run_id}"
+
+    @classmethod
+    def get(cls, run: Run):
+        # Read the version before the networks so that a concurrent bump can only make us rebuild once more, never miss
+        version = get_cache_version(cls._version_cache_key(run.pk))
+        timeline = cls._timelines.get(run.pk)
+        if timeline is not None and timeline.version == version:
+            return timeline
+
+        timeline = NetworkTimeline.from_run(run, version)
+        cls._timelines[run.pk] = timeline
+        return timeline
+
+    @classmethod
+    def invalidate(cls, run_id):
+        bump_cache_version(cls._version_cache_key(run_id))
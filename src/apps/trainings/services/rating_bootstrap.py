@@ -0,0 +1,177 @@
+import logging
+import os
+import time
+
+import numpy as np
+import pandas
+from billiard.pool import Pool
+
+from src.apps.games.managers.rating_game_pandas_manager import (
+    get_pair_totals_from_tournament_results,
+    get_tournament_results_from_pair_totals,
+)
+from src.apps.trainings.services.sparse_bayesian_elo import SparseBayesianRatingService
+
+logger = logging.getLogger(__name__)
+
+
+def _solve_bootstrap_samples(
+    network_ratings, network_anchor_id, pair_totals, virtual_draw_strength, solver_options, seed_sequences
+):
+    """
+    Resample the games of every pair of networks and compute the ratings of each sample, one per seed sequence.
+    Defined at module level so that it can be sent to pool processes.
+
+    :return: array of shape (number of samples, number of networks) of log_gamma, in the order of network_ratings
+    """
+    samples = np.empty((len(seed_sequences), len(network_ratings)), dtype=np.float64)
+    for (sample_index, seed_sequence) in enumerate(seed_sequences):
+        rng = np.random.default_rng(seed_sequence)
+        # Poisson bootstrap: drawing each outcome count from a Poisson of the same mean resamples the games of the
+        # pair with replacement, without having to expand them one by one
+        white_wins = rng.poisson(pair_totals["white_wins"])
+        black_wins = rng.poisson(pair_totals["black_wins"])
+        draws = rng.poisson(pair_totals["draws"])
+        resampled_pair_totals = {
+            **pair_totals,
+            "games": white_wins + black_wins + draws,
+            "white_wins": white_wins,
+            "black_wins": black_wins,
+            "draws": draws,
+        }
+        resampled_tournament_results = get_tournament_results_from_pair_totals(resampled_pair_totals)
+        rating_service = SparseBayesianRatingService(
+            network_ratings, network_anchor_id, resampled_tournament_results, virtual_draw_strength
+        )
+        samples[sample_index] = rating_service.update_ratings_iteratively(**solver_options)["log_gamma"]
+    return samples
+
+
+class RatingBootstrapService:
+    """
+    RatingBootstrapService estimates confidence bounds of log_gamma empirically, by resampling the rating games many
+    times and computing the ratings of each sample again. Unlike bounds derived from the uncertainty, which only looks
+    at the games of each network on its own, these account for the correlations between networks, and so are more
+    honest for networks only loosely connected to the rest.
+
+    Samples start from the given ratings, which should already be the converged ratings of the actual games, so that
+    each of them only has a little way to go. They are spread over a pool of processes, from billiard rather than
+    multiprocessing, since billiard lets the daemon processes of a celery prefork worker have children.
+    """
+
+    # Percentiles covering as much as 2 standard deviations on each side of a normal distribution, like the bounds
+    # derived from the uncertainty
+    confidence_percentiles = (2.275, 97.725)
+    # Fewer samples than this give bounds too noisy to be worth more than the uncertainty
+    min_number_of_samples = 10
+    # Each sample is solved with Newton steps until no log_gamma moves by more than sample_tolerance, whatever the
+    # settings of the run, since samples stopped early stay close to their starting point and give too narrow bounds.
+    # Newton steps converge in a handful of iterations, max_sample_iterations only guards against degenerate samples
+    sample_tolerance = 1e-9
+    max_sample_iterations = 1000
+
+    def __init__(
+        self,
+        network_ratings: pandas.DataFrame,
+        network_anchor_id,
+        detailed_tournament_results: pandas.DataFrame,
+        virtual_draw_strength,
+    ):
+        self._network_ratings = network_ratings
+        self._network_anchor_id = network_anchor_id
+        self._pair_totals = get_pair_totals_from_tournament_results(detailed_tournament_results)
+        self._virtual_draw_strength = virtual_draw_strength
+
+        # Filled by add_confidence_bounds
+        self.number_of_samples_done = 0
+
+    def add_confidence_bounds(self, number_of_samples, time_budget, max_workers=0, seed=None):
+        """
+        Draw up to number_of_samples samples, stopping early once time_budget seconds elapsed.
+
+        :param max_workers: number of pool processes, one per CPU if 0. Samples are drawn in the calling process if 1.
+        :return: copy of the network ratings with log_gamma_lower_confidence and log_gamma_upper_confidence columns,
+                 or without them if fewer than min_number_of_samples samples could be drawn in time
+        """
+        self.number_of_samples_done = 0
+        new_network_ratings = self._network_ratings.copy()
+        if len(new_network_ratings) <= 1 or number_of_samples < self.min_number_of_samples:
+            return new_network_ratings
+
+        if max_workers <= 0:
+            max_workers = os.cpu_count() or 1
+
+        solver_options = {
+            "number_of_iterations": self.max_sample_iterations,
+            "tolerance": self.sample_tolerance,
+            "use_newton_acceleration": True,
+        }
+        seed_sequences = np.random.SeedSequence(seed).spawn(number_of_samples)
+        start_time = time.monotonic()
+        if max_workers == 1:
+            samples = self._draw_samples_sequentially(seed_sequences, solver_options, start_time, time_budget)
+        else:
+            samples = self._draw_samples_in_parallel(
+                seed_sequences, solver_options, start_time, time_budget, max_workers
+            )
+
+        self.number_of_samples_done = len(samples)
+        logger.info(
+            f"Drew {self.number_of_samples_done} rating bootstrap samples in {time.monotonic() - start_time:.1f}s"
+        )
+        if self.number_of_samples_done < self.min_number_of_samples:
+            return new_network_ratings
+
+        (lower_confidence, upper_confidence) = np.percentile(samples, self.confidence_percentiles, axis=0)
+        # Keep the ratings within their bounds even when the samples are skewed. Every sample is anchored at the
+        # same network, whose bounds so collapse onto its log_gamma
+        new_network_ratings["log_gamma_lower_confidence"] = np.minimum(
+            lower_confidence, new_network_ratings["log_gamma"]
+        )
+        new_network_ratings["log_gamma_upper_confidence"] = np.maximum(
+            upper_confidence, new_network_ratings["log_gamma"]
+        )
+        return new_network_ratings
+
+    def _draw_samples_sequentially(self, seed_sequences, solver_options, start_time, time_budget):
+        samples = []
+        for seed_sequence in seed_sequences:
+            if time.monotonic() - start_time >= time_budget:
+                break
+            sample = _solve_bootstrap_samples(
+                self._network_ratings,
+                self._network_anchor_id,
+                self._pair_totals,
+                self._virtual_draw_strength,
+                solver_options,
+                [seed_sequence],
+            )
+            samples.append(sample[0])
+        return np.array(samples).reshape(len(samples), len(self._network_ratings))
+
+    def _draw_samples_in_parallel(self, seed_sequences, solver_options, start_time, time_budget, max_workers):
+        """
+        Hand out samples in rounds of one per worker, checking the time budget between rounds, so that it is never
+        exceeded by more than the time of one sample.
+        """
+        samples = []
+        with Pool(processes=max_workers) as pool:
+            for round_start in range(0, len(seed_sequences), max_workers):
+                if time.monotonic() - start_time >= time_budget:
+                    break
+                results = [
+                    pool.apply_async(
+                        _solve_bootstrap_samples,
+                        (
+                            self._network_ratings,
+                            self._network_anchor_id,
+                            self._pair_totals,
+                            self._virtual_draw_strength,
+                            solver_options,
+                            [seed_sequence],
+                        ),
+                    )
+                    for seed_sequence in seed_sequences[round_start : round_start + max_workers]
+                ]
+                samples.extend(result.get()[0] for result in results)
+        return np.array(samples).reshape(len(samples), len(self._network_ratings))
@@ -0,0 +1,457 @@
+import logging
+import time
+
+import numpy as np
+import pandas
+from scipy import sparse
+from scipy.sparse.linalg import splu, spsolve
+from scipy.special import expit
+
+from src.apps.trainings.services.bayesian_elo import BayesEloInconsistentDataError
+
+logger = logging.getLogger(__name__)
+
+
+def calculate_inverse_diagonal(matrix):
+    """
+    Compute the diagonal of the inverse of a sparse symmetric positive definite matrix, with the Takahashi recurrences
+    over its sparse LDL^T factorization. Only the entries of the inverse within the pattern of the factor are ever
+    computed, from the last column to the first:
+        Z[J, i] = -Z[J, J] @ L[J, i]
+        Z[i, i] = 1 / D[i] - L[J, i] @ Z[J, i]
+    where J are the rows below the diagonal of column i of the factor, which the fill-in makes a clique, so that the
+    entries of Z[J, J] were always computed before. That no longer holds when fill-in entries underflow to 0, which
+    the factorization then leaves out, as with weights around 1e-300.
+
+    :raise RuntimeError: if the matrix is singular, could not be factorized symmetrically, or its factor misses fill-in
+    """
+    factorization = splu(
+        sparse.csc_matrix(matrix),
+        permc_spec="MMD_AT_PLUS_A",
+        diag_pivot_thresh=0.0,
+        options={"SymmetricMode": True},
+    )
+    # Without pivoting, rows and columns are permuted alike and U = D L^T
+    if not np.array_equal(factorization.perm_r, factorization.perm_c):
+        raise RuntimeError("Matrix could not be factorized symmetrically")
+    factor = sparse.csc_matrix(factorization.L)
+    factor.sort_indices()
+    pivots = factorization.U.diagonal()
+
+    num_rows = factor.shape[0]
+    inverse_rows = [None] * num_rows
+    inverse_values = [None] * num_rows
+    inverse_diagonal = np.empty(num_rows)
+    for i in range(num_rows - 1, -1, -1):
+        column_rows = factor.indices[factor.indptr[i] : factor.indptr[i + 1]]
+        column_values = factor.data[factor.indptr[i] : factor.indptr[i + 1]]
+        below_diagonal = column_rows > i
+        rows = column_rows[below_diagonal]
+        values = column_values[below_diagonal]
+
+        inverse_block = np.empty((len(rows), len(rows)))
+        for (index, row) in enumerate(rows):
+            positions = np.searchsorted(inverse_rows[row], rows[index:])
+            if positions[-1] >= len(inverse_rows[row]) or not np.array_equal(
+                inverse_rows[row][positions], rows[index:]
+            ):
+                raise RuntimeError("Factor of the matrix misses fill-in entries")
+            inverse_column = inverse_values[row][positions]
+            inverse_block[index:, index] = inverse_column
+            inverse_block[index, index:] = inverse_column
+        inverse_column = -inverse_block @ values
+        inverse_diagonal[i] = 1.0 / pivots[i] - values @ inverse_column
+        inverse_rows[i] = np.concatenate([[i], rows])
+        inverse_values[i] = np.concatenate([[inverse_diagonal[i]], inverse_column])
+
+    # Row perm_c[i] of the factorization is row i of the matrix
+    return inverse_diagonal[factorization.perm_c]
+
+
+class SparseBayesianRatingService:
+    """
+    SparseBayesianRatingService computes the same ratings as BayesianRatingService, but holds the tournament as a
+    scipy.sparse matrix of (reference network, opponent network) game counts and runs every update as vectorized
+    operations over the nonzero pairs, instead of filtering pandas frames for each network.
+
+    Like BayesianRatingService, updates are done in Gauss-Seidel fashion so that they converge as fast. Networks are
+    split into groups that never played each other (a greedy coloring of the pair graph), and each group is updated
+    at once, which gives the result of updating its networks one by one, up to the weak prior of networks without
+    a parent, which is spread over all networks.
+
+    Iterations start from the log_gamma of the given network ratings, so that when the ratings were already computed
+    before and only a few games were added since, they only have a little way to go.
+    """
+
+    newton_max_step_halvings = 10
+    orphan_virtual_draw_strength = 0.01
+
+    def __init__(
+        self,
+        network_ratings: pandas.DataFrame,
+        network_anchor_id,
+        detailed_tournament_results: pandas.DataFrame,
+        virtual_draw_strength,
+    ):
+        self._network_ratings = network_ratings
+        self._network_anchor_id = network_anchor_id
+        self._detailed_tournament_results = detailed_tournament_results
+        self._virtual_draw_strength = virtual_draw_strength
+
+        self._network_ids = np.asarray(network_ratings.index, dtype=np.int64)
+        self._anchor_index = None
+        self._games = None
+        self._wins = None
+        self._pair_rows = None
+        self._actual_scores = None
+        self._real_game_counts = None
+        self._orphan_rows = None
+        self._prior_actual_scores = None
+        self._color_groups = None
+
+        # Filled by update_ratings_iteratively, for the caller to keep track of how much work it took
+        self.number_of_iterations_done = 0
+        self.residual = 0.0
+        # Seconds spent in each stage of update_ratings_iteratively, for benchmarks
+        self.stage_durations = {}
+
+    def update_ratings_iteratively(
+        self,
+        number_of_iterations,
+        tolerance=0.0,
+        use_newton_acceleration=False,
+        use_full_covariance_uncertainty=False,
+    ):
+        """
+        Iterate until the largest change of any log_gamma in an iteration falls below tolerance, or until
+        number_of_iterations were done. With the default tolerance of 0, exactly number_of_iterations are done.
+
+        With use_newton_acceleration, each iteration tries a Newton step on the whole log probability first, and
+        only falls back to a minorization-maximization sweep when that step does not improve it.
+
+        With use_full_covariance_uncertainty, uncertainties are the marginal standard deviations of the whole
+        posterior instead of each network's own precision.
+        """
+        self.number_of_iterations_done = 0
+        self.residual = 0.0
+        self.stage_durations = {}
+        # Confidence bounds of the previous ratings, if given, do not hold for the new ones
+        new_network_ratings = self._network_ratings.drop(
+            columns=["log_gamma_lower_confidence", "log_gamma_upper_confidence"], errors="ignore"
+        )
+        # Skip if we don't have enough networks to have ratings
+        if len(new_network_ratings) <= 1:
+            return new_network_ratings
+
+        stage_start_time = time.perf_counter()
+        self._assert_detailed_tournament_results_consistency()
+        self._build_tournament_matrices()
+        self._assert_tournament_matrices_consistency()
+        self._color_pair_graph()
+        self.stage_durations["tournament_matrices"] = time.perf_counter() - stage_start_time
+
+        stage_start_time = time.perf_counter()
+        log_gamma = np.array(self._network_ratings["log_gamma"], dtype=np.float64)
+        log_gamma -= log_gamma[self._anchor_index]
+        for iteration_index in range(number_of_iterations):
+            previous_log_gamma = log_gamma.copy()
+            newton_log_gamma = self._calculate_newton_step(log_gamma) if use_newton_acceleration else None
+            if newton_log_gamma is not None:
+                log_gamma = newton_log_gamma
+            else:
+                for (rows, games) in self._color_groups:
+                    log_gamma[rows] += self._calculate_log_gamma_diffs(log_gamma, rows, games)
+            log_gamma -= log_gamma[self._anchor_index]
+
+            self.number_of_iterations_done = iteration_index + 1
+            self.residual = float(np.max(np.abs(log_gamma - previous_log_gamma)))
+            if self.residual < tolerance:
+                break
+        self.stage_durations["iterations"] = time.perf_counter() - stage_start_time
+
+        stage_start_time = time.perf_counter()
+        new_network_ratings["log_gamma"] = log_gamma
+        if use_full_covariance_uncertainty:
+            uncertainties = self._calculate_log_gamma_marginal_uncertainties(log_gamma)
+        else:
+            uncertainties = self._calculate_log_gamma_uncertainties(log_gamma)
+        new_network_ratings["log_gamma_uncertainty"] = uncertainties
+        self.stage_durations["uncertainty"] = time.perf_counter() - stage_start_time
+        new_network_ratings["log_gamma_game_count"] = self._real_game_counts
+        return new_network_ratings
+
+    def _assert_detailed_tournament_results_consistency(self):
+        # Something is wrong if the total number of wins and draws summed across everything is inconsistent with the number of games
+        results = self._detailed_tournament_results
+        game_count_times_two_via_results = (
+            2 * np.sum(results["total_wins_white"])
+            + 2 * np.sum(results["total_wins_black"])
+            + np.sum(results["total_draw_or_no_result_white"])
+            + np.sum(results["total_draw_or_no_result_black"])
+        )
+        game_count_times_two_via_games = np.sum(results["total_games_white"]) + np.sum(results["total_games_black"])
+        if game_count_times_two_via_results != game_count_times_two_via_games:
+            raise BayesEloInconsistentDataError(
+                "Inconsistent rating games results in Elo calculation: wins != games summed across networks"
+            )
+
+    def _assert_tournament_matrices_consistency(self):
+        if np.min(self._games.data - self._wins.data, initial=0.0) < 0:
+            raise BayesEloInconsistentDataError(
+                "Inconsistent rating games results in Elo calculation: simplified wins > games for some network"
+            )
+
+    def _build_tournament_matrices(self):
+        """
+        Build the sparse matrices of games and wins (counting draws as half a win) of each reference network against
+        each opponent network, including the Bayesian prior virtual draws.
+        """
+        num_networks = len(self._network_ids)
+        network_index = pandas.Index(self._network_ids)
+        self._anchor_index = network_index.get_loc(self._network_anchor_id)
+
+        results = self._detailed_tournament_results
+        reference_rows = network_index.get_indexer(np.asarray(results["reference_network"], dtype=np.int64))
+        opponent_rows = network_index.get_indexer(np.asarray(results["opponent_network"], dtype=np.int64))
+        real_games = np.asarray(results["total_games_white"] + results["total_games_black"], dtype=np.float64)
+        real_wins = np.asarray(
+            results["total_wins_white"]
+            + results["total_wins_black"]
+            + 0.5 * results["total_draw_or_no_result_white"]
+            + 0.5 * results["total_draw_or_no_result_black"],
+            dtype=np.float64,
+        )
+        # Games against networks that are not part of the ratings cannot be used, the same way as if they were deleted
+        known = (reference_rows >= 0) & (opponent_rows >= 0)
+        reference_rows, opponent_rows = reference_rows[known], opponent_rows[known]
+        real_games, real_wins = real_games[known], real_wins[known]
+
+        self._real_game_counts = np.bincount(reference_rows, weights=real_games, minlength=num_networks)
+
+        (virtual_reference_rows, virtual_opponent_rows, virtual_draws) = self._get_virtual_draws(network_index)
+        coordinates = (
+            np.concatenate([reference_rows, virtual_reference_rows]),
+            np.concatenate([opponent_rows, virtual_opponent_rows]),
+        )
+        shape = (num_networks, num_networks)
+        # Converting to csr sums duplicate pairs and sorts them, and since both matrices are built from the exact same
+        # coordinates they end up with the same sparsity structure, zeros included
+        self._games = sparse.coo_matrix((np.concatenate([real_games, virtual_draws]), coordinates), shape=shape).tocsr()
+        self._wins = sparse.coo_matrix(
+            (np.concatenate([real_wins, 0.5 * virtual_draws]), coordinates), shape=shape
+        ).tocsr()
+        self._pair_rows = np.repeat(np.arange(num_networks), np.diff(self._games.indptr))
+
+        self._prior_actual_scores = self._get_orphan_prior_actual_scores()
+        self._actual_scores = np.asarray(self._wins.sum(axis=1)).ravel() + self._prior_actual_scores
+
+    def _get_virtual_draws(self, network_index):
+        """
+        Whenever a NEW player is added to the above, it is necessary to add a Bayesian prior to obtain good results
+        and keep the math from blowing up.
+        A reasonable prior is to add some number of "virtual draws" between the new player and the immediately previous neural net version.
+
+        Networks without a parent get a much weaker prior instead, which is not part of the matrices, see
+        _calculate_orphan_prior_terms.
+
+        :return: Tuple of (reference rows, opponent rows, number of virtual draws), with each draw present both ways
+        """
+        num_networks = len(self._network_ids)
+        rows = np.arange(num_networks)
+        parent_ids = np.asarray(self._network_ratings["parent_network__pk"], dtype=np.int64)
+        parent_rows = network_index.get_indexer(parent_ids)
+
+        # Everything blows up if for some reason (eg first network, or deleted network)
+        # the parent_network_id does not reference an actual network, so let's check that
+        # Also if somehow a network is its own parent, ignore that for computing ratings
+        has_parent = (parent_rows >= 0) & (parent_rows != rows)
+        child_rows = rows[has_parent]
+        parent_rows = parent_rows[has_parent]
+        parent_draws = np.full(len(child_rows), float(self._virtual_draw_strength))
+
+        # If we don't know a parent network and it's not the anchor, then add a very weak prior that the network is equal to every other network
+        self._orphan_rows = rows[~has_parent & (rows != self._anchor_index)]
+
+        reference_rows = np.concatenate([child_rows, parent_rows])
+        opponent_rows = np.concatenate([parent_rows, child_rows])
+        draws = np.concatenate([parent_draws, parent_draws])
+        return reference_rows, opponent_rows, draws
+
+    def _get_orphan_prior_actual_scores(self):
+        """
+        Each network without a parent has orphan_virtual_draw_strength virtual draws against the average of all other
+        networks, which in turn have their share of these draws against it. Draws count as half a win each way.
+        """
+        num_networks = len(self._network_ids)
+        strength = self.orphan_virtual_draw_strength
+        is_orphan = np.zeros(num_networks)
+        is_orphan[self._orphan_rows] = 1.0
+        return 0.5 * strength * is_orphan + 0.5 * strength * (len(self._orphan_rows) - is_orphan) / (num_networks - 1)
+
+    def _calculate_orphan_prior_terms(self, log_gamma):
+        """
+        The prior of each network Po without a parent is orphan_virtual_draw_strength virtual draws against a virtual
+        network rated at the average log_gamma of all other networks, with win probability:
+            p(Po) = 1 / (1 + exp(average_log_gamma(all networks but Po) - log_gamma(Po)))
+        Each other network takes a 1 / (num_networks - 1) share of the opposite side of these draws, which is
+        exactly the pairwise virtual draws with every other network when there are only 2 networks, but only costs
+        O(num_networks) however many networks have no parent.
+
+        :return: Tuple of (expected score, precision) of each network from the orphan priors, and the log probability
+                 of the orphan priors
+        """
+        num_networks = len(self._network_ids)
+        strength = self.orphan_virtual_draw_strength
+        orphan_log_gamma = log_gamma[self._orphan_rows]
+        others_average_log_gamma = (np.sum(log_gamma) - orphan_log_gamma) / (num_networks - 1)
+        log_gamma_diffs = orphan_log_gamma - others_average_log_gamma
+        win_probabilities = expit(log_gamma_diffs)
+        orphan_precisions = strength * win_probabilities * (1.0 - win_probabilities)
+
+        # Every network takes its share of the opposite side of all the orphan priors but its own
+        expected_scores = np.full(num_networks, strength * np.sum(1.0 - win_probabilities) / (num_networks - 1))
+        expected_scores[self._orphan_rows] -= strength * (1.0 - win_probabilities) / (num_networks - 1)
+        expected_scores[self._orphan_rows] += strength * win_probabilities
+        precisions = np.full(num_networks, np.sum(orphan_precisions) / (num_networks - 1))
+        precisions[self._orphan_rows] += orphan_precisions - orphan_precisions / (num_networks - 1)
+
+        log_probability = np.sum(
+            0.5 * strength * (-np.logaddexp(0.0, -log_gamma_diffs) - np.logaddexp(0.0, log_gamma_diffs))
+        )
+        return expected_scores, precisions, log_probability
+
+    def _color_pair_graph(self):
+        """
+        Greedily color networks in id order so that no two networks of the same color have played each other.
+        """
+        indptr, indices = self._games.indptr, self._games.indices
+        colors = np.full(len(self._network_ids), -1, dtype=np.int64)
+        for row in range(len(self._network_ids)):
+            neighbor_colors = set(colors[indices[indptr[row] : indptr[row + 1]]].tolist())
+            color = 0
+            while color in neighbor_colors:
+                color += 1
+            colors[row] = color
+        self._color_groups = []
+        for color in range(colors.max() + 1):
+            rows = np.flatnonzero(colors == color)
+            self._color_groups.append((rows, self._games[rows]))
+
+    def _calculate_log_gamma_diffs(self, log_gamma, rows, games):
+        """
+        For every network Pi of rows, whose games are the rows of the given matrix, compute:
+            expected_score(Pi) = sum_{all games Gj that Pi participated in} 1 / (1 + exp(log_gamma(opponent of Pi in game Gj) - log_gamma(Pi)))
+        and return log(actual_number_of_win(Pi) / expected_number_win(Pi)), the minorization-maximization update of log_gamma(Pi).
+        """
+        num_pairs_by_row = np.diff(games.indptr)
+        local_pair_rows = np.repeat(np.arange(len(rows)), num_pairs_by_row)
+        win_probabilities = expit(log_gamma[rows[local_pair_rows]] - log_gamma[games.indices])
+        expected_scores = np.bincount(local_pair_rows, weights=games.data * win_probabilities, minlength=len(rows))
+        if len(self._orphan_rows) > 0:
+            expected_scores = expected_scores + self._calculate_orphan_prior_terms(log_gamma)[0][rows]
+        # Leave networks without any game or prior where they are rather than dividing by zero
+        has_pairs = (num_pairs_by_row > 0) | (self._prior_actual_scores[rows] > 0)
+        expected_scores = np.where(has_pairs, expected_scores, 1.0)
+        actual_scores = np.where(has_pairs, self._actual_scores[rows], 1.0)
+        return np.log(actual_scores / expected_scores)
+
+    def _calculate_log_probability(self, log_gamma):
+        """
+        Log probability of all the games and virtual draws given log_gamma, up to a constant. Every pair of networks
+        is present once from each side in the matrices, hence the halving.
+        """
+        log_gamma_diffs = log_gamma[self._pair_rows] - log_gamma[self._games.indices]
+        win_log_probabilities = -np.logaddexp(0.0, -log_gamma_diffs)
+        loss_log_probabilities = -np.logaddexp(0.0, log_gamma_diffs)
+        log_probability = 0.5 * np.sum(
+            self._wins.data * win_log_probabilities + (self._games.data - self._wins.data) * loss_log_probabilities
+        )
+        return log_probability + self._calculate_orphan_prior_terms(log_gamma)[2]
+
+    def _calculate_newton_step(self, log_gamma):
+        """
+        The gradient of the log probability with respect to log_gamma(Pi) is actual_score(Pi) - expected_score(Pi),
+        and its Hessian is minus the Laplacian of the pair graph weighted by games * p * (1 - p). Solve for the Newton
+        step with the anchor held fixed, halving it until the log probability improves. The orphan priors only add
+        their precisions to the diagonal, which leaves out their tiny coupling through the average of all networks.
+
+        :return: new log_gamma, or None if no improving step was found
+        """
+        games = self._games
+        num_networks = games.shape[0]
+        win_probabilities = expit(log_gamma[self._pair_rows] - log_gamma[games.indices])
+        expected_scores = np.bincount(self._pair_rows, weights=games.data * win_probabilities, minlength=num_networks)
+        (prior_expected_scores, prior_precisions, _) = self._calculate_orphan_prior_terms(log_gamma)
+        gradient = self._actual_scores - expected_scores - prior_expected_scores
+
+        laplacian = self._calculate_precision_matrix(win_probabilities, prior_precisions)
+        free_rows = np.flatnonzero(np.arange(num_networks) != self._anchor_index)
+        with np.errstate(all="ignore"):
+            free_step = spsolve(laplacian[free_rows][:, free_rows].tocsc(), gradient[free_rows])
+        if not np.all(np.isfinite(free_step)):
+            return None
+        step = np.zeros(num_networks)
+        step[free_rows] = free_step
+
+        log_probability = self._calculate_log_probability(log_gamma)
+        for _ in range(self.newton_max_step_halvings):
+            new_log_gamma = log_gamma + step
+            if self._calculate_log_probability(new_log_gamma) >= log_probability:
+                return new_log_gamma
+            step *= 0.5
+        return None
+
+    def _calculate_precision_matrix(self, win_probabilities, prior_precisions):
+        """
+        :return: minus the Hessian of the log probability, the Laplacian of the pair graph weighted by
+                 games * p * (1 - p), plus the given orphan prior precisions on the diagonal
+        """
+        games = self._games
+        weights = sparse.csr_matrix(
+            (games.data * win_probabilities * (1.0 - win_probabilities), games.indices, games.indptr),
+            shape=games.shape,
+        )
+        return sparse.diags(np.asarray(weights.sum(axis=1)).ravel() + prior_precisions) - weights
+
+    def _calculate_log_gamma_marginal_uncertainties(self, log_gamma):
+        """
+        Ratings are only defined relative to the anchor, so that the covariance of the other log_gamma is the
+        inverse of the precision matrix without the anchor. Its diagonal accounts for the uncertainty of every
+        network on the way to the anchor, which the precision of each network alone misses for networks that are
+        mostly rated through others. The anchor itself keeps its own precision.
+        """
+        uncertainties = self._calculate_log_gamma_uncertainties(log_gamma)
+        games = self._games
+        win_probabilities = expit(log_gamma[self._pair_rows] - log_gamma[games.indices])
+        precision_matrix = self._calculate_precision_matrix(
+            win_probabilities, self._calculate_orphan_prior_terms(log_gamma)[1]
+        )
+        free_rows = np.flatnonzero(np.arange(games.shape[0]) != self._anchor_index)
+        try:
+            variances = calculate_inverse_diagonal(precision_matrix[free_rows][:, free_rows])
+        except RuntimeError:
+            logger.warning("Could not factorize the rating precision matrix, falling back to per network uncertainty")
+            return uncertainties
+        # Same cap as the per network uncertainty
+        uncertainties[free_rows] = np.minimum(np.sqrt(variances), 10.0)
+        return uncertainties
+
+    def _calculate_log_gamma_uncertainties(self, log_gamma):
+        """
+        The precision of each network is the second derivative of the log probability with respect to its log_gamma:
+            precision(Pi) = sum_{all games Gj that Pi participated in} p(Gj) * (1 - p(Gj))
+        where p(Gj) is the win probability of Pi in Gj, plus the share of Pi in the orphan priors.
+        """
+        games = self._games
+        win_probabilities = expit(log_gamma[self._pair_rows] - log_gamma[games.indices])
+        precisions = np.bincount(
+            self._pair_rows,
+            weights=games.data * win_probabilities * (1.0 - win_probabilities),
+            minlength=games.shape[0],
+        )
+        precisions = precisions + self._calculate_orphan_prior_terms(log_gamma)[1]
+        with np.errstate(divide="ignore"):
+            uncertainties = np.sqrt(1.0 / precisions)
+        # Cap the amount of uncertainty, so that if we nearly divide by 0, we don't end up with a totally ridiculous number
+        # for user display and game matching and other such purposes.
+        return np.minimum(uncertainties, 10.0)
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas
+from scipy.special import expit
+
+from src.apps.games.managers.rating_game_pandas_manager import get_tournament_results_from_pair_totals
+
+
+class SyntheticTournament:
+    """
+    SyntheticTournament makes up a run of any size for benchmarking ratings, shaped like real runs: each network is
+    trained from one of the few most recent ones and is a little stronger than it on average, and rating games
+    mostly pair networks close to each other in the chain, as the rating pairer does.
+
+    Ids are 1 to num_networks, network 1 being the only one without a parent, and all ratings start at 0.
+    """
+
+    # Networks are trained from one of this many most recent ones
+    max_parent_distance = 3
+    # Mean strength gained by each network over its parent, and its spread
+    log_gamma_step_mean = 0.05
+    log_gamma_step_deviation = 0.1
+    # Mean distance in the chain between paired networks, geometrically distributed
+    pairing_distance_mean = 8.0
+    draw_probability = 0.01
+    # Games are drawn this many at a time, to bound memory whatever the number of games
+    games_chunk_size = 1_000_000
+
+    def __init__(self, network_ratings, pair_totals, true_log_gamma):
+        self.network_ratings = network_ratings
+        self.pair_totals = pair_totals
+        self.true_log_gamma = true_log_gamma
+
+    @property
+    def num_games(self):
+        return int(np.sum(self.pair_totals["games"]))
+
+    def get_detailed_tournament_results_dataframe(self):
+        return get_tournament_results_from_pair_totals(self.pair_totals)
+
+    @classmethod
+    def generate(cls, num_networks, num_games, seed=None):
+        if num_networks < 2:
+            raise ValueError("A synthetic tournament needs at least 2 networks")
+        rng = np.random.default_rng(seed)
+        ids = np.arange(1, num_networks + 1, dtype=np.int64)
+
+        parent_distances = rng.integers(1, cls.max_parent_distance + 1, size=num_networks)
+        parent_rows = np.maximum(np.arange(num_networks) - parent_distances, 0)
+        parent_rows[0] = -1
+        true_log_gamma = np.zeros(num_networks)
+        steps = rng.normal(cls.log_gamma_step_mean, cls.log_gamma_step_deviation, size=num_networks)
+        for row in range(1, num_networks):
+            true_log_gamma[row] = true_log_gamma[parent_rows[row]] + steps[row]
+
+        network_ratings = pandas.DataFrame(
+            {
+                "id": ids,
+                "parent_network__pk": np.where(parent_rows >= 0, parent_rows + 1, -1),
+                "log_gamma": np.zeros(num_networks),
+                "log_gamma_uncertainty": np.zeros(num_networks),
+                "log_gamma_game_count": np.zeros(num_networks, dtype=np.int64),
+            }
+        ).set_index("id")
+
+        games_by_pair_key = np.zeros(0, dtype=np.int64)
+        pair_keys = np.zeros(0, dtype=np.int64)
+        for chunk_start in range(0, num_games, cls.games_chunk_size):
+            chunk_size = min(cls.games_chunk_size, num_games - chunk_start)
+            first_rows = rng.integers(1, num_networks, size=chunk_size)
+            distances = rng.geometric(1.0 / cls.pairing_distance_mean, size=chunk_size)
+            second_rows = np.maximum(first_rows - distances, 0)
+            swap_colors = rng.random(chunk_size) < 0.5
+            white_rows = np.where(swap_colors, second_rows, first_rows)
+            black_rows = np.where(swap_colors, first_rows, second_rows)
+            chunk_keys, chunk_games = np.unique(white_rows * num_networks + black_rows, return_counts=True)
+            # Merge with the pairs of the previous chunks
+            pair_keys, inverse = np.unique(np.concatenate([pair_keys, chunk_keys]), return_inverse=True)
+            games_by_pair_key = np.bincount(
+                inverse, weights=np.concatenate([games_by_pair_key, chunk_games]), minlength=len(pair_keys)
+            ).astype(np.int64)
+
+        white_rows = pair_keys // num_networks
+        black_rows = pair_keys % num_networks
+        draws = rng.binomial(games_by_pair_key, cls.draw_probability)
+        white_win_probabilities = expit(true_log_gamma[white_rows] - true_log_gamma[black_rows])
+        white_wins = rng.binomial(games_by_pair_key - draws, white_win_probabilities)
+        pair_totals = {
+            "white_network": ids[white_rows],
+            "black_network": ids[black_rows],
+            "games": games_by_pair_key,
+            "white_wins": white_wins.astype(np.int64),
+            "black_wins": (games_by_pair_key - draws - white_wins).astype(np.int64),
+            "draws": draws.astype(np.int64),
+        }
+        return cls(network_ratings, pair_totals, pandas.Series(true_log_gamma, index=ids))
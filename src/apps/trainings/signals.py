@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from src.apps.trainings.models import Network
+from src.apps.trainings.services import NetworkRatingTableService, NetworkTaskPayloadService, NetworkTimelineService
+
+
+@receiver(post_save, sender=Network)
+@receiver(post_delete, sender=Network)
+def invalidate_network_tables(sender, instance, **kwargs):
+    NetworkRatingTableService.invalidate(instance.run_id)
+    NetworkTaskPayloadService.invalidate(instance.run_id)
+    NetworkTimelineService.invalidate(instance.run_id)
@@ -1,8 +1,11 @@
+from django.conf import settings
+from django.db import transaction
+
 from src import celery_app
-from src.apps.games.models import RatingGame
+from src.apps.games.models import RatingPairStats
 from src.apps.runs.models import Run
-from src.apps.trainings.models import Network
-from src.apps.trainings.services import BayesianRatingService
+from src.apps.trainings.models import Network, NetworkRatingSnapshot
+from src.apps.trainings.services import NetworkRatingTableService, RatingBootstrapService, SparseBayesianRatingService
 
 
 @celery_app.task()
@@ -20,18 +23,56 @@ def update_bayesian_rating(for_tests=False):
     if anchor_network is None:
         return
 
-    detailed_tournament_result = RatingGame.pandas.get_detailed_tournament_results_dataframe(
-        current_run, for_tests=for_tests
-    )
+    # Totals are kept up to date transactionally as games come in, so unlike when aggregating the rating games
+    # there is no need to leave out the most recent ones, for_tests or not
+    detailed_tournament_result = RatingPairStats.objects.get_detailed_tournament_results_dataframe(current_run)
 
     assert_no_match_with_same_network = (
         detailed_tournament_result["reference_network"] != detailed_tournament_result["opponent_network"]
     )
     detailed_tournament_result = detailed_tournament_result[assert_no_match_with_same_network]
 
-    bayesian_rating_service = BayesianRatingService(
+    bayesian_rating_service = SparseBayesianRatingService(
         network_ratings, anchor_network.id, detailed_tournament_result, current_run.virtual_draw_strength
     )
-    new_network_ratings = bayesian_rating_service.update_ratings_iteratively(current_run.elo_number_of_iterations)
+    # Iterations start from the ratings stored by the previous update
+    new_network_ratings = bayesian_rating_service.update_ratings_iteratively(
+        current_run.elo_number_of_iterations,
+        tolerance=current_run.elo_convergence_tolerance,
+        use_newton_acceleration=current_run.elo_use_newton_acceleration,
+        use_full_covariance_uncertainty=current_run.elo_use_full_covariance_uncertainty,
+    )
 
-    Network.pandas.bulk_update_ratings_from_dataframe(new_network_ratings)
+    if current_run.elo_bootstrap_samples > 0:
+        bootstrap_service = RatingBootstrapService(
+            new_network_ratings, anchor_network.id, detailed_tournament_result, current_run.virtual_draw_strength
+        )
+        new_network_ratings = bootstrap_service.add_confidence_bounds(
+            current_run.elo_bootstrap_samples,
+            current_run.elo_bootstrap_time_budget,
+            max_workers=settings.ELO_BOOTSTRAP_MAX_WORKERS,
+        )
+
+    # Snapshot the ratings written that moved noticeably, so that the history of each network can be replayed from
+    # snapshots alone, starting from a snapshot of all the networks, for runs that had ratings before snapshots were
+    # recorded
+    changed_ratings = Network.pandas.get_changed_ratings_columns(
+        new_network_ratings, previous_dataframe=network_ratings
+    )
+    if NetworkRatingSnapshot.objects.filter(run=current_run).exists():
+        snapshot_ratings = Network.pandas.get_changed_ratings_columns(
+            new_network_ratings,
+            previous_dataframe=network_ratings,
+            epsilon=NetworkRatingSnapshot.objects.threshold_log_gamma,
+        )
+    else:
+        snapshot_ratings = Network.pandas.get_changed_ratings_columns(new_network_ratings)
+    with transaction.atomic():
+        Network.pandas.bulk_update_ratings_from_columns(current_run, changed_ratings)
+        NetworkRatingSnapshot.objects.record(current_run, snapshot_ratings)
+    NetworkRatingTableService.invalidate(current_run.pk)
+    # Update only these fields, so as not to overwrite run parameters edited meanwhile
+    Run.objects.filter(pk=current_run.pk).update(
+        elo_last_number_of_iterations=bayesian_rating_service.number_of_iterations_done,
+        elo_last_residual=bayesian_rating_service.residual,
+    )
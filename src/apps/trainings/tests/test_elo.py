@@ -1,11 +1,27 @@
 import math
+from io import StringIO
 
+import numpy as np
+import pandas
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import F
+from rest_framework.test import APIClient
+from scipy import sparse
 
-from src.apps.games.models import RatingGame
+from src.apps.games.managers.rating_game_pandas_manager import get_pair_totals_from_tournament_results
+from src.apps.games.models import RatingGame, RatingPairStats
 from src.apps.runs.models import Run
-from src.apps.trainings.models import Network
+from src.apps.trainings.models import Network, NetworkRatingSnapshot
+from src.apps.trainings.services import (
+    BayesianRatingService,
+    RatingBootstrapService,
+    SparseBayesianRatingService,
+    SyntheticTournament,
+)
+from src.apps.trainings.services.rating_bootstrap import _solve_bootstrap_samples
+from src.apps.trainings.services.sparse_bayesian_elo import calculate_inverse_diagonal
 from src.apps.trainings.tasks import update_bayesian_rating
 
 pytestmark = pytest.mark.django_db
@@ -390,3 +406,423 @@ class TestEloChain:
         assert self.n3.log_gamma_game_count == 46
         assert self.n4.log_gamma_game_count == 76
         assert self.n5.log_gamma_game_count == 44
+        self.r1.refresh_from_db()
+        assert self.r1.elo_last_number_of_iterations == 100
+
+    def test_ratings_dataframe(self):
+        ratings = Network.pandas.get_ratings_dataframe(self.r1)
+        assert list(ratings.index) == [self.n1.pk, self.n2.pk, self.n3.pk, self.n4.pk, self.n5.pk]
+        assert list(ratings["parent_network__pk"]) == [-1, self.n1.pk, self.n1.pk, self.n3.pk, self.n4.pk]
+        assert list(ratings["log_gamma"]) == [0.0] * 5
+        assert ratings["log_gamma_game_count"].dtype == "int64"
+
+        # A NaN or infinite rating is fetched as 0
+        Network.objects.filter(pk=self.n2.pk).update(log_gamma=float("nan"), log_gamma_uncertainty=float("inf"))
+        Network.objects.filter(pk=self.n3.pk).update(log_gamma=float("-inf"))
+        ratings = Network.pandas.get_ratings_dataframe(self.r1)
+        assert list(ratings["log_gamma"]) == [0.0] * 5
+        assert ratings.loc[self.n2.pk, "log_gamma_uncertainty"] == 0.0
+
+    def test_ratings_writeback_skips_unchanged_networks(self):
+        ratings = Network.pandas.get_ratings_dataframe(self.r1)
+        assert Network.pandas.bulk_update_ratings_from_dataframe(self.r1, ratings, previous_dataframe=ratings) == 0
+
+        # As given by the rating service, without the stored confidence bounds
+        new_ratings = ratings.drop(columns=["log_gamma_lower_confidence", "log_gamma_upper_confidence"])
+        new_ratings.loc[self.n3.pk, "log_gamma"] = 0.5
+        new_ratings.loc[self.n3.pk, "log_gamma_uncertainty"] = 0.25
+        new_ratings.loc[self.n4.pk, "log_gamma"] = 1e-9
+        assert Network.pandas.bulk_update_ratings_from_dataframe(self.r1, new_ratings, previous_dataframe=ratings) == 1
+        self.n3.refresh_from_db()
+        self.n4.refresh_from_db()
+        assert self.n3.log_gamma == 0.5
+        assert self.n3.log_gamma_upper_confidence == 1.0
+        assert self.n3.log_gamma_lower_confidence == 0.0
+        assert self.n4.log_gamma == 0.0
+
+        # Without previous ratings, everything is written, but only to networks of the run
+        other_run = Run.objects.create(name="otherrun", status="Inactive")
+        assert Network.pandas.bulk_update_ratings_from_dataframe(self.r1, new_ratings) == 5
+        assert Network.pandas.bulk_update_ratings_from_dataframe(other_run, new_ratings) == 0
+        other_run.delete()
+
+    def test_ratings_writeback_compares_confidence_bounds(self):
+        ratings = Network.pandas.get_ratings_dataframe(self.r1)
+        new_ratings = ratings.drop(columns=["log_gamma_lower_confidence", "log_gamma_upper_confidence"])
+        assert Network.pandas.bulk_update_ratings_from_dataframe(self.r1, new_ratings, previous_dataframe=ratings) == 0
+
+        # Bootstrap bounds are written once, then left alone while they do not move
+        new_ratings["log_gamma_lower_confidence"] = -1.0
+        new_ratings["log_gamma_upper_confidence"] = 1.0
+        assert Network.pandas.bulk_update_ratings_from_dataframe(self.r1, new_ratings, previous_dataframe=ratings) == 5
+        ratings = Network.pandas.get_ratings_dataframe(self.r1)
+        assert Network.pandas.bulk_update_ratings_from_dataframe(self.r1, new_ratings, previous_dataframe=ratings) == 0
+
+        # Without bootstrap, bounds derived from the uncertainty replace them, though ratings did not move
+        new_ratings = new_ratings.drop(columns=["log_gamma_lower_confidence", "log_gamma_upper_confidence"])
+        assert Network.pandas.bulk_update_ratings_from_dataframe(self.r1, new_ratings, previous_dataframe=ratings) == 5
+        self.n3.refresh_from_db()
+        assert self.n3.log_gamma_lower_confidence == 0.0
+        assert self.n3.log_gamma_upper_confidence == 0.0
+
+        # A rating that was not valid is rewritten, though it is read back as the same 0
+        Network.objects.filter(pk=self.n2.pk).update(log_gamma=float("nan"))
+        ratings = Network.pandas.get_ratings_dataframe(self.r1)
+        assert Network.pandas.bulk_update_ratings_from_dataframe(self.r1, new_ratings, previous_dataframe=ratings) == 1
+        self.n2.refresh_from_db()
+        assert self.n2.log_gamma == 0.0
+
+    def test_tournament_results_dataframe(self):
+        results = RatingGame.pandas.get_detailed_tournament_results_dataframe(self.r1, for_tests=True)
+        results = results.set_index(["reference_network", "opponent_network"])
+        assert len(results) == 8
+        # n5 won 38 games as white against n4, which won 6 as black
+        assert results.loc[(self.n5.pk, self.n4.pk), "total_games_white"] == 44
+        assert results.loc[(self.n5.pk, self.n4.pk), "total_wins_white"] == 38
+        assert results.loc[(self.n4.pk, self.n5.pk), "total_games_black"] == 44
+        assert results.loc[(self.n4.pk, self.n5.pk), "total_wins_black"] == 6
+        assert results.loc[(self.n1.pk, self.n3.pk), "total_draw_or_no_result_black"] == 8
+
+    def assert_pair_stats_match_rating_games(self):
+        expected = RatingGame.pandas.get_detailed_tournament_results_dataframe(self.r1, for_tests=True)
+        actual = RatingPairStats.objects.get_detailed_tournament_results_dataframe(self.r1)
+        keys = ["reference_network", "opponent_network"]
+        pandas.testing.assert_frame_equal(
+            actual.sort_values(keys).reset_index(drop=True),
+            expected.sort_values(keys).reset_index(drop=True)[actual.columns],
+            check_dtype=False,
+        )
+
+    def test_pair_stats_follow_rating_games(self):
+        self.assert_pair_stats_match_rating_games()
+
+        self.games[0].disabled = True
+        self.games[0].save()
+        RatingGame.objects.filter(pk=self.games[1].pk).update(disabled=True)
+        self.games[2].winner = RatingGame.GamesResult.DRAW
+        self.games[2].save()
+        self.games.pop(-1).delete()
+        self.assert_pair_stats_match_rating_games()
+
+        self.games[0].disabled = False
+        self.games[0].save()
+        self.assert_pair_stats_match_rating_games()
+
+        RatingPairStats.objects.all().delete()
+        RatingPairStats.objects.rebuild(self.r1)
+        self.assert_pair_stats_match_rating_games()
+
+    def test_elos_converge_with_newton_acceleration(self):
+        self.r1.elo_convergence_tolerance = 1e-10
+        self.r1.elo_use_newton_acceleration = True
+        self.r1.save()
+        update_bayesian_rating(for_tests=True)
+        self.n2.refresh_from_db()
+        self.n5.refresh_from_db()
+        self.r1.refresh_from_db()
+        assert self.n2.log_gamma == pytest.approx(-math.log(2), abs=1e-9)
+        assert self.n5.log_gamma == pytest.approx(math.log(2) * 2 + math.log(5), abs=1e-9)
+        assert self.n5.log_gamma_uncertainty == pytest.approx(math.sqrt(3 / 20))
+        assert self.r1.elo_last_number_of_iterations < 20
+        assert self.r1.elo_last_residual < 1e-10
+
+    def test_rating_history_snapshots(self):
+        self.r1.elo_convergence_tolerance = 1e-10
+        self.r1.elo_use_newton_acceleration = True
+        self.r1.save()
+        update_bayesian_rating(for_tests=True)
+        # Converged ratings do not change anymore, and so are not snapshot again
+        update_bayesian_rating(for_tests=True)
+        snapshots = list(NetworkRatingSnapshot.objects.filter(run=self.r1))
+        assert len(snapshots) == 1
+        columns = snapshots[0].get_columns()
+        assert list(columns["network_ids"]) == [self.n1.pk, self.n2.pk, self.n3.pk, self.n4.pk, self.n5.pk]
+        assert columns["log_gamma"][4] == pytest.approx(math.log(2) * 2 + math.log(5), abs=1e-9)
+        assert list(columns["log_gamma_game_count"]) == [28, 14, 46, 76, 44]
+
+        client = APIClient()
+        response = client.get("/api/networks-for-elo/history/", {"run__name": "testrun"}, format="json")
+        assert response.status_code == 200
+        assert response.data["run"] == "testrun"
+        assert len(response.data["snapshots"]) == 1
+        snapshot = response.data["snapshots"][0]
+        assert snapshot["id"] == snapshots[0].id
+        assert snapshot["networks"][4] == self.n5.name
+        assert snapshot["log_gamma"] == list(columns["log_gamma"])
+        response = client.get("/api/networks-for-elo/history/", {"since": snapshots[0].id}, format="json")
+        assert response.status_code == 200
+        assert response.data["snapshots"] == []
+
+        # Networks deleted since their snapshot are given without a name
+        n6 = Network.objects.create(
+            run=self.r1,
+            name="testrun-randomnetwork6",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            is_random=True,
+        )
+        columns = Network.pandas.get_changed_ratings_columns(Network.pandas.get_ratings_dataframe(self.r1))
+        NetworkRatingSnapshot.objects.record(self.r1, columns)
+        n6.delete()
+        response = client.get("/api/networks-for-elo/history/", {"since": snapshots[0].id}, format="json")
+        assert response.status_code == 200
+        networks = [self.n1, self.n2, self.n3, self.n4, self.n5]
+        assert response.data["snapshots"][0]["networks"] == [network.name for network in networks] + [None]
+
+    def test_rating_history_leaves_out_small_moves(self):
+        self.r1.elo_convergence_tolerance = 1e-10
+        self.r1.elo_use_newton_acceleration = True
+        self.r1.save()
+        update_bayesian_rating(for_tests=True)
+        # Near converged ratings, which a few sweeps move by much less than the snapshot threshold
+        Network.objects.filter(run=self.r1).exclude(pk=self.n1.pk).update(log_gamma=F("log_gamma") + 1e-4)
+        self.r1.elo_number_of_iterations = 3
+        self.r1.elo_convergence_tolerance = 0.0
+        self.r1.elo_use_newton_acceleration = False
+        self.r1.save()
+        update_bayesian_rating(for_tests=True)
+        self.n5.refresh_from_db()
+        assert self.n5.log_gamma != pytest.approx(math.log(2) * 2 + math.log(5) + 1e-4, abs=1e-7)
+        assert NetworkRatingSnapshot.objects.filter(run=self.r1).count() == 1
+
+        # Moves past the threshold are snapshot again, but the anchor never moves
+        Network.objects.filter(pk=self.n5.pk).update(log_gamma=F("log_gamma") + 0.1)
+        update_bayesian_rating(for_tests=True)
+        snapshots = list(NetworkRatingSnapshot.objects.filter(run=self.r1))
+        assert len(snapshots) == 2
+        network_ids = list(snapshots[1].get_columns()["network_ids"])
+        assert self.n5.pk in network_ids
+        assert self.n1.pk not in network_ids
+
+    def test_rating_history_first_snapshot_holds_all_networks(self):
+        self.r1.elo_convergence_tolerance = 1e-10
+        self.r1.elo_use_newton_acceleration = True
+        self.r1.save()
+        update_bayesian_rating(for_tests=True)
+        # As for a run rated before snapshots were recorded
+        NetworkRatingSnapshot.objects.filter(run=self.r1).delete()
+        update_bayesian_rating(for_tests=True)
+        snapshots = list(NetworkRatingSnapshot.objects.filter(run=self.r1))
+        assert len(snapshots) == 1
+        network_ids = list(snapshots[0].get_columns()["network_ids"])
+        assert network_ids == [self.n1.pk, self.n2.pk, self.n3.pk, self.n4.pk, self.n5.pk]
+
+
+class TestSparseBayesianRatingService:
+    def make_tournament(self):
+        network_ratings = pandas.DataFrame(
+            {
+                "id": [1, 2, 3, 4, 5, 6],
+                "parent_network__pk": [-1, 1, 1, 3, 4, -1],
+                "log_gamma": [0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+                "log_gamma_uncertainty": [0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+                "log_gamma_game_count": [0, 0, 0, 0, 0, 0],
+            }
+        ).set_index("id")
+        # (white, black, white wins, black wins, draws)
+        results = [(2, 1, 7, 3, 1), (3, 1, 6, 5, 0), (4, 3, 9, 2, 2), (5, 4, 4, 4, 0), (6, 5, 1, 5, 0), (6, 2, 3, 3, 1)]
+        rows = []
+        for (white, black, white_wins, black_wins, draws) in results:
+            games = white_wins + black_wins + draws
+            rows.append([white, black, games, 0, white_wins, 0, draws, 0])
+            rows.append([black, white, 0, games, 0, black_wins, 0, draws])
+        detailed_tournament_results = pandas.DataFrame(
+            rows,
+            columns=[
+                "reference_network",
+                "opponent_network",
+                "total_games_white",
+                "total_games_black",
+                "total_wins_white",
+                "total_wins_black",
+                "total_draw_or_no_result_white",
+                "total_draw_or_no_result_black",
+            ],
+        )
+        return network_ratings, detailed_tournament_results
+
+    def test_matches_legacy_service(self):
+        network_ratings, detailed_tournament_results = self.make_tournament()
+        expected = BayesianRatingService(
+            network_ratings.copy(), 1, detailed_tournament_results.copy(), 4.0
+        ).update_ratings_iteratively(500)
+        actual = SparseBayesianRatingService(
+            network_ratings.copy(), 1, detailed_tournament_results.copy(), 4.0
+        ).update_ratings_iteratively(500)
+        expected = expected.sort_index()
+        actual = actual.sort_index()
+        assert list(actual.index) == list(expected.index)
+        assert list(actual["log_gamma"]) == pytest.approx(list(expected["log_gamma"]), abs=1e-9)
+        assert list(actual["log_gamma_uncertainty"]) == pytest.approx(list(expected["log_gamma_uncertainty"]), abs=1e-9)
+        assert list(actual["log_gamma_game_count"]) == list(expected["log_gamma_game_count"])
+
+    def test_orphan_without_games_is_rated_at_average(self):
+        network_ratings, detailed_tournament_results = self.make_tournament()
+        # With a single network without a parent, nothing else pulls it
+        network_ratings.loc[6, "parent_network__pk"] = 5
+        network_ratings.loc[7] = [-1, 0.0, 0.0, 0]
+        for service_class in [BayesianRatingService, SparseBayesianRatingService]:
+            ratings = service_class(
+                network_ratings.copy(), 1, detailed_tournament_results.copy(), 4.0
+            ).update_ratings_iteratively(1000)
+            assert ratings.loc[7, "log_gamma"] == pytest.approx(ratings["log_gamma"].drop(7).mean(), abs=1e-6)
+            assert ratings.loc[7, "log_gamma_game_count"] == 0
+
+    def test_newton_acceleration_matches_sweeps(self):
+        network_ratings, detailed_tournament_results = self.make_tournament()
+        sweeps_service = SparseBayesianRatingService(network_ratings.copy(), 1, detailed_tournament_results.copy(), 4.0)
+        expected = sweeps_service.update_ratings_iteratively(2000, tolerance=1e-12)
+        newton_service = SparseBayesianRatingService(network_ratings.copy(), 1, detailed_tournament_results.copy(), 4.0)
+        actual = newton_service.update_ratings_iteratively(2000, tolerance=1e-12, use_newton_acceleration=True)
+        assert list(actual["log_gamma"]) == pytest.approx(list(expected["log_gamma"]), abs=1e-9)
+        assert sweeps_service.number_of_iterations_done < 2000
+        assert newton_service.number_of_iterations_done < sweeps_service.number_of_iterations_done
+
+    def test_bootstrap_confidence_bounds(self):
+        network_ratings, detailed_tournament_results = self.make_tournament()
+        ratings = SparseBayesianRatingService(
+            network_ratings, 1, detailed_tournament_results, 4.0
+        ).update_ratings_iteratively(100, tolerance=1e-9, use_newton_acceleration=True)
+        bootstrap_service = RatingBootstrapService(ratings, 1, detailed_tournament_results, 4.0)
+        bounded_ratings = bootstrap_service.add_confidence_bounds(50, 60.0, max_workers=1, seed=7)
+        assert bootstrap_service.number_of_samples_done == 50
+        assert list(bounded_ratings["log_gamma"]) == list(ratings["log_gamma"])
+        assert (bounded_ratings["log_gamma_lower_confidence"] <= bounded_ratings["log_gamma"]).all()
+        assert (bounded_ratings["log_gamma_upper_confidence"] >= bounded_ratings["log_gamma"]).all()
+        assert bounded_ratings.loc[1, "log_gamma_lower_confidence"] == bounded_ratings.loc[1, "log_gamma"]
+        assert bounded_ratings.loc[1, "log_gamma_upper_confidence"] == bounded_ratings.loc[1, "log_gamma"]
+        # Network 6 is the furthest from the anchor
+        widths = bounded_ratings["log_gamma_upper_confidence"] - bounded_ratings["log_gamma_lower_confidence"]
+        assert widths[6] > widths[2] > 0
+
+        same_bootstrap_service = RatingBootstrapService(ratings, 1, detailed_tournament_results, 4.0)
+        same_bounded_ratings = same_bootstrap_service.add_confidence_bounds(50, 60.0, max_workers=1, seed=7)
+        assert list(same_bounded_ratings["log_gamma_lower_confidence"]) == list(
+            bounded_ratings["log_gamma_lower_confidence"]
+        )
+
+    def test_bootstrap_confidence_bounds_match_converged_samples(self):
+        network_ratings, detailed_tournament_results = self.make_tournament()
+        ratings = SparseBayesianRatingService(
+            network_ratings, 1, detailed_tournament_results, 4.0
+        ).update_ratings_iteratively(100, tolerance=1e-9, use_newton_acceleration=True)
+        bounded_ratings = RatingBootstrapService(ratings, 1, detailed_tournament_results, 4.0).add_confidence_bounds(
+            50, 60.0, max_workers=1, seed=7
+        )
+
+        # Same resampled games, each solved from scratch far past convergence
+        converged_samples = _solve_bootstrap_samples(
+            network_ratings,
+            1,
+            get_pair_totals_from_tournament_results(detailed_tournament_results),
+            4.0,
+            {"number_of_iterations": 10000, "tolerance": 1e-13, "use_newton_acceleration": True},
+            np.random.SeedSequence(7).spawn(50),
+        )
+        (lower_confidence, upper_confidence) = np.percentile(
+            converged_samples, RatingBootstrapService.confidence_percentiles, axis=0
+        )
+        np.testing.assert_allclose(
+            bounded_ratings["log_gamma_lower_confidence"], np.minimum(lower_confidence, ratings["log_gamma"]), atol=1e-6
+        )
+        np.testing.assert_allclose(
+            bounded_ratings["log_gamma_upper_confidence"], np.maximum(upper_confidence, ratings["log_gamma"]), atol=1e-6
+        )
+
+    def test_bootstrap_in_pool_matches_sequential(self):
+        network_ratings, detailed_tournament_results = self.make_tournament()
+        ratings = SparseBayesianRatingService(
+            network_ratings, 1, detailed_tournament_results, 4.0
+        ).update_ratings_iteratively(100, tolerance=1e-9, use_newton_acceleration=True)
+        sequential_ratings = RatingBootstrapService(ratings, 1, detailed_tournament_results, 4.0).add_confidence_bounds(
+            20, 60.0, max_workers=1, seed=7
+        )
+        pool_bootstrap_service = RatingBootstrapService(ratings, 1, detailed_tournament_results, 4.0)
+        pool_ratings = pool_bootstrap_service.add_confidence_bounds(20, 60.0, max_workers=3, seed=7)
+        assert pool_bootstrap_service.number_of_samples_done == 20
+        for column in ("log_gamma_lower_confidence", "log_gamma_upper_confidence"):
+            assert list(pool_ratings[column]) == list(sequential_ratings[column])
+
+    def test_bootstrap_keeps_uncertainty_bounds_without_enough_samples(self):
+        network_ratings, detailed_tournament_results = self.make_tournament()
+        bootstrap_service = RatingBootstrapService(network_ratings, 1, detailed_tournament_results, 4.0)
+        bounded_ratings = bootstrap_service.add_confidence_bounds(50, 0.0, max_workers=1)
+        assert bootstrap_service.number_of_samples_done == 0
+        assert "log_gamma_lower_confidence" not in bounded_ratings.columns
+
+    def test_full_covariance_uncertainty(self):
+        network_ratings, detailed_tournament_results = self.make_tournament()
+        diagonal_ratings = SparseBayesianRatingService(
+            network_ratings, 1, detailed_tournament_results, 4.0
+        ).update_ratings_iteratively(100, tolerance=1e-9, use_newton_acceleration=True)
+        covariance_ratings = SparseBayesianRatingService(
+            network_ratings, 1, detailed_tournament_results, 4.0
+        ).update_ratings_iteratively(
+            100, tolerance=1e-9, use_newton_acceleration=True, use_full_covariance_uncertainty=True
+        )
+        assert list(covariance_ratings["log_gamma"]) == list(diagonal_ratings["log_gamma"])
+        assert covariance_ratings.loc[1, "log_gamma_uncertainty"] == diagonal_ratings.loc[1, "log_gamma_uncertainty"]
+        # Marginal variances are never below the variances given all other networks
+        uncertainty_increase = covariance_ratings["log_gamma_uncertainty"] - diagonal_ratings["log_gamma_uncertainty"]
+        assert (uncertainty_increase.drop(1) > 0).all()
+        # Network 5 is only rated through 3 and 4, network 2 plays the anchor directly
+        assert uncertainty_increase[5] > uncertainty_increase[2]
+
+
+def test_inverse_diagonal_matches_dense_inverse():
+    random = np.random.default_rng(0)
+    num_rows = 60
+    weights = sparse.random(num_rows, num_rows, density=0.05, random_state=0) * 10.0
+    weights = weights + weights.T
+    matrix = sparse.diags(np.asarray(weights.sum(axis=1)).ravel() + random.uniform(0.1, 1.0, num_rows)) - weights
+    expected = np.diag(np.linalg.inv(matrix.toarray()))
+    assert list(calculate_inverse_diagonal(matrix)) == pytest.approx(list(expected), rel=1e-9)
+
+
+def test_inverse_diagonal_with_degenerate_weights():
+    # Fill-in entries between networks only linked by such weights underflow to 0 and are left out of the factor
+    edges = [
+        (0, 4, 1.0),
+        (0, 5, 1e-200),
+        (1, 2, 1e-200),
+        (1, 3, 1e-200),
+        (2, 5, 1e-200),
+        (3, 4, 1e-200),
+        (3, 6, 1e-200),
+    ]
+    weights = sparse.lil_matrix((7, 7))
+    for (row, column, weight) in edges:
+        weights[row, column] = weight
+        weights[column, row] = weight
+    matrix = sparse.diags(np.asarray(weights.sum(axis=1)).ravel() + 1e-3) - weights
+    with pytest.raises(RuntimeError):
+        calculate_inverse_diagonal(matrix)
+
+
+def test_synthetic_tournament():
+    tournament = SyntheticTournament.generate(200, 20000, seed=3)
+    assert tournament.num_games == 20000
+    assert list(tournament.network_ratings.index) == list(range(1, 201))
+    assert (tournament.network_ratings["parent_network__pk"] < tournament.network_ratings.index).all()
+    same_tournament = SyntheticTournament.generate(200, 20000, seed=3)
+    assert list(same_tournament.pair_totals["white_wins"]) == list(tournament.pair_totals["white_wins"])
+
+    ratings = SparseBayesianRatingService(
+        tournament.network_ratings, 1, tournament.get_detailed_tournament_results_dataframe(), 4.0
+    ).update_ratings_iteratively(100, tolerance=1e-9, use_newton_acceleration=True)
+    assert np.corrcoef(ratings["log_gamma"], tournament.true_log_gamma)[0, 1] > 0.99
+
+
+@pytest.mark.parametrize("use_database", [False, True])
+def test_benchmark_elo_command(use_database):
+    stdout = StringIO()
+    call_command("benchmark_elo", networks=30, games=3000, newton=True, use_database=use_database, stdout=stdout)
+    output = stdout.getvalue()
+    for stage in ["generate", "fetch", "tournament_matrices", "iterations", "uncertainty"]:
+        assert stage in output
+    assert ("writeback" in output) == use_database
+    # Everything written to the database is rolled back
+    assert Run.objects.count() == 0
+    assert Network.objects.count() == 0
@@ -1,12 +1,18 @@
 import base64
+from datetime import timedelta
 
 import pytest
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
 
 from src.apps.runs.models import Run
 from src.apps.trainings.models import Network
+from src.apps.trainings.serializers import NetworkSerializerForTasks
+from src.apps.trainings.services import NetworkRatingTableService, NetworkTaskPayloadService, NetworkTimelineService
+from src.contrib.lru_dict import LRUDict
 
 pytestmark = pytest.mark.django_db
 
@@ -122,3 +128,156 @@ class TestNetworkValidation:
         self.n5.full_clean()
         with pytest.raises(ValidationError):
             self.n6.full_clean()
+
+
+class TestNetworkRatingTable:
+    def setup_method(self):
+        self.r1 = Run.objects.create(
+            name="testrun",
+            rating_game_probability=0.0,
+            status="Active",
+        )
+        self.networks = [
+            Network.objects.create(
+                run=self.r1,
+                name=f"testrun-{i}",
+                model_file="",
+                model_file_bytes=0,
+                model_file_sha256=fake_sha256,
+                log_gamma=log_gamma,
+                is_random=True,
+            )
+            for i, log_gamma in enumerate([3.0, -1.0, 2.0, 0.5])
+        ]
+
+    def teardown_method(self):
+        for network in reversed(self.networks):
+            network.delete()
+        self.r1.delete()
+
+    def test_rating_table(self):
+        table = NetworkRatingTableService.get(self.r1)
+        assert NetworkRatingTableService.get(self.r1) is table
+        assert len(table) == 4
+        assert list(table.sorted_rating_log_gamma) == [-1.0, 0.5, 2.0, 3.0]
+
+        rows = table.select_rating_rows_in_log_gamma_range(0.0, 3.0, exclude_id=self.networks[0].pk)
+        assert [network.name for network in table.networks[rows]] == ["testrun-3", "testrun-2"]
+
+        weaker_rows, stronger_rows = table.select_nearest_rating_rows(2.0, 2)
+        assert [network.name for network in table.networks[weaker_rows]] == ["testrun-2", "testrun-3"]
+        assert [network.name for network in table.networks[stronger_rows]] == ["testrun-2", "testrun-0"]
+
+    def test_rating_table_refreshed_on_save(self):
+        table = NetworkRatingTableService.get(self.r1)
+        self.networks[3].rating_games_enabled = False
+        self.networks[3].save()
+        new_table = NetworkRatingTableService.get(self.r1)
+        assert new_table is not table
+        assert list(new_table.sorted_rating_log_gamma) == [-1.0, 2.0, 3.0]
+
+
+def test_lru_dict():
+    entries = LRUDict(max_size=2)
+    entries[1] = "a"
+    entries[2] = "b"
+    assert entries.get(1) == "a"
+    entries[3] = "c"
+    assert len(entries) == 2
+    assert entries.get(2) is None
+    assert entries.get(1) == "a"
+    assert entries.get(3) == "c"
+
+
+class TestNetworkTaskPayload:
+    def setup_method(self):
+        self.r1 = Run.objects.create(
+            name="testrun",
+            rating_game_probability=0.0,
+            status="Active",
+        )
+        self.n1 = Network.objects.create(
+            run=self.r1,
+            name="testrun-randomnetwork",
+            model_file="",
+            model_file_bytes=0,
+            model_file_sha256=fake_sha256,
+            log_gamma=0,
+            is_random=True,
+        )
+
+    def teardown_method(self):
+        self.n1.delete()
+        self.r1.delete()
+
+    def test_payload_cached_until_network_saved(self):
+        request = APIRequestFactory().get("/api/tasks/")
+        payload = NetworkTaskPayloadService.get(self.n1, request)
+        assert payload == NetworkSerializerForTasks(self.n1, context={"request": request}).data
+        assert payload["url"] == "http://testserver/api/networks/testrun-randomnetwork/"
+        assert NetworkTaskPayloadService.get(self.n1, request) is payload
+
+        secure_request = APIRequestFactory().get("/api/tasks/", secure=True)
+        assert NetworkTaskPayloadService.get(self.n1, secure_request)["url"].startswith("https://testserver/")
+
+        self.n1.model_file_bytes = 123
+        self.n1.save()
+        new_payload = NetworkTaskPayloadService.get(self.n1, request)
+        assert new_payload is not payload
+        assert new_payload["model_file_bytes"] == 123
+
+
+class TestNetworkTimeline:
+    def setup_method(self):
+        self.r1 = Run.objects.create(
+            name="testrun",
+            rating_game_probability=0.0,
+            status="Active",
+        )
+        self.now = timezone.now()
+        self.networks = []
+        for i, age in enumerate([3000, 2000, 1000, 500]):
+            network = Network.objects.create(
+                run=self.r1,
+                name=f"testrun-{i}",
+                model_file="",
+                model_file_bytes=0,
+                model_file_sha256=fake_sha256,
+                log_gamma=0,
+                is_random=True,
+                training_games_enabled=(i != 2),
+            )
+            # created_at is auto_now_add, so backdate it afterwards
+            Network.objects.filter(pk=network.pk).update(created_at=self.now - timedelta(seconds=age))
+            self.networks.append(network)
+        NetworkTimelineService.invalidate(self.r1.pk)
+
+    def teardown_method(self):
+        for network in reversed(self.networks):
+            network.delete()
+        self.r1.delete()
+
+    def test_select_most_recent(self):
+        timeline = NetworkTimelineService.get(self.r1)
+        assert NetworkTimelineService.get(self.r1) is timeline
+        assert len(timeline) == 3
+        assert timeline.select_most_recent().name == "testrun-3"
+        assert timeline.select_most_recent(400, now=self.now).name == "testrun-3"
+        assert timeline.select_most_recent(600, now=self.now).name == "testrun-1"
+        assert timeline.select_most_recent(2000, now=self.now).name == "testrun-1"
+        assert timeline.select_most_recent(2500, now=self.now).name == "testrun-0"
+        assert timeline.select_most_recent(4000, now=self.now) is None
+
+        for network_delay in [400, 600, 2500]:
+            assert (
+                timeline.select_most_recent(network_delay).pk
+                == Network.objects.select_most_recent(self.r1, for_training_games=True, network_delay=network_delay).pk
+            )
+
+    def test_timeline_refreshed_on_save(self):
+        timeline = NetworkTimelineService.get(self.r1)
+        self.networks[3].training_games_enabled = False
+        self.networks[3].save()
+        new_timeline = NetworkTimelineService.get(self.r1)
+        assert new_timeline is not timeline
+        assert new_timeline.select_most_recent().name == "testrun-1"
@@ -5,10 +5,17 @@ from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
 from src.apps.runs.models import Run
-from src.apps.trainings.models import Network
-from src.apps.trainings.serializers import NetworkSerializer, NetworkSerializerForElo, NetworkSerializerForTasks
+from src.apps.trainings.models import Network, NetworkRatingSnapshot
+from src.apps.trainings.serializers import (
+    NetworkRatingSnapshotSerializerForElo,
+    NetworkSerializer,
+    NetworkSerializerForElo,
+)
+from src.apps.trainings.services import NetworkTaskPayloadService, NetworkTimelineService
 from src.contrib.permission import ReadOnly
 
+MAX_RATING_HISTORY_SNAPSHOTS = 100
+
 
 class NetworkViewSet(viewsets.ModelViewSet):
     """
@@ -27,16 +34,11 @@ class NetworkViewSet(viewsets.ModelViewSet):
         if current_run is None:
             return Response({"error": "No active run."}, status=404)
 
-        try:
-            network = Network.objects.select_most_recent(current_run, for_training_games=True)
-            if not network:
-                raise Network.DoesNotExist()
-        except Network.DoesNotExist:
+        network = NetworkTimelineService.get(current_run).select_most_recent()
+        if network is None:
             return Response({"error": "No networks found for run enabled for training games."}, status=400)
 
-        serializer_context = {"request": request}  # Used by serialize hyperlinked field to build and url ref
-        serializer = NetworkSerializerForTasks(network, context=serializer_context)
-        return Response(serializer.data)
+        return Response(NetworkTaskPayloadService.get(network, request))
 
     @action(detail=False, methods=["GET"])
     def get_strongest(self, request):
@@ -51,9 +53,7 @@ class NetworkViewSet(viewsets.ModelViewSet):
         except Network.DoesNotExist:
             return Response({"error": "No networks found for run enabled for training games."}, status=400)
 
-        serializer_context = {"request": request}  # Used by serialize hyperlinked field to build and url ref
-        serializer = NetworkSerializerForTasks(strongest_network, context=serializer_context)
-        return Response(serializer.data)
+        return Response(NetworkTaskPayloadService.get(strongest_network, request))
 
 
 class NetworkViewSetForElo(viewsets.ReadOnlyModelViewSet):
@@ -68,3 +68,37 @@ class NetworkViewSetForElo(viewsets.ReadOnlyModelViewSet):
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_fields = ("run__name",)
     pagination_class = None
+
+    @action(detail=False, methods=["GET"])
+    def history(self, request):
+        """
+        API endpoint that gives how ratings evolved, as the snapshots of the ratings that changed in each rating
+        update after the given snapshot id (since, 0 by default), of the given run (run__name, the current run by
+        default). At most MAX_RATING_HISTORY_SNAPSHOTS snapshots are given at once, request again since the last one
+        until none are left.
+        """
+        run_name = request.query_params.get("run__name")
+        if run_name is None:
+            run = Run.objects.select_current()
+        else:
+            run = Run.objects.filter(name=run_name).first()
+        if run is None:
+            return Response({"error": "No such run."}, status=404)
+        try:
+            since = int(request.query_params.get("since", 0))
+        except ValueError:
+            return Response({"error": "since was not an integer"}, status=400)
+
+        snapshots = NetworkRatingSnapshot.objects.select_since(run, since, MAX_RATING_HISTORY_SNAPSHOTS)
+        network_ids = set()
+        for snapshot in snapshots:
+            network_ids.update(snapshot.get_columns()["network_ids"].tolist())
+        network_names = dict(Network.objects.filter(id__in=network_ids).values_list("id", "name"))
+        return Response(
+            {
+                "run": run.name,
+                "snapshots": [
+                    NetworkRatingSnapshotSerializerForElo.serialize(snapshot, network_names) for snapshot in snapshots
+                ],
+            }
+        )
@@ -0,0 +1,28 @@
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def get_cache_version(key):
+    """
+    Return the version stamp stored in the shared cache under key, creating one if there is none yet
+    (first use, or the cache evicted it). Per-process caches compare this stamp to know when to reload.
+    """
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_cache_version(key):
+    """
+    Replace the version stamp under key so that every process reloads whatever it keyed on it.
+
+    The stamp is bumped right away and once more when the surrounding transaction commits, so that a process
+    that reloads in between the two does not keep data read before the commit.
+    """
+    cache.set(key, uuid.uuid4().hex, timeout=None)
+    transaction.on_commit(lambda: cache.set(key, uuid.uuid4().hex, timeout=None))
@@ -0,0 +1,93 @@
+from io import BytesIO
+
+import numpy as np
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PGCOPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+PGCOPY_HEADER_LENGTH = len(PGCOPY_SIGNATURE) + 4 + 4
+PGCOPY_TRAILER_LENGTH = 2
+
+
+def fetch_columns(sql, params, columns, using=DEFAULT_DB_ALIAS):
+    """
+    Run a SELECT statement through COPY ... TO STDOUT in PostgreSQL binary format, and read its result directly into
+    one NumPy array per column, without ever building a Python object per row or per value.
+
+    Every row of the binary format has the same layout as long as all the values have a fixed size, so that the whole
+    result can be viewed as a single structured array. Selected columns must therefore be cast to the type matching
+    their dtype (bigint for int64, integer for int32, double precision for float64, boolean for bool) and must never
+    be NULL, use COALESCE where needed.
+
+    :param columns: list of (name, dtype) of the selected columns, in order
+    :return: dict of name -> NumPy array of the given dtype
+    """
+    buffer = BytesIO()
+    with connections[using].cursor() as cursor:
+        copy_sql = cursor.mogrify(sql, params).decode("utf-8")
+        cursor.copy_expert(f"COPY ({copy_sql}) TO STDOUT WITH (FORMAT binary)", buffer)
+    return read_binary_copy_columns(buffer.getbuffer(), columns)
+
+
+def read_binary_copy_columns(data, columns):
+    """
+    :param data: bytes-like output of a COPY ... TO STDOUT WITH (FORMAT binary)
+    :param columns: list of (name, dtype) of the copied columns, in order
+    :return: dict of name -> NumPy array of the given dtype
+    """
+    row_fields = [("_field_count", ">i2")]
+    for (index, (name, dtype)) in enumerate(columns):
+        row_fields.append((f"_length{index}", ">i4"))
+        row_fields.append((name, np.dtype(dtype).newbyteorder(">")))
+    row_dtype = np.dtype(row_fields)
+
+    if bytes(data[: len(PGCOPY_SIGNATURE)]) != PGCOPY_SIGNATURE:
+        raise ValueError("Unexpected COPY binary signature")
+    header_extension_length = int.from_bytes(data[PGCOPY_HEADER_LENGTH - 4 : PGCOPY_HEADER_LENGTH], "big")
+    body = data[PGCOPY_HEADER_LENGTH + header_extension_length : len(data) - PGCOPY_TRAILER_LENGTH]
+    if len(body) % row_dtype.itemsize != 0:
+        raise ValueError("COPY binary rows do not match the expected columns, some value is NULL or of another type")
+
+    rows = np.frombuffer(body, dtype=row_dtype)
+    if np.any(rows["_field_count"] != len(columns)):
+        raise ValueError("COPY binary rows do not have the expected number of columns")
+    for (index, (name, dtype)) in enumerate(columns):
+        if np.any(rows[f"_length{index}"] != row_dtype[name].itemsize):
+            raise ValueError(f"COPY binary column {name} is NULL or of another type than {np.dtype(dtype)}")
+
+    return {name: rows[name].astype(dtype) for (name, dtype) in columns}
+
+
+def copy_columns(table, columns, using=DEFAULT_DB_ALIAS):
+    """
+    Load NumPy arrays into the columns of a table with a single COPY ... FROM STDIN in PostgreSQL binary format,
+    the reverse of fetch_columns. Arrays must have the dtype matching the type of their column, as for fetch_columns.
+
+    :param columns: list of (name, array) of equal length
+    """
+    with connections[using].cursor() as cursor:
+        column_names = ", ".join(name for (name, _) in columns)
+        cursor.copy_expert(
+            f"COPY {table} ({column_names}) FROM STDIN WITH (FORMAT binary)",
+            BytesIO(write_binary_copy_columns(columns)),
+        )
+
+
+def write_binary_copy_columns(columns):
+    """
+    :param columns: list of (name, array) of equal length
+    :return: bytes of the input of a COPY ... FROM STDIN WITH (FORMAT binary)
+    """
+    row_fields = [("_field_count", ">i2")]
+    for (index, (name, values)) in enumerate(columns):
+        row_fields.append((f"_length{index}", ">i4"))
+        row_fields.append((name, values.dtype.newbyteorder(">")))
+    num_rows = len(columns[0][1]) if columns else 0
+    rows = np.empty(num_rows, dtype=np.dtype(row_fields))
+    rows["_field_count"] = len(columns)
+    for (index, (name, values)) in enumerate(columns):
+        rows[f"_length{index}"] = values.dtype.itemsize
+        rows[name] = values
+
+    header = PGCOPY_SIGNATURE + (0).to_bytes(4, "big") + (0).to_bytes(4, "big")
+    trailer = (-1).to_bytes(PGCOPY_TRAILER_LENGTH, "big", signed=True)
+    return header + rows.tobytes() + trailer
@@ -0,0 +1,32 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUDict:
+    """
+    Dict of at most max_size entries, dropping the least recently used one to make room for a new one, so that
+    per-process caches keyed by run do not keep every run a long-lived worker has ever served.
+    Safe to use from several threads.
+    """
+
+    def __init__(self, max_size):
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
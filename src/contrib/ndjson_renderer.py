@@ -0,0 +1,30 @@
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline delimited JSON, one object per line. Views stream their rows themselves with ndjson_streaming_response
+    when it is the accepted renderer, so this only renders whatever other response they give, such as errors.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return json.dumps(data).encode("utf-8") + b"\n"
+
+
+def ndjson_streaming_response(rows):
+    """
+    :param rows: iterable of JSON serializable objects, consumed only as the response is sent
+    """
+    return StreamingHttpResponse(
+        (json.dumps(row).encode("utf-8") + b"\n" for row in rows),
+        content_type=NDJSONRenderer.media_type,
+    )
@@ -292,6 +292,22 @@ ACCOUNT_MAX_EMAIL_ADDRESSES = 10
 # in case the site is cloned for new runs where such acknowledgement isn't accurate.
 SHOW_FOOTER_ACKNOWLEDGEMENT = env.bool("DJANGO_SHOW_FOOTER_ACKNOWLEDGEMENT", False)
 
+# Seconds each worker process buffers the client versions reported by task requests before writing them into
+# UserLastVersion, from a timer thread. If 0, they are written during the request itself.
+USER_LAST_VERSION_FLUSH_INTERVAL = env.float("DJANGO_USER_LAST_VERSION_FLUSH_INTERVAL", default=10.0)
+
+# Processes used to draw bootstrap samples of the ratings, when enabled by the run. If 0, one per CPU.
+# They are started by the celery worker process running the rating update, prefork pool or not.
+ELO_BOOTSTRAP_MAX_WORKERS = env.int("DJANGO_ELO_BOOTSTRAP_MAX_WORKERS", default=0)
+
+# Local directory where training games uploaded to the pending training games endpoint are spooled until ingested
+# by celery, which must so have access to it too. If empty, that endpoint is disabled.
+TRAINING_GAME_SPOOL_DIR = env("DJANGO_TRAINING_GAME_SPOOL_DIR", default="")
+
+# Most rows in a shard of training data compacted by compact_training_data, unless a single game has more.
+# Shards are built on local disk, so they need about as much free temporary space uncompressed.
+TRAINING_DATA_SHARD_MAX_ROWS = env.int("DJANGO_TRAINING_DATA_SHARD_MAX_ROWS", default=100000)
+
 REST_FRAMEWORK = {
     "TEST_REQUEST_DEFAULT_FORMAT": "json",
     "DEFAULT_AUTHENTICATION_CLASSES": [
@@ -55,6 +55,16 @@ NPZ_FILE_STORAGE = "django.core.files.storage.FileSystemStorage"
 
 NETWORK_USE_PROXY_DOWNLOAD = False
 
+USER_LAST_VERSION_FLUSH_INTERVAL = 0
+
+ELO_BOOTSTRAP_MAX_WORKERS = 1
+
+# CELERY
+# ------------------------------------------------------------------------------
+# Tasks dispatched by views run inline
+CELERY_TASK_ALWAYS_EAGER = True
+CELERY_TASK_EAGER_PROPAGATES = True
+
 # Your stuff...
 # ------------------------------------------------------------------------------
 
@@ -6,7 +6,7 @@ from django.views import defaults as default_views
 from rest_framework import routers
 
 from src.apps.distributed_efforts.viewsets import DistributedTaskViewSet
-from src.apps.games.viewsets import RatingGameViewSet, TrainingGameViewSet
+from src.apps.games.viewsets import PendingTrainingGameViewSet, RatingGameViewSet, TrainingGameViewSet
 from src.apps.runs.viewsets import RunViewSet
 from src.apps.startposes.viewsets import StartPosViewSet
 from src.apps.trainings.viewsets import NetworkViewSet, NetworkViewSetForElo
@@ -32,6 +32,7 @@ router.register(r"networks-for-elo", NetworkViewSetForElo, basename="networks-fo
 router.register(r"startposes", StartPosViewSet)
 router.register(r"games/training", TrainingGameViewSet)
 router.register(r"games/rating", RatingGameViewSet)
+router.register(r"games/pending-training", PendingTrainingGameViewSet)
 router.register(r"runs", RunViewSet)
 router.register(r"tasks", DistributedTaskViewSet, basename="Task")
 